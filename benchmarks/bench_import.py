@@ -0,0 +1,139 @@
+"""
+bench_import.py — Import throughput of the GTFS pipeline by number of parser workers.
+
+Generates a synthetic city-scale feed (or uses --feed) and runs the bulk
+import once per worker count, printing wall time, rows/s, speedup and the
+phase breakdown from ImportReport (parse wait, insert, index build, triggers).
+
+Usage::
+
+    PYTHONPATH=src python benchmarks/bench_import.py --trips 40000 --stops-per-trip 25
+    PYTHONPATH=src python benchmarks/bench_import.py --feed data/gtfs_latest --workers 1 2 4 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import os
+import tempfile
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+from bakalarka_gtfs.mcp import database as db
+from bakalarka_gtfs.mcp.import_pipeline import open_feed
+
+
+def _write_csv(path: Path, headers: list[str], rows) -> None:
+    with path.open("w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(headers)
+        writer.writerows(rows)
+
+
+def generate_feed(out: Path, trips: int, stops_per_trip: int, n_stops: int = 2000, n_routes: int = 100) -> None:
+    """Vygeneruje synteticky GTFS feed s `trips * stops_per_trip` riadkami stop_times."""
+    out.mkdir(parents=True, exist_ok=True)
+    _write_csv(
+        out / "stops.txt",
+        ["stop_id", "stop_name", "stop_lat", "stop_lon", "stop_code", "zone_id", "location_type"],
+        ([f"S{i}", f"Zastavka {i}", 48 + i / 1e4, 17 + i / 1e4, "", "100", "0"] for i in range(n_stops)),
+    )
+    _write_csv(
+        out / "routes.txt",
+        ["route_id", "agency_id", "route_short_name", "route_long_name", "route_type", "route_color"],
+        ([f"R{i}", "A1", str(i), f"Linka {i}", "3", "F56200"] for i in range(n_routes)),
+    )
+    _write_csv(
+        out / "calendar.txt",
+        [
+            "service_id",
+            "monday",
+            "tuesday",
+            "wednesday",
+            "thursday",
+            "friday",
+            "saturday",
+            "sunday",
+            "start_date",
+            "end_date",
+        ],
+        [["WD", "1", "1", "1", "1", "1", "0", "0", "20260101", "20261231"]],
+    )
+    _write_csv(
+        out / "trips.txt",
+        ["trip_id", "route_id", "service_id", "trip_headsign", "direction_id", "shape_id"],
+        ([f"T{i}", f"R{i % n_routes}", "WD", "Centrum", "0", f"SH{i % n_routes}"] for i in range(trips)),
+    )
+
+    def stop_times():
+        for t in range(trips):
+            base = 5 * 3600 + (t % 1000) * 60
+            for s in range(stops_per_trip):
+                x = base + s * 120
+                hhmmss = f"{x // 3600:02d}:{x % 3600 // 60:02d}:{x % 60:02d}"
+                yield [f"T{t}", hhmmss, hhmmss, f"S{(t + s) % n_stops}", s + 1]
+
+    _write_csv(
+        out / "stop_times.txt",
+        ["trip_id", "arrival_time", "departure_time", "stop_id", "stop_sequence"],
+        stop_times(),
+    )
+    _write_csv(
+        out / "shapes.txt",
+        ["shape_id", "shape_pt_lat", "shape_pt_lon", "shape_pt_sequence", "shape_dist_traveled"],
+        ([f"SH{i}", 48 + j / 1e4, 17.1, j, j * 10] for i in range(n_routes) for j in range(1000)),
+    )
+
+
+def run(feed: Path, worker_counts: list[int]) -> None:
+    source = open_feed(feed)
+    if source is None:
+        raise SystemExit(f"'{feed}' nie je GTFS adresar ani ZIP so stops.txt.")
+    print(
+        f"{'workers':>7} | {'seconds':>8} | {'rows/s':>10} | {'speedup':>7} | "
+        f"{'parse':>6} | {'insert':>6} | {'index':>6} | {'trigger':>7}"
+    )
+    baseline = None
+    for workers in worker_counts:
+        with tempfile.TemporaryDirectory(prefix="gtfs_bench_") as tmpdir:
+            work_dir = Path(tmpdir)
+            with patch.object(db, "WORK_DIR", work_dir), patch.object(db, "DB_PATH", work_dir / "current.db"):
+                started = time.perf_counter()
+                report = db._do_import(source, workers=workers)
+                elapsed = time.perf_counter() - started
+        rows = sum(report.row_counts().values())
+        baseline = baseline or elapsed
+        phases = report.to_dict()["phases"]
+        print(
+            f"{workers:>7} | {elapsed:>8.2f} | {rows / elapsed:>10.0f} | {baseline / elapsed:>6.2f}x | "
+            f"{phases['parse_s']:>6.2f} | {phases['insert_s']:>6.2f} | "
+            f"{phases['index_s'] + phases['analyze_s']:>6.2f} | {phases['trigger_s']:>7.2f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--feed", type=Path, help="Existujuci GTFS adresar alebo ZIP (inak synteticky feed)")
+    parser.add_argument("--trips", type=int, default=40000)
+    parser.add_argument("--stops-per-trip", type=int, default=25)
+    parser.add_argument("--workers", type=int, nargs="+")
+    args = parser.parse_args()
+
+    cpu = os.cpu_count() or 1
+    worker_counts = args.workers or sorted({1, 2, 4, 8, cpu} & set(range(1, cpu + 1)))
+
+    if args.feed:
+        run(args.feed, worker_counts)
+        return
+
+    with tempfile.TemporaryDirectory(prefix="gtfs_feed_") as tmpdir:
+        feed = Path(tmpdir)
+        generate_feed(feed, args.trips, args.stops_per_trip)
+        print(f"Synteticky feed: {args.trips * args.stops_per_trip} riadkov stop_times, {cpu} CPU")
+        run(feed, worker_counts)
+
+
+if __name__ == "__main__":
+    main()
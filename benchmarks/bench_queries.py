@@ -0,0 +1,158 @@
+"""
+bench_queries.py — Map and validation queries with and without the managed index set.
+
+Imports a synthetic feed (or --feed) once, times each query with the
+secondary indexes from database._INDEXES, then drops them and times the
+same queries again on full table scans. Finally it pages through all trips
+with LIMIT/OFFSET and with the keyset cursor of run_query_page.
+
+Usage::
+
+    PYTHONPATH=src python benchmarks/bench_queries.py --trips 40000 --stops-per-trip 25
+    PYTHONPATH=src python benchmarks/bench_queries.py --feed data/gtfs_latest --repeat 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+from bench_import import generate_feed
+
+from bakalarka_gtfs.mcp import database as db
+from bakalarka_gtfs.mcp.import_pipeline import open_feed
+
+# (nazov, SQL) — dotazy z gtfs_show_map a validacie DELETE operacii
+QUERIES: list[tuple[str, str]] = [
+    (
+        "map: najdlhsi trip linky",
+        """
+        SELECT t.trip_id, COUNT(st.stop_id) AS stop_count
+        FROM trips t JOIN stop_times st ON t.trip_id = st.trip_id
+        WHERE t.route_id = :route_id
+        GROUP BY t.trip_id ORDER BY stop_count DESC LIMIT 1
+        """,
+    ),
+    (
+        "map: smer from -> to",
+        """
+        SELECT st_from.trip_id, st_from.stop_sequence, st_to.stop_sequence
+        FROM stop_times st_from
+        JOIN stop_times st_to ON st_from.trip_id = st_to.trip_id
+        JOIN trips t ON t.trip_id = st_from.trip_id
+        WHERE t.route_id = :route_id AND st_from.stop_id = :from_stop AND st_to.stop_id = :to_stop
+          AND st_from.stop_sequence < st_to.stop_sequence
+        LIMIT 1
+        """,
+    ),
+    ("validacia: delete routes", "SELECT COUNT(*) FROM trips WHERE route_id = :route_id"),
+    ("validacia: delete calendar", "SELECT COUNT(*) FROM trips WHERE service_id = :service_id"),
+    ("odchody zo zastavky", "SELECT COUNT(*) FROM stop_times WHERE stop_id = :from_stop"),
+    ("linky cez shape", "SELECT COUNT(*) FROM trips WHERE shape_id = :shape_id"),
+]
+
+
+def _sample_params(conn: sqlite3.Connection) -> dict:
+    """Parametre dotazov z dat (linka, jej trip a dve zastavky na nom)."""
+    route_id, trip_id, service_id, shape_id = conn.execute(
+        "SELECT route_id, trip_id, service_id, shape_id FROM trips ORDER BY trip_id LIMIT 1"
+    ).fetchone()
+    stops = [
+        r[0] for r in conn.execute("SELECT stop_id FROM stop_times WHERE trip_id = ? ORDER BY stop_sequence", [trip_id])
+    ]
+    return {
+        "route_id": route_id,
+        "service_id": service_id,
+        "shape_id": shape_id,
+        "from_stop": stops[0],
+        "to_stop": stops[-1],
+    }
+
+
+def _time_queries(conn: sqlite3.Connection, params: dict, repeat: int) -> list[float]:
+    timings = []
+    for _, sql in QUERIES:
+        started = time.perf_counter()
+        for _ in range(repeat):
+            conn.execute(sql, params).fetchall()
+        timings.append((time.perf_counter() - started) / repeat * 1000)
+    return timings
+
+
+def _time_paging(page_size: int) -> tuple[int, float, float]:
+    """Cely zoznam trips po stranach: LIMIT/OFFSET vs keyset kurzor (sekundy)."""
+    sql = "SELECT trip_id, route_id, service_id FROM trips ORDER BY trip_id"
+    db._result_cache.clear()
+
+    started = time.perf_counter()
+    offset = 0
+    while rows := db.run_query(f"{sql} LIMIT {page_size} OFFSET {offset}"):
+        offset += len(rows)
+    offset_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    cursor = None
+    pages = 0
+    while True:
+        page = db.run_query_page(sql, page_size, cursor)
+        pages += 1
+        if not (cursor := page["next_cursor"]):
+            break
+    keyset_s = time.perf_counter() - started
+    return pages, offset_s, keyset_s
+
+
+def run(feed: Path, repeat: int, page_size: int) -> None:
+    source = open_feed(feed)
+    if source is None:
+        raise SystemExit(f"'{feed}' nie je GTFS adresar ani ZIP so stops.txt.")
+    with tempfile.TemporaryDirectory(prefix="gtfs_bench_") as tmpdir:
+        work_dir = Path(tmpdir)
+        db_path = work_dir / "current.db"
+        with patch.object(db, "WORK_DIR", work_dir), patch.object(db, "DB_PATH", db_path):
+            db._do_import(source)
+
+            conn = sqlite3.connect(str(db_path))
+            try:
+                pages, offset_s, keyset_s = _time_paging(page_size)
+                params = _sample_params(conn)
+                indexed = _time_queries(conn, params, repeat)
+                for name in db._INDEXES:
+                    conn.execute(f"DROP INDEX IF EXISTS {name}")
+                conn.execute("ANALYZE")
+                scanned = _time_queries(conn, params, repeat)
+            finally:
+                conn.close()
+
+    print(f"{'dotaz':<28} | {'index ms':>9} | {'scan ms':>9} | {'speedup':>8}")
+    for (name, _), with_idx, without_idx in zip(QUERIES, indexed, scanned, strict=True):
+        print(f"{name:<28} | {with_idx:>9.2f} | {without_idx:>9.2f} | {without_idx / with_idx:>7.1f}x")
+    print(f"\nstrankovanie trips ({pages} stran po {page_size}): OFFSET {offset_s:.2f} s | kurzor {keyset_s:.2f} s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--feed", type=Path, help="Existujuci GTFS adresar alebo ZIP (inak synteticky feed)")
+    parser.add_argument("--trips", type=int, default=40000)
+    parser.add_argument("--stops-per-trip", type=int, default=25)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--page-size", type=int, default=500)
+    args = parser.parse_args()
+
+    if args.feed:
+        run(args.feed, args.repeat, args.page_size)
+        return
+
+    with tempfile.TemporaryDirectory(prefix="gtfs_feed_") as tmpdir:
+        feed = Path(tmpdir)
+        generate_feed(feed, args.trips, args.stops_per_trip)
+        print(f"Synteticky feed: {args.trips * args.stops_per_trip} riadkov stop_times")
+        run(feed, args.repeat, args.page_size)
+
+
+if __name__ == "__main__":
+    main()
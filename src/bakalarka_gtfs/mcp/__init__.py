@@ -2,9 +2,12 @@
 mcp — MCP server, GTFS database, patching, and visualization.
 
 Submodules:
-    server         — FastMCP server with 8 GTFS tools (SSE transport)
+    server         — FastMCP server with 12 GTFS tools (SSE transport)
     database       — SQLite singleton: import, query, export GTFS data
-    patching/      — Patch operations (update/delete/insert) and validation
+    query_advisor  — EXPLAIN QUERY PLAN with row estimates and index advice
+    query_stats    — per-statement SQL statistics and the slow-query log
+    sql_functions  — GTFS time functions registered on every SQLite connection
+    patching/      — Patch operations (update/delete/insert), dry run and validation
     visualization/ — Leaflet.js interactive map generator
 
 Entry point::
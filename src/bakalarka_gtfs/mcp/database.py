@@ -2,21 +2,63 @@
 database.py — SQLite database for GTFS data (singleton — one current.db).
 
 Functions:
-  - ensure_loaded(feed_path)     — load GTFS if DB doesn't exist yet
+  - ensure_loaded(feed_path)     — load GTFS if DB doesn't exist yet (reload = atomic swap)
   - get_current_db()             — path to active .db
-  - run_query(sql)               — read-only SELECT, default limit 500 rows
+  - read_connection()            — pooled read-only connection (recycled on DB swap)
+  - write_connection()           — the single writer connection
+  - run_query(sql)               — read-only SELECT, default limit 500 rows (LRU result cache)
+  - run_query_page(sql, ...)     — one page of a SELECT with an opaque keyset cursor
+  - run_query_bounded(sql, ...)  — SELECT bounded in rows and bytes, larger results spill to a file
+  - read_spilled_result(name)    — one page of a spilled result (MCP resource gtfs://results/...)
+                                   (both cancelled past the time / VM-step budget)
+  - database_version()           — content version of current.db (changes on every commit)
+  - table_versions(conn, tables) — per-table version stamps (file generation, last audit_log id)
+  - statement_stats(top)         — top-N SQL statements by time, recent slow queries (see query_stats)
   - export_to_gtfs(output_path)  — dump to CSV -> ZIP
   - reset_db()                   — delete DB (for new chat / fresh import)
+  - list_import_cache()          — snapshots in the content-addressed import cache
+  - purge_import_cache()         — delete one or all cached snapshots
+  - list_indexes()               — indexes in current.db with their size
 """
 
 from __future__ import annotations
 
 import csv
+import functools
 import io
 import os
 import sqlite3
+import tempfile
+import threading
+import time
 import zipfile
+from contextlib import AbstractContextManager, contextmanager, suppress
 from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from .import_cache import ImportCache, feed_fingerprint
+from .import_pipeline import FeedSource, ImportReport, open_feed, parse_files
+from .pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    decode_cursor,
+    encode_cursor,
+    has_top_level_limit,
+    keyset_sql,
+    query_digest,
+    split_order_by,
+)
+from .query_stats import ENABLED as SQL_STATS_ENABLED
+from .query_stats import StatementStats, StatementTracer
+from .result_cache import ResultCache, estimate_bytes, normalize_sql
+from .spill import ColumnStats, SpillStore
+from .sql_functions import register_functions, seconds_sql
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Iterator
+
+    from .import_pipeline import ImportProgress
+    from .pagination import OrderKey
 
 # ---------------------------------------------------------------------------
 # Cesty — singleton DB
@@ -30,6 +72,10 @@ PROJECT_ROOT = (
 WORK_DIR = PROJECT_ROOT / ".work" / "datasets"
 DB_PATH = WORK_DIR / "current.db"
 
+# Verzia schemy — sucast kluca import cache. Zvysit pri kazdej zmene tabuliek,
+# indexov alebo triggerov, aby sa nepouzili snapshoty so starou schemou.
+SCHEMA_VERSION = 4
+
 # Mapovanie GTFS .txt -> SQLite tabulka
 GTFS_TABLES: dict[str, str] = {
     "stops.txt": "stops",
@@ -46,11 +92,225 @@ def get_current_db() -> Path:
     return DB_PATH
 
 
+def _import_cache() -> ImportCache:
+    """Import cache vedla aktualnej DB (nasleduje WORK_DIR)."""
+    return ImportCache(WORK_DIR / "import_cache")
+
+
+# ---------------------------------------------------------------------------
+# Spojenia — pool citacich spojeni + jeden writer
+# ---------------------------------------------------------------------------
+
+# Pocet necinnych read-only spojeni drzanych v poole
+READ_POOL_SIZE = int(os.getenv("GTFS_DB_READ_POOL_SIZE", "4"))
+# Memory-mapped I/O a page cache na jedno spojenie
+MMAP_BYTES = int(os.getenv("GTFS_DB_MMAP_BYTES", str(256 * 1024**2)))
+CACHE_KIB = int(os.getenv("GTFS_DB_CACHE_KIB", str(64 * 1024)))
+
+
+class ConnectionManager:
+    """
+    Perzistentne SQLite spojenia nad current.db pre MCP nastroje.
+
+    Citania beru spojenie z poolu (query_only, mmap, vacsia page cache),
+    zapisy idu cez jedno writer spojenie serializovane zamkom. Pri kazdom
+    vypozicani sa porovna identita suboru (cesta, zariadenie, inode) — po
+    hot-swape alebo resete DB sa stare spojenia zatvoria a otvoria nove
+    (generacia sa zvysi). Vypozicane spojenie zo starej generacie sa pri
+    vrateni zatvori, takze rozbehnute citanie dobehne nad starym snapshotom.
+    Kazde spojenie ma GTFS casove funkcie (sql_functions) a StatementTracer
+    (statistiky prikazov, slow log), ktory sa uzavrie pri vrateni spojenia.
+    """
+
+    def __init__(self, pool_size: int = READ_POOL_SIZE) -> None:
+        self.pool_size = pool_size
+        self.write_lock = threading.RLock()
+        self._lock = threading.Lock()
+        self._idle: list[sqlite3.Connection] = []
+        self._writer: sqlite3.Connection | None = None
+        self._writer_generation = -1
+        self._identity: tuple[str, int, int] | None = None
+        self._header_fd: int | None = None
+        self._generation = 0
+        self._tracers: dict[int, StatementTracer] = {}
+
+    @property
+    def generation(self) -> int:
+        """Pocitadlo vymen DB suboru (zvysi sa pri kazdej zmene identity)."""
+        return self._generation
+
+    @contextmanager
+    def read(self) -> Iterator[sqlite3.Connection]:
+        """Vypozicia read-only spojenie z poolu (row_factory = sqlite3.Row)."""
+        with self._lock:
+            generation = self._sync()
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            conn = self._open(read_only=True)
+        try:
+            yield conn
+        finally:
+            self._finish(conn)
+            with self._lock:
+                if generation == self._generation and len(self._idle) < self.pool_size and not conn.in_transaction:
+                    self._idle.append(conn)
+                    conn = None
+            if conn is not None:
+                self._close(conn)
+
+    @contextmanager
+    def write(self) -> Iterator[sqlite3.Connection]:
+        """
+        Exkluzivne writer spojenie (foreign_keys = ON, autocommit — transakcie
+        riadi volajuci). Neukoncena transakcia sa pri chybe vrati spat.
+        """
+        with self.write_lock:
+            with self._lock:
+                generation = self._sync()
+                if self._writer is not None and self._writer_generation != generation:
+                    self._close(self._writer)
+                    self._writer = None
+            if self._writer is None:
+                self._writer = self._open(read_only=False)
+                self._writer_generation = generation
+            conn = self._writer
+            try:
+                yield conn
+            finally:
+                if conn.in_transaction:
+                    conn.rollback()
+                self._finish(conn)
+
+    def version(self) -> tuple[int, int]:
+        """
+        Verzia obsahu DB: (generacia suboru, SQLite file change counter).
+        Counter v hlavicke suboru (offset 24) zvysi kazdy commit v rollback
+        journal rezime — aj zapis z ineho procesu.
+        """
+        with self._lock:
+            generation = self._sync()
+            if self._header_fd is None:
+                self._header_fd = os.open(DB_PATH, os.O_RDONLY)
+            counter = os.pread(self._header_fd, 4, 24)
+        return generation, int.from_bytes(counter, "big")
+
+    def note_rows(self, conn: sqlite3.Connection, count: int) -> None:
+        """Pocet riadkov, ktore vratil posledny SELECT na spojeni (pre statistiky)."""
+        tracer = self._tracers.get(id(conn))
+        if tracer is not None:
+            tracer.add_rows(count)
+
+    def invalidate(self) -> None:
+        """Zatvori necinne spojenia (po vymene alebo zmazani DB v tomto procese)."""
+        with self._lock:
+            self._recycle(None)
+
+    def _sync(self) -> int:
+        """Skontroluje identitu DB suboru; pri zmene recykluje spojenia. Vola sa pod _lock."""
+        try:
+            st = os.stat(DB_PATH)
+        except FileNotFoundError:
+            self._recycle(None)
+            raise FileNotFoundError(
+                "Databaza neexistuje. Najprv zavolaj gtfs_load('data/gtfs_latest') pre nacitanie dat."
+            ) from None
+        identity = (str(DB_PATH), st.st_dev, st.st_ino)
+        if identity != self._identity:
+            self._recycle(identity)
+        return self._generation
+
+    def _recycle(self, identity: tuple[str, int, int] | None) -> None:
+        for conn in self._idle:
+            self._close(conn)
+        self._idle.clear()
+        if self._header_fd is not None:
+            os.close(self._header_fd)
+            self._header_fd = None
+        self._identity = identity
+        self._generation += 1
+
+    def _open(self, read_only: bool) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(DB_PATH), timeout=30, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        register_functions(conn)
+        conn.execute(f"PRAGMA mmap_size = {MMAP_BYTES}")
+        conn.execute(f"PRAGMA cache_size = -{CACHE_KIB}")
+        if read_only:
+            conn.execute("PRAGMA query_only = ON")
+        else:
+            conn.execute("PRAGMA foreign_keys = ON")
+        if SQL_STATS_ENABLED:
+            tracer = StatementTracer(conn, _statement_stats)
+            conn.set_trace_callback(tracer.on_statement)
+            self._tracers[id(conn)] = tracer
+        return conn
+
+    def _finish(self, conn: sqlite3.Connection) -> None:
+        tracer = self._tracers.get(id(conn))
+        if tracer is None:
+            return
+        with suppress(sqlite3.Error):  # statistiky nesmu zhodit dotaz (napr. DB medzicasom zmazana)
+            tracer.finish()
+
+    def _close(self, conn: sqlite3.Connection) -> None:
+        self._tracers.pop(id(conn), None)
+        conn.close()
+
+
+# Statistiky SQL prikazov vsetkych pooled spojeni; slow log lezi vedla DB
+_statement_stats = StatementStats(lambda: WORK_DIR / "slow_queries.log")
+_connections = ConnectionManager()
+
+
+def read_connection() -> AbstractContextManager[sqlite3.Connection]:
+    """Pooled read-only spojenie na current.db (`with read_connection() as conn:`)."""
+    return _connections.read()
+
+
+def write_connection() -> AbstractContextManager[sqlite3.Connection]:
+    """Jedine writer spojenie na current.db (`with write_connection() as conn:`)."""
+    return _connections.write()
+
+
+def database_version() -> tuple[int, int]:
+    """Verzia obsahu current.db — zmeni sa po kazdom zapise, importe aj vymene suboru."""
+    return _connections.version()
+
+
+def table_versions(conn: sqlite3.Connection, tables: Iterable[str]) -> dict[str, list[int]]:
+    """
+    Verzie tabuliek: [generacia DB suboru, posledny audit_log zaznam tabulky].
+    Kazdy zapis do GTFS tabulky prejde audit triggerom (patch aj inkrementalny
+    import), novy import meni generaciu — zapis do inej tabulky verziu nemeni.
+    """
+    generation = _connections.generation
+    return {
+        table: [
+            generation,
+            conn.execute("SELECT COALESCE(MAX(log_id), 0) FROM audit_log WHERE table_name = ?", [table]).fetchone()[0],
+        ]
+        for table in sorted(tables)
+    }
+
+
 # ---------------------------------------------------------------------------
 # Schema
 # ---------------------------------------------------------------------------
 
-_SCHEMA_SQL = """\
+# Celociselne sekundy vedla textovych GTFS casov (stop_times). Generovane
+# stlpce: vyplni ich SQLite pri kazdom INSERT/UPDATE, takze su vzdy
+# v sulade s textom a daju sa indexovat pre range scan.
+TIME_SECONDS_COLUMNS: dict[str, str] = {
+    "arrival_time": "arrival_seconds",
+    "departure_time": "departure_seconds",
+}
+
+
+def _seconds_column_sql(time_col: str) -> str:
+    return f"{TIME_SECONDS_COLUMNS[time_col]} INTEGER GENERATED ALWAYS AS ({seconds_sql(time_col)}) VIRTUAL"
+
+
+_SCHEMA_SQL = f"""\
 CREATE TABLE IF NOT EXISTS stops (
     stop_id       TEXT PRIMARY KEY,
     stop_name     TEXT NOT NULL,
@@ -98,6 +358,8 @@ CREATE TABLE IF NOT EXISTS stop_times (
     departure_time TEXT    NOT NULL,
     stop_id        TEXT    NOT NULL REFERENCES stops(stop_id),
     stop_sequence  INTEGER NOT NULL,
+    {_seconds_column_sql("arrival_time")},
+    {_seconds_column_sql("departure_time")},
     PRIMARY KEY (trip_id, stop_sequence)
 );
 
@@ -110,6 +372,11 @@ CREATE TABLE IF NOT EXISTS shapes (
     PRIMARY KEY (shape_id, shape_pt_sequence)
 );
 
+CREATE TABLE IF NOT EXISTS gtfs_meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+
 CREATE TABLE IF NOT EXISTS audit_log (
     log_id INTEGER PRIMARY KEY AUTOINCREMENT,
     table_name TEXT NOT NULL,
@@ -142,10 +409,38 @@ _TABLE_COLUMNS: dict[str, list[str]] = {
     "shapes": ["shape_id", "shape_pt_lat", "shape_pt_lon", "shape_pt_sequence", "shape_dist_traveled"],
 }
 
+# Sekundarne indexy (nazov -> tabulka, stlpce) pre pristupove cesty mapy,
+# validacie a typickych dotazov agenta. stop_times(trip_id) a
+# shapes(shape_id) pokryva primarny kluc. Pri bulk importe sa stavaju az po
+# nacitani dat — jeden sort namiesto priebeznej udrzby B-stromu.
+_INDEXES: dict[str, tuple[str, list[str]]] = {
+    "idx_stop_times_stop_id": ("stop_times", ["stop_id"]),
+    "idx_stop_times_arrival_seconds": ("stop_times", ["arrival_seconds"]),
+    "idx_stop_times_departure_seconds": ("stop_times", ["departure_seconds"]),
+    "idx_trips_route_id": ("trips", ["route_id"]),
+    "idx_trips_service_id": ("trips", ["service_id"]),
+    "idx_trips_shape_id": ("trips", ["shape_id"]),
+    "idx_routes_short_name": ("routes", ["route_short_name"]),
+    # Posledny zapis do tabulky (table_versions) — MAX(log_id) jednym skokom v indexe
+    "idx_audit_log_table": ("audit_log", ["table_name", "log_id"]),
+}
+
+# PRAGMA nastavenia pre bulk import do prazdneho suboru. Bez journalu a fsync
+# je import pri crashi nekonzistentny — DB sa vtedy jednoducho importuje znova.
+_BULK_IMPORT_PRAGMAS: tuple[str, ...] = (
+    "PRAGMA journal_mode = OFF",
+    "PRAGMA synchronous = OFF",
+    "PRAGMA locking_mode = EXCLUSIVE",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -262144",  # 256 MiB
+)
 
-def _create_audit_triggers(conn: sqlite3.Connection) -> None:
-    """Dynamicky vytvori audit triggery pre vsetky tabulky."""
+
+def _create_audit_triggers(conn: sqlite3.Connection) -> dict[str, float]:
+    """Dynamicky vytvori audit triggery pre vsetky tabulky. Vrati cas po tabulkach."""
+    timings: dict[str, float] = {}
     for table, cols in _TABLE_COLUMNS.items():
+        started = time.perf_counter()
         # Urcenie identifikatora pre zaznam (PK)
         if table == "stop_times":
             record_id_expr = "NEW.trip_id || '-' || NEW.stop_sequence"
@@ -193,12 +488,40 @@ def _create_audit_triggers(conn: sqlite3.Connection) -> None:
         ]
         for t_sql in triggers:
             conn.executescript(t_sql)
+        timings[table] = time.perf_counter() - started
+    return timings
 
 
-def create_schema(conn: sqlite3.Connection) -> None:
-    """Vytvori 5 GTFS tabuliek, audit tabulku a vsetky triggery (idempotentne)."""
+def create_indexes(conn: sqlite3.Connection, analyze: bool = True) -> dict[str, float]:
+    """
+    Vytvori chybajuce sekundarne indexy z `_INDEXES` (idempotentne).
+    Ak nejaky pribudol a analyze=True, obnovi statistiky planovaca (ANALYZE).
+    Vrati novo vytvorene indexy s casom stavby v sekundach.
+    """
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    created: dict[str, float] = {}
+    for name, (table, cols) in _INDEXES.items():
+        if name not in existing:
+            started = time.perf_counter()
+            conn.execute(f"CREATE INDEX {name} ON {table} ({', '.join(cols)})")
+            created[name] = time.perf_counter() - started
+    if created and analyze:
+        conn.execute("ANALYZE")
+    return created
+
+
+def _upgrade_schema(conn: sqlite3.Connection) -> None:
+    """
+    Doplni do DB zo starsej verzie tabulky, stlpce a indexy pridane neskor
+    (idempotentne). Generovane VIRTUAL stlpce sa daju pridat cez ALTER TABLE.
+    """
     conn.executescript(_SCHEMA_SQL)
-    _create_audit_triggers(conn)
+    existing = {row[1] for row in conn.execute("PRAGMA table_xinfo(stop_times)")}
+    for time_col, seconds_col in TIME_SECONDS_COLUMNS.items():
+        if seconds_col not in existing:
+            conn.execute(f"ALTER TABLE stop_times ADD COLUMN {_seconds_column_sql(time_col)}")
+    create_indexes(conn)
+    conn.commit()
 
 
 # ---------------------------------------------------------------------------
@@ -206,71 +529,107 @@ def create_schema(conn: sqlite3.Connection) -> None:
 # ---------------------------------------------------------------------------
 
 
-def _do_import(feed: Path) -> dict[str, int]:
-    """Importuje GTFS CSV subory do current.db. Vrati pocty riadkov."""
-    WORK_DIR.mkdir(parents=True, exist_ok=True)
+def _do_import(
+    feed: FeedSource,
+    workers: int | None = None,
+    meta: dict[str, str] | None = None,
+    db_path: Path | None = None,
+    progress: ImportProgress | None = None,
+) -> ImportReport:
+    """
+    Importuje GTFS CSV subory do prazdnej DB v bulk rezime.
+    Vrati ImportReport s poctami riadkov a casmi po tabulkach.
 
-    conn = sqlite3.connect(str(DB_PATH))
-    create_schema(conn)
-
-    tables_info: dict[str, int] = {}
-
-    for txt_file, table in GTFS_TABLES.items():
-        csv_path = feed / txt_file
-        if not csv_path.exists():
-            tables_info[table] = 0
-            continue
-
-        cols = _TABLE_COLUMNS[table]
-        placeholders = ", ".join(["?"] * len(cols))
-        col_names = ", ".join(cols)
-        sql = f"INSERT OR REPLACE INTO {table} ({col_names}) VALUES ({placeholders})"
-
-        count = 0
-        with open(csv_path, newline="", encoding="utf-8-sig") as f:
-            reader = csv.DictReader(f)
-            batch: list[tuple] = []
-            for row in reader:
-                values = tuple(row.get(c, None) or None for c in cols)
-                batch.append(values)
-                count += 1
-                if len(batch) >= 5000:
-                    conn.executemany(sql, batch)
-                    batch.clear()
-            if batch:
-                conn.executemany(sql, batch)
-
-        tables_info[table] = count
+    Postup:
+      1. import-friendly PRAGMA (bez journalu, bez fsync, velka cache)
+      2. tabulky len s primarnymi klucmi — bez indexov a audit triggerov
+      3. paralelne parsovanie CSV (process pool), zapis jednym SQLite writerom
+      4. sekundarne indexy az nad naplnenymi tabulkami
+      5. audit triggery az po nacitani (import nezapisuje do audit_log)
 
-    conn.commit()
-    conn.close()
-    return tables_info
+    Args:
+        feed: GTFS adresar alebo ZIP (subory sa streamuju priamo z archivu)
+        workers: Pocet parser procesov (None = GTFS_IMPORT_WORKERS / pocet CPU)
+        meta: Zaznamy do gtfs_meta (napr. odtlacok a cesta feedu)
+        db_path: Cielova DB (predvolene current.db)
+        progress: progress(hotovo, spolu, sprava) po kazdej davke a faze;
+            priebeh sa meria v bajtoch CSV suborov
+    """
+    WORK_DIR.mkdir(parents=True, exist_ok=True)
+    started = time.perf_counter()
 
+    conn = sqlite3.connect(str(db_path or DB_PATH))
+    report = ImportReport()
+    for table in GTFS_TABLES.values():
+        report.table(table)
+    files = [(txt_file, table, _TABLE_COLUMNS[table]) for txt_file, table in GTFS_TABLES.items() if feed.has(txt_file)]
+    total_bytes = float(sum(feed.size(txt_file) for txt_file, _, _ in files)) or 1.0
+    done_bytes = 0.0
 
-def _find_gtfs_root(base: Path, max_depth: int = 3) -> Path | None:
-    """
-    Hlada GTFS root (adresar so stops.txt) v rozbalenom ZIP.
-    Podporuje rozne struktury:
-      - stops.txt priamo v roote
-      - stops.txt v jednom podpriecinku (napr. feed/)
-      - stops.txt hlbsie vnorene (max_depth urovni)
-    """
-    if (base / "stops.txt").exists():
-        return base
+    def report_progress(message: str) -> None:
+        if progress is not None:
+            progress(min(done_bytes, total_bytes), total_bytes, message)
 
-    if max_depth <= 0:
-        return None
+    try:
+        for pragma in _BULK_IMPORT_PRAGMAS:
+            conn.execute(pragma)
+        conn.executescript(_SCHEMA_SQL)
+
+        batches = parse_files(feed, files, workers=workers)
+        while True:
+            parse_started = time.perf_counter()
+            batch = next(batches, None)
+            parsed = time.perf_counter()
+            if batch is None:
+                break
+            table, rows, nbytes = batch
+            conn.executemany(_insert_sql(table), rows)
+
+            timing = report.table(table)
+            timing.parse_s += parsed - parse_started
+            timing.insert_s += time.perf_counter() - parsed
+            timing.rows += len(rows)
+            timing.bytes += nbytes
+            done_bytes += nbytes
+            report_progress(f"{table}: {timing.rows} riadkov ({timing.to_dict()['rows_per_s']} riadkov/s)")
+        conn.executemany("INSERT OR REPLACE INTO gtfs_meta (key, value) VALUES (?, ?)", (meta or {}).items())
+        conn.commit()
+
+        done_bytes = total_bytes
+        report_progress("Stavba indexov")
+        for name, seconds in create_indexes(conn, analyze=False).items():
+            table = _INDEXES[name][0]
+            if table in _TABLE_COLUMNS:  # report ma len GTFS tabulky (rovnako ako _get_table_counts)
+                report.table(table).index_s += seconds
+        analyze_started = time.perf_counter()
+        conn.execute("ANALYZE")
+        report.analyze_s = time.perf_counter() - analyze_started
+
+        report_progress("Audit triggery")
+        for table, seconds in _create_audit_triggers(conn).items():
+            report.table(table).trigger_s += seconds
+        conn.commit()
+    finally:
+        conn.close()
 
-    for child in sorted(base.iterdir()):
-        if child.is_dir() and not child.name.startswith((".", "__")):
-            found = _find_gtfs_root(child, max_depth - 1)
-            if found is not None:
-                return found
+    report.total_s = time.perf_counter() - started
+    report_progress(f"Import hotovy za {report.total_s:.1f} s")
+    return report
 
-    return None
 
+def _insert_sql(table: str) -> str:
+    """INSERT OR REPLACE prikaz pre importovane stlpce tabulky."""
+    cols = _TABLE_COLUMNS[table]
+    placeholders = ", ".join(["?"] * len(cols))
+    return f"INSERT OR REPLACE INTO {table} ({', '.join(cols)}) VALUES ({placeholders})"
 
-def ensure_loaded(feed_path: str, force: bool = False) -> dict:
+
+def ensure_loaded(
+    feed_path: str,
+    force: bool = False,
+    incremental: bool = False,
+    progress: ImportProgress | None = None,
+) -> dict:
     """
     Nacita GTFS data z adresara alebo ZIP do current.db.
 
@@ -280,9 +639,14 @@ def ensure_loaded(feed_path: str, force: bool = False) -> dict:
     Args:
         feed_path: Cesta k GTFS adresaru alebo .zip
         force: Ak True, vymaze existujucu DB a re-importuje
+        incremental: Ak True a DB existuje, aplikuje len rozdiel noveho feedu
+            (vlozene/zmenene/zmazane riadky) v jednej transakcii; lokalne
+            patche na riadkoch, ktore feed nezmenil, zostanu zachovane.
+        progress: progress(hotovo, spolu, sprava) pocas CSV importu
 
     Returns:
-        dict s tables (pocty riadkov) a status.
+        dict s tables (pocty riadkov) a status; po CSV importe aj timings
+        (rozpis parse/insert/index/trigger casov po tabulkach).
     """
     feed = Path(feed_path)
 
@@ -290,25 +654,27 @@ def ensure_loaded(feed_path: str, force: bool = False) -> dict:
     if not feed.is_absolute():
         feed = PROJECT_ROOT / feed
 
-    # Ak je ZIP, rozbalime a najdeme GTFS subory
-    if feed.suffix.lower() == ".zip":
-        import tempfile
-
-        tmp = Path(tempfile.mkdtemp(prefix="gtfs_"))
-        with zipfile.ZipFile(feed) as zf:
-            zf.extractall(tmp)
-
-        # Hladaj stops.txt — moze byt priamo v tmp, alebo v podpriecinku
-        feed = _find_gtfs_root(tmp)
-        if feed is None:
+    # ZIP sa necita cez rozbalenie — GTFS root sa najde medzi clenmi archivu
+    # a subory sa streamuju priamo do importu.
+    is_zip = feed.suffix.lower() == ".zip"
+    if is_zip and not feed.is_file():
+        raise FileNotFoundError(f"ZIP subor '{feed_path}' neexistuje.")
+    source = open_feed(feed)
+    if source is None:
+        if is_zip:
             raise FileNotFoundError(
                 f"ZIP subor '{feed_path}' neobsahuje platne GTFS data "
                 f"(chyba stops.txt). Skontroluj strukturu ZIP archivu."
             )
-
-    if not feed.exists() or not (feed / "stops.txt").exists():
         raise FileNotFoundError(f"GTFS adresar '{feed}' neexistuje alebo neobsahuje stops.txt.")
 
+    if DB_PATH.exists() and not force:
+        with write_connection() as conn:
+            _upgrade_schema(conn)
+
+    if DB_PATH.exists() and incremental:
+        return _incremental_import(source, feed, progress)
+
     # Ak DB existuje a nechceme force -> vratime existujuce info
     if DB_PATH.exists() and not force:
         tables_info = _get_table_counts()
@@ -319,38 +685,292 @@ def ensure_loaded(feed_path: str, force: bool = False) -> dict:
             "db_path": str(DB_PATH),
         }
 
-    # Force alebo prvy import
-    if DB_PATH.exists():
-        DB_PATH.unlink()
+    # Force alebo prvy import — novy snapshot sa pripravi v staging subore
+    # (z import cache alebo CSV importom) a az hotovy sa atomicky premenuje
+    # na current.db. Rozbehnute citania dobehnu nad starym snapshotom.
+    WORK_DIR.mkdir(parents=True, exist_ok=True)
+    cache = _import_cache()
+    # Bez cache by sa cely feed hashoval zbytocne (odtlacok sluzi na lookup)
+    fingerprint = feed_fingerprint(source, list(GTFS_TABLES), str(SCHEMA_VERSION)) if cache.enabled else None
+
+    staging = _staging_path()
+    try:
+        if fingerprint is not None and cache.restore(fingerprint, staging):
+            _swap_into_place(staging)
+            return {
+                "status": "imported",
+                "message": "GTFS data obnovene z import cache (feed sa nezmenil).",
+                "source": "cache",
+                "feed_fingerprint": fingerprint,
+                "tables": _get_table_counts(),
+                "db_path": str(DB_PATH),
+            }
+
+        report = _do_import(source, meta=_feed_meta(feed, fingerprint), db_path=staging, progress=progress)
+        if fingerprint is not None:
+            cache.store(fingerprint, staging)
+        _swap_into_place(staging)
+    finally:
+        staging.unlink(missing_ok=True)
 
-    tables_info = _do_import(feed)
     return {
         "status": "imported",
         "message": "GTFS data uspesne nacitane do databazy.",
-        "tables": tables_info,
+        "source": "csv",
+        "feed_fingerprint": fingerprint,
+        "tables": report.row_counts(),
+        "timings": report.to_dict(),
+        "db_path": str(DB_PATH),
+    }
+
+
+def _staging_path() -> Path:
+    """Novy prazdny staging subor vedla current.db (rovnaky filesystem -> atomicky rename)."""
+    fd, name = tempfile.mkstemp(prefix=".current-", suffix=".staging.db", dir=WORK_DIR)
+    os.close(fd)
+    return Path(name)
+
+
+def _swap_into_place(staging: Path) -> None:
+    """
+    Atomicky nahradi current.db hotovym staging suborom (os.replace).
+
+    Otvorene spojenia citaju dalej stary subor (unlinknuty inode zostava
+    platny, kym ho niekto drzi), nove spojenia uz otvoria novy. Pocas
+    vymeny sa drzi RESERVED zamok starej DB, aby ziadny zapis nemal
+    rozpracovany rollback journal, ktory by sa potom vztahoval k novemu suboru.
+    """
+    if not DB_PATH.exists():
+        os.replace(staging, DB_PATH)
+        _connections.invalidate()
+        return
+    with write_connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            os.replace(staging, DB_PATH)
+        finally:
+            conn.execute("ROLLBACK")
+    _connections.invalidate()
+
+
+def _feed_meta(feed: Path, fingerprint: str | None) -> dict[str, str]:
+    """Zaznamy gtfs_meta pre naimportovany feed (odtlacok len ak bol spocitany)."""
+    meta = {
+        "feed_path": str(feed),
+        "imported_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    if fingerprint is not None:
+        meta["feed_fingerprint"] = fingerprint
+    return meta
+
+
+# ---------------------------------------------------------------------------
+# Inkrementalny import
+# ---------------------------------------------------------------------------
+
+
+def _incremental_import(source: FeedSource, feed: Path, progress: ImportProgress | None = None) -> dict:
+    """
+    Aplikuje na current.db len rozdiel noveho feedu.
+
+    Novy feed sa pripravi ako pristine snapshot (z import cache alebo bulk
+    importom do staging suboru). Ak je v cache aj snapshot feedu, z ktoreho
+    current.db vznikla, rozdiel sa pocita trojcestne (stary feed -> novy feed)
+    a lokalne patche na nezmenenych riadkoch sa zachovaju; inak sa novy feed
+    porovnava priamo s current.db.
+    """
+    cache = _import_cache()
+    fingerprint = feed_fingerprint(source, list(GTFS_TABLES), str(SCHEMA_VERSION))
+
+    with read_connection() as conn:
+        current_meta = _read_meta(conn)
+
+    if current_meta.get("feed_fingerprint") == fingerprint:
+        return {
+            "status": "up_to_date",
+            "message": "Feed sa od posledneho importu nezmenil, databaza ostava bez zmien.",
+            "feed_fingerprint": fingerprint,
+            "changes": {},
+            "tables": _get_table_counts(),
+            "db_path": str(DB_PATH),
+        }
+
+    new_snapshot = cache.lookup(fingerprint)
+    staging: Path | None = None
+    report: ImportReport | None = None
+    try:
+        if new_snapshot is None:
+            staging = _staging_path()
+            report = _do_import(source, meta=_feed_meta(feed, fingerprint), db_path=staging, progress=progress)
+            cache.store(fingerprint, staging)
+            new_snapshot = staging
+
+        # Az po store — evikcia by mohla zmazat skorsie najdeny snapshot.
+        base_fingerprint = current_meta.get("feed_fingerprint")
+        base_snapshot = cache.lookup(base_fingerprint) if base_fingerprint else None
+        changes = _apply_feed_delta(new_snapshot, base_snapshot, _feed_meta(feed, fingerprint))
+    finally:
+        if staging is not None:
+            staging.unlink(missing_ok=True)
+
+    result = {
+        "status": "incremental",
+        "message": "Aplikovane len zmenene riadky noveho feedu.",
+        "feed_fingerprint": fingerprint,
+        "diff_base": "previous_feed" if base_snapshot else "current_db",
+        "changes": changes,
+        "tables": _get_table_counts(),
         "db_path": str(DB_PATH),
     }
+    if report is not None:
+        result["timings"] = report.to_dict()
+    return result
+
+
+def _apply_feed_delta(new_db: Path, base_db: Path | None, meta: dict[str, str]) -> dict[str, dict[str, int]]:
+    """
+    V jednej transakcii prenesie do current.db vlozene, zmenene a zmazane
+    riadky (porovnanie podla primarnych klucov z _SCHEMA_SQL). Nezmenene
+    riadky sa neprepisuju, audit triggery zaznamenaju len realne zmeny.
+    """
+    # Vlastne spojenie bez foreign_keys (poradie tabuliek pri mazani), ale
+    # serializovane so zapismi cez writer zamok.
+    changes: dict[str, dict[str, int]] = {}
+    with _connections.write_lock:
+        conn = sqlite3.connect(str(DB_PATH), isolation_level=None, uri=True)
+        try:
+            conn.execute("ATTACH DATABASE ? AS new", (f"file:{new_db}?mode=ro",))
+            base = "main"
+            if base_db is not None:
+                conn.execute("ATTACH DATABASE ? AS base", (f"file:{base_db}?mode=ro",))
+                base = "base"
+
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for table in GTFS_TABLES.values():
+                    changes[table] = _apply_table_delta(conn, table, base)
+                conn.executemany("INSERT OR REPLACE INTO main.gtfs_meta (key, value) VALUES (?, ?)", meta.items())
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+    return changes
+
+
+def _primary_key(conn: sqlite3.Connection, table: str) -> list[str]:
+    """Stlpce primarneho kluca tabulky v poradi definicie."""
+    info = conn.execute(f"PRAGMA main.table_info({table})").fetchall()
+    return [row[1] for row in sorted(info, key=lambda r: r[5]) if row[5] > 0]
+
+
+def _apply_table_delta(conn: sqlite3.Connection, table: str, base: str) -> dict[str, int]:
+    """Delta jednej tabulky: base (stary stav) -> new (novy feed), aplikovana na main."""
+    pk = _primary_key(conn, table)
+    cols = _TABLE_COLUMNS[table]
+    data_cols = [c for c in cols if c not in pk]
+
+    def same_key(a: str, b: str) -> str:
+        return " AND ".join(f"{a}.{c} = {b}.{c}" for c in pk)
+
+    def differs(a: str, b: str) -> str:
+        return " OR ".join(f"{a}.{c} IS NOT {b}.{c}" for c in data_cols)
+
+    def identical(a: str, b: str) -> str:
+        return same_key(a, b) + (f" AND NOT ({differs(a, b)})" if data_cols else "")
+
+    pk_list = ", ".join(pk)
+    col_list = ", ".join(cols)
+
+    deleted = conn.execute(
+        f"""
+        DELETE FROM main.{table} WHERE ({pk_list}) IN (
+            SELECT {", ".join(f"b.{c}" for c in pk)} FROM {base}.{table} AS b
+            WHERE NOT EXISTS (SELECT 1 FROM new.{table} AS n WHERE {same_key("n", "b")})
+        )
+        """
+    ).rowcount
+
+    # Novy kluc feedu, alebo riadok zmeneny feedom, ktory bol lokalne zmazany
+    # (zmena feedu ma prednost); lokalne zmazany nezmeneny riadok ostane zmazany.
+    inserted = conn.execute(
+        f"""
+        INSERT OR REPLACE INTO main.{table} ({col_list})
+        SELECT {", ".join(f"n.{c}" for c in cols)} FROM new.{table} AS n
+        WHERE (
+            NOT EXISTS (SELECT 1 FROM {base}.{table} AS b WHERE {same_key("b", "n")})
+            OR (
+              NOT EXISTS (SELECT 1 FROM main.{table} AS m WHERE {same_key("m", "n")})
+              AND NOT EXISTS (SELECT 1 FROM {base}.{table} AS b WHERE {identical("b", "n")})
+            )
+          )
+          AND NOT EXISTS (SELECT 1 FROM main.{table} AS m WHERE {identical("m", "n")})
+        """
+    ).rowcount
+
+    updated = 0
+    if data_cols:
+        base_join = f"JOIN base.{table} AS b ON {same_key('b', 'n')}" if base == "base" else ""
+        base_changed = f"AND ({differs('n', 'b')})" if base == "base" else ""
+        updated = conn.execute(
+            f"""
+            UPDATE main.{table} AS m
+            SET ({", ".join(data_cols)}) = ({", ".join(f"n.{c}" for c in data_cols)})
+            FROM new.{table} AS n {base_join}
+            WHERE {same_key("m", "n")} {base_changed} AND ({differs("m", "n")})
+            """
+        ).rowcount
+
+    return {"inserted": inserted, "updated": updated, "deleted": deleted}
+
+
+def _read_meta(conn: sqlite3.Connection) -> dict[str, str]:
+    """Precita gtfs_meta (prazdny dict pre DB bez tejto tabulky)."""
+    try:
+        return dict(conn.execute("SELECT key, value FROM gtfs_meta").fetchall())
+    except sqlite3.OperationalError:
+        return {}
+
+
+def list_import_cache() -> dict:
+    """Vrati snapshoty v import cache (od naposledy pouziteho) a ich celkovu velkost."""
+    cache = _import_cache()
+    entries = [e.to_dict() for e in cache.entries()]
+    return {
+        "entries": entries,
+        "count": len(entries),
+        "total_bytes": sum(e["size_bytes"] for e in entries),
+        "max_bytes": cache.max_bytes,
+    }
+
+
+def purge_import_cache(fingerprint: str | None = None) -> dict:
+    """Zmaze snapshot s danym odtlackom, alebo celu import cache."""
+    removed = _import_cache().purge(fingerprint)
+    return {"status": "purged", "removed": removed}
 
 
 def reset_db() -> dict:
     """Vymaze aktualnu databazu (pre fresh import)."""
     if DB_PATH.exists():
-        DB_PATH.unlink()
+        with _connections.write_lock:
+            DB_PATH.unlink()
+        _connections.invalidate()
         return {"status": "reset", "message": "Databaza vymazana. Pouzi gtfs_load pre novy import."}
     return {"status": "no_db", "message": "Ziadna databaza neexistovala."}
 
 
 def _get_table_counts() -> dict[str, int]:
     """Vrati pocty riadkov v existujucej DB."""
-    conn = sqlite3.connect(str(DB_PATH))
     counts: dict[str, int] = {}
-    for table in GTFS_TABLES.values():
-        try:
-            row = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()
-            counts[table] = row[0]
-        except Exception:
-            counts[table] = 0
-    conn.close()
+    with read_connection() as conn:
+        for table in GTFS_TABLES.values():
+            try:
+                row = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()
+                counts[table] = row[0]
+            except Exception:
+                counts[table] = 0
     return counts
 
 
@@ -360,38 +980,368 @@ def _check_db() -> None:
         raise FileNotFoundError("Databaza neexistuje. Najprv zavolaj gtfs_load('data/gtfs_latest') pre nacitanie dat.")
 
 
+def list_indexes() -> list[dict]:
+    """
+    Zoznam indexov v current.db s velkostou na disku.
+
+    Vrati [{name, table, columns, managed, size_bytes}, ...]; managed = index
+    spravovany importom (`_INDEXES`), ostatne su autoindexy primarnych klucov
+    alebo rucne vytvorene. size_bytes je None, ak SQLite nema dbstat.
+    """
+    _check_db()
+    with read_connection() as conn:
+        try:
+            sizes = {row[0]: row[1] for row in conn.execute("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name")}
+        except sqlite3.OperationalError:
+            sizes = {}
+        indexes = []
+        rows = conn.execute(
+            "SELECT name, tbl_name FROM sqlite_master WHERE type = 'index' ORDER BY tbl_name, name"
+        ).fetchall()
+        for name, table in rows:
+            columns = [info[2] for info in conn.execute(f"PRAGMA index_info('{name}')")]
+            indexes.append(
+                {
+                    "name": name,
+                    "table": table,
+                    "columns": columns,
+                    "managed": name in _INDEXES,
+                    "size_bytes": sizes.get(name),
+                }
+            )
+    return indexes
+
+
 # ---------------------------------------------------------------------------
 # Query
 # ---------------------------------------------------------------------------
 
+_result_cache = ResultCache()
+
 _FORBIDDEN_KEYWORDS = {"INSERT", "UPDATE", "DELETE", "DROP", "ALTER", "CREATE", "ATTACH", "DETACH"}
 
+# Rozpocet jedneho dotazu (0 = bez limitu). Agregacia cez 1M stop_times
+# je ~5-10M krokov VM, kartezsky join nad stop_times o rady viac.
+QUERY_TIMEOUT_MS = int(os.getenv("GTFS_QUERY_TIMEOUT_MS", "10000"))
+QUERY_MAX_VM_STEPS = int(os.getenv("GTFS_QUERY_MAX_VM_STEPS", "200000000"))
+# Progress handler sa vola kazdych N instrukcii VM
+_PROGRESS_INTERVAL = 10_000
+
+
+class QueryBudgetExceededError(RuntimeError):
+    """Dotaz prekrocil casovy alebo krokovy rozpocet a bol zruseny."""
+
+    def __init__(
+        self, reason: str, elapsed_ms: float, vm_steps: int, plan: list[str], timeout_ms: int, max_vm_steps: int
+    ) -> None:
+        self.reason = reason
+        self.elapsed_ms = elapsed_ms
+        self.vm_steps = vm_steps
+        self.plan = plan
+        self.timeout_ms = timeout_ms
+        self.max_vm_steps = max_vm_steps
+        limit = f"{timeout_ms} ms" if reason == "time" else f"{max_vm_steps} krokov VM"
+        super().__init__(
+            f"Dotaz zruseny: prekroceny rozpocet ({limit}). "
+            "Zuz dotaz filtrom na indexovany stlpec, vyhni sa kartezskemu joinu alebo pouzi strankovanie."
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "error": str(self),
+            "code": "budget_exceeded",
+            "reason": self.reason,
+            "elapsed_ms": self.elapsed_ms,
+            "vm_steps": self.vm_steps,
+            "budget": {"timeout_ms": self.timeout_ms, "max_vm_steps": self.max_vm_steps},
+            "query_plan": self.plan,
+        }
 
-def run_query(sql: str, limit: int = 500) -> list[dict]:
-    """
-    Vykona read-only SELECT dotaz nad aktualnou DB.
-    Ak dotaz nema LIMIT, doplni sa predvoleny `limit`.
-    """
+
+def _check_select(sql: str) -> None:
+    """Povoli len jeden read-only SELECT (zakazane klucove slova ako samostatne slova)."""
     _check_db()
 
     sql_upper = sql.strip().upper()
+    words = set(sql_upper.split())
     for kw in _FORBIDDEN_KEYWORDS:
-        if kw in sql_upper.split():
+        if kw in words:
             raise ValueError(f"Zakazany SQL prikaz: {kw}. Len SELECT je povoleny.")
 
     if not sql_upper.startswith("SELECT"):
         raise ValueError("Len SELECT dotazy su povolene.")
 
-    conn = sqlite3.connect(str(DB_PATH))
-    conn.row_factory = sqlite3.Row
+
+def _select(sql: str, params: list | None = None) -> list[dict]:
+    """SELECT na pooled citacom spojeni, vysledok z/do LRU cache podla verzie DB."""
+    version = database_version()
+    cache_key = (normalize_sql(sql), tuple(params or ()))
+    cached = _result_cache.get(cache_key, version)
+    if cached is not None:
+        return cached
+
+    with read_connection() as conn:
+        rows = _execute_with_budget(conn, sql, params or [])
+    _result_cache.put(cache_key, version, rows)
+    return rows
+
+
+def _fetch_all(cursor: sqlite3.Cursor) -> list[dict]:
+    rows = [dict(r) for r in cursor.fetchall()]
+    _connections.note_rows(cursor.connection, len(rows))
+    return rows
+
+
+def _execute_with_budget(
+    conn: sqlite3.Connection,
+    sql: str,
+    params: list,
+    consume: Callable[[sqlite3.Cursor], Any] = _fetch_all,
+) -> Any:
+    """
+    Vykona dotaz pod progress handlerom, ktory ho prerusi po prekroceni
+    QUERY_TIMEOUT_MS alebo QUERY_MAX_VM_STEPS. `consume` precita kurzor
+    (predvolene vsetky riadky ako dict) — aj citanie bezi pod rozpoctom.
+    Handler sa po dotaze odstrani (spojenie sa vracia do poolu).
+    """
+    timeout_ms, max_steps = QUERY_TIMEOUT_MS, QUERY_MAX_VM_STEPS
+    started = time.perf_counter()
+    deadline = started + timeout_ms / 1000
+    state = {"steps": 0, "reason": None}
+
+    def check_budget() -> int:
+        state["steps"] += _PROGRESS_INTERVAL
+        if max_steps and state["steps"] > max_steps:
+            state["reason"] = "vm_steps"
+        elif timeout_ms and time.perf_counter() > deadline:
+            state["reason"] = "time"
+        return 1 if state["reason"] else 0
+
+    if timeout_ms or max_steps:
+        conn.set_progress_handler(check_budget, _PROGRESS_INTERVAL)
     try:
-        if "LIMIT" not in sql_upper:
-            sql = sql.rstrip("; ") + f" LIMIT {limit}"
-        cursor = conn.execute(sql)
-        rows = [dict(r) for r in cursor.fetchall()]
-        return rows
+        return consume(conn.execute(sql, params))
+    except sqlite3.OperationalError:
+        if state["reason"] is None:
+            raise
+        conn.set_progress_handler(None, 0)
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+        plan = _query_plan(conn, sql, params)
+        raise QueryBudgetExceededError(
+            state["reason"], elapsed_ms, state["steps"], plan, timeout_ms, max_steps
+        ) from None
     finally:
-        conn.close()
+        conn.set_progress_handler(None, 0)
+
+
+def _query_plan(conn: sqlite3.Connection, sql: str, params: list) -> list[str]:
+    """EXPLAIN QUERY PLAN ako odsadene riadky (ako v sqlite3 shell)."""
+    depth: dict[int, int] = {0: -1}
+    lines = []
+    for node_id, parent, _, detail in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params):
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node_id] + detail)
+    return lines
+
+
+# Limit odpovede run_query_bounded (odhad bajtov ako v result cache); nad nim spill
+RESULT_MAX_BYTES = int(os.getenv("GTFS_QUERY_MAX_RESULT_BYTES", str(128 * 1024)))
+SPILL_PREVIEW_ROWS = 20
+_FETCH_BATCH = 1000
+
+
+def _spill_store() -> SpillStore:
+    """Spill subory velkych vysledkov vedla aktualnej DB (nasleduje WORK_DIR)."""
+    return SpillStore(WORK_DIR / "results")
+
+
+def run_query(sql: str, limit: int = 500) -> list[dict]:
+    """
+    Vykona read-only SELECT dotaz nad aktualnou DB.
+    Ak vonkajsi dotaz nema LIMIT, doplni sa predvoleny `limit`.
+    """
+    _check_select(sql)
+    if not has_top_level_limit(sql):
+        # Novy riadok — dotaz moze koncit '--' komentarom
+        sql = sql.strip().rstrip(";").rstrip() + f"\nLIMIT {int(limit)}"
+    return _select(sql)
+
+
+def run_query_bounded(sql: str, max_rows: int = 500, max_bytes: int | None = None) -> dict:
+    """
+    Vykona SELECT bez doplneneho LIMIT, ale s limitom riadkov aj bajtov
+    pre odpoved. Maly vysledok vrati cely ({"rows", "count"}). Vacsi sa
+    streamuje do spill suboru (MCP resource) a vrati sa len suhrn: pocet
+    riadkov, statistiky stlpcov, prvych SPILL_PREVIEW_ROWS riadkov a URI.
+    Po naplneni spill suboru (GTFS_SPILL_MAX_ROWS / GTFS_SPILL_MAX_BYTES)
+    sa kurzor dalej necita — suhrn je potom len za precitane riadky.
+    """
+    _check_select(sql)
+    max_bytes = RESULT_MAX_BYTES if max_bytes is None else max_bytes
+
+    version = database_version()
+    cache_key = (normalize_sql(sql), "bounded", max_rows, max_bytes)
+    cached = _result_cache.get(cache_key, version)
+    if cached is not None:
+        return {"rows": cached, "count": len(cached)}
+
+    consume = functools.partial(_consume_bounded, max_rows=max_rows, max_bytes=max_bytes)
+    with read_connection() as conn:
+        result = _execute_with_budget(conn, sql, [], consume)
+    if "spilled" not in result:
+        _result_cache.put(cache_key, version, result["rows"])
+    return result
+
+
+def _consume_bounded(cursor: sqlite3.Cursor, max_rows: int, max_bytes: int) -> dict:
+    """Riadky do limitu drzi v pamati; po jeho prekroceni vsetko streamuje do spill suboru."""
+    columns = [d[0] for d in cursor.description]
+    buffered: list[dict] = []
+    size = 0
+    writer = None
+    stats = ColumnStats(columns)
+    try:
+        while batch := cursor.fetchmany(_FETCH_BATCH):
+            for row in batch:
+                if writer is None:
+                    item = dict(row)
+                    buffered.append(item)
+                    size += estimate_bytes([item])
+                    if len(buffered) <= max_rows and size <= max_bytes:
+                        continue
+                    writer = _spill_store().create(columns)
+                    for kept in buffered:
+                        values = list(kept.values())
+                        writer.write(values)
+                        stats.add(values)
+                    del buffered[min(SPILL_PREVIEW_ROWS, max_rows) :]
+                elif writer.write(row):
+                    stats.add(row)
+                else:
+                    break
+            if writer is not None and writer.truncated:
+                break
+    except BaseException:
+        if writer is not None:
+            writer.discard()
+        raise
+
+    if writer is None:
+        _connections.note_rows(cursor.connection, len(buffered))
+        return {"rows": buffered, "count": len(buffered)}
+
+    spilled = writer.close()
+    _connections.note_rows(cursor.connection, spilled["rows"])
+    return {
+        "rows": buffered,
+        "count": len(buffered),
+        "total_rows": spilled["rows"],
+        "column_stats": stats.to_dict(),
+        "spilled": spilled,
+        "message": (
+            (
+                f"Vysledok ma viac ako {spilled['rows']} riadkov (citanie sa zastavilo na limite spill suboru)"
+                if spilled["truncated"]
+                else f"Vysledok ma {spilled['rows']} riadkov"
+            )
+            + f" — vratenych je prvych {len(buffered)}, vsetky su v {spilled['uri']} "
+            + f"({spilled['pages']} stran, dalsie cez page_uri). "
+            "Pre dalsie riadky pouzi agregaciu, presnejsi filter alebo page_size/cursor."
+        ),
+    }
+
+
+def read_spilled_result(name: str) -> str:
+    """Strana spill suboru (CSV/JSONL) podla mena alebo URI gtfs://results/<handle>[.p<N>].<format>."""
+    return _spill_store().read_page(name)
+
+
+def run_query_page(sql: str, page_size: int = DEFAULT_PAGE_SIZE, cursor: str | None = None) -> dict:
+    """
+    Jedna strana vysledku SELECT dotazu s keyset strankovanim.
+
+    Poradie urcuje ORDER BY dotazu (len stlpce vysledku), inak prvy stlpec.
+    Dalsia strana sa ziska tym istym SQL a `next_cursor` z predchadzajucej;
+    kazda strana pokracuje priamo za poslednym klucom, bez OFFSET.
+    """
+    if not 1 <= page_size <= MAX_PAGE_SIZE:
+        raise ValueError(f"page_size musi byt 1 az {MAX_PAGE_SIZE}.")
+    _check_select(sql)
+
+    base, order = split_order_by(sql)
+    digest = query_digest(sql)
+    if cursor:
+        keys, after = decode_cursor(cursor, digest)
+    else:
+        keys, after = _resolve_order_keys(base, order), None
+
+    page_sql, params = keyset_sql(base, keys, after, page_size + 1)
+    rows = _select(page_sql, params)
+
+    next_cursor = None
+    if len(rows) > page_size:
+        last = [rows[page_size - 1][name] for name, _ in keys]
+        following = [rows[page_size][name] for name, _ in keys]
+        if any(value is None for value in last):
+            raise ValueError(
+                "Kluc strankovania ma na hranici strany hodnotu NULL. "
+                "Zorad podla stlpca bez NULL (napr. primarneho kluca)."
+            )
+        if last == following:
+            raise ValueError(
+                f"Kluc strankovania {[name for name, _ in keys]} nie je jedinecny (rovnaka hodnota na hranici strany). "
+                "Pridaj do ORDER BY jedinecny stlpec, napr. ORDER BY route_id, trip_id."
+            )
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(digest, keys, last)
+
+    return {
+        "rows": rows,
+        "count": len(rows),
+        "order_by": [f"{name} DESC" if desc else name for name, desc in keys],
+        "next_cursor": next_cursor,
+    }
+
+
+def _resolve_order_keys(base: str, order: list[OrderKey] | None) -> list[tuple[str, bool]]:
+    """Kluce strankovania ako nazvy stlpcov vysledku (pozicie z ORDER BY 1, 2 sa prelozia)."""
+    with read_connection() as conn:
+        columns = [d[0] for d in conn.execute(f"SELECT * FROM (\n{base}\n) LIMIT 0").description]
+    if order is None:
+        return [(columns[0], False)]
+
+    keys = []
+    lowered = {c.lower(): c for c in columns}
+    for key, desc in order:
+        if isinstance(key, int):
+            if not 1 <= key <= len(columns):
+                raise ValueError(f"ORDER BY {key} je mimo rozsahu stlpcov vysledku.")
+            keys.append((columns[key - 1], desc))
+        elif key.lower() in lowered:
+            keys.append((lowered[key.lower()], desc))
+        else:
+            raise ValueError(
+                f"Stlpec ORDER BY '{key}' nie je vo vysledku dotazu — pridaj ho do SELECT (strankovanie podla neho pokracuje)."
+            )
+    return keys
+
+
+def query_cache_stats() -> dict:
+    """Statistiky cache vysledkov run_query (hits, misses, evictions, velkost)."""
+    return _result_cache.stats()
+
+
+def statement_stats(top: int = 20, order_by: str = "total_ms", reset: bool = False) -> dict:
+    """
+    Top-N SQL prikazov vsetkych nastrojov (dotazy, diff, validacia, apply)
+    podla fingerprintu, posledne pomale prikazy a stav cache vysledkov.
+    `reset` vrati aktualny stav a potom statistiky vynuluje.
+    """
+    stats = {**_statement_stats.summary(top, order_by), "enabled": SQL_STATS_ENABLED}
+    stats["result_cache"] = query_cache_stats()
+    if reset:
+        _statement_stats.reset()
+    return stats
 
 
 # ---------------------------------------------------------------------------
@@ -408,10 +1358,7 @@ def export_to_gtfs(output_path: str) -> str:
     out = Path(output_path)
     out.parent.mkdir(parents=True, exist_ok=True)
 
-    conn = sqlite3.connect(str(DB_PATH))
-    conn.row_factory = sqlite3.Row
-
-    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zf:
+    with read_connection() as conn, zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zf:
         for txt_file, table in GTFS_TABLES.items():
             cols = _EXPORT_COLUMNS[table]
             cursor = conn.execute(f"SELECT {', '.join(cols)} FROM {table}")
@@ -425,5 +1372,4 @@ def export_to_gtfs(output_path: str) -> str:
                 writer.writerow(values)
             zf.writestr(txt_file, buffer.getvalue())
 
-    conn.close()
     return str(out)
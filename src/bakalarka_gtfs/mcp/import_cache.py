@@ -0,0 +1,167 @@
+"""
+import_cache.py — Content-addressed cache of pristine imported databases.
+
+After a full CSV import the fresh database is copied into the cache under
+the feed fingerprint. Loading the same feed again is then a file copy
+instead of a parse + insert + index build. The cache is bounded by size
+and evicts the least recently used snapshots.
+
+Functions:
+  - feed_fingerprint(source, names, schema_tag) — SHA-256 of the feed content
+  - ImportCache(directory, max_bytes)            — lookup / store / entries / purge
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import shutil
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from .import_pipeline import FeedSource
+
+# Predvolene 2 GiB snapshotov; 0 vypne cache.
+DEFAULT_MAX_BYTES = int(os.getenv("GTFS_IMPORT_CACHE_MAX_BYTES", str(2 * 1024**3)))
+
+_SNAPSHOT_SUFFIX = ".db"
+# Odtlacok je SHA-256 hexdigest — nic ine sa do cesty nedostane
+_FINGERPRINT = re.compile(r"[0-9a-f]{64}")
+
+
+def feed_fingerprint(source: FeedSource, names: list[str], schema_tag: str) -> str:
+    """
+    Odtlacok feedu: SHA-256 z obsahu importovanych suborov + verzie schemy.
+    ZIP aj adresar s rovnakym obsahom maju rovnaky odtlacok; zmena schemy
+    (schema_tag) zneplatni vsetky stare snapshoty.
+    """
+    digest = hashlib.sha256(f"schema:{schema_tag}\n".encode())
+    for name in names:
+        if not source.has(name):
+            continue
+        digest.update(f"file:{name}\n".encode())
+        with source.open(name) as f:
+            while chunk := f.read(1024 * 1024):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+@dataclass
+class CacheEntry:
+    """Jeden snapshot v import cache."""
+
+    fingerprint: str
+    size_bytes: int
+    last_used: float
+    feed_path: str | None
+
+    def to_dict(self) -> dict:
+        return {
+            "fingerprint": self.fingerprint,
+            "size_bytes": self.size_bytes,
+            "last_used": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.last_used)),
+            "feed_path": self.feed_path,
+        }
+
+
+class ImportCache:
+    """Adresar pristine DB snapshotov `<fingerprint>.db` s LRU evikciou podla velkosti."""
+
+    def __init__(self, directory: Path, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _path(self, fingerprint: str) -> Path:
+        if not _FINGERPRINT.fullmatch(fingerprint):
+            raise ValueError(f"Neplatny odtlacok feedu: {fingerprint!r} (ocakava sa SHA-256 hex).")
+        return self.directory / f"{fingerprint}{_SNAPSHOT_SUFFIX}"
+
+    def lookup(self, fingerprint: str) -> Path | None:
+        """Vrati cestu k snapshotu (a oznaci ho ako naposledy pouzity), inak None."""
+        path = self._path(fingerprint)
+        if not self.enabled or not path.exists():
+            return None
+        os.utime(path)
+        return path
+
+    def restore(self, fingerprint: str, target: Path) -> bool:
+        """Skopiruje snapshot do `target`. Vrati False pri cache miss."""
+        snapshot = self.lookup(fingerprint)
+        if snapshot is None:
+            return False
+        shutil.copyfile(snapshot, target)
+        return True
+
+    def store(self, fingerprint: str, db_file: Path) -> bool:
+        """
+        Ulozi kopiu cerstvo importovanej DB pod odtlacok a spusti evikciu.
+        Snapshot vacsi ako cely limit sa neuklada.
+        """
+        if not self.enabled or db_file.stat().st_size > self.max_bytes:
+            return False
+        target = self._path(fingerprint)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp = self.directory / f".{fingerprint}.{os.getpid()}.tmp"
+        shutil.copyfile(db_file, tmp)
+        os.replace(tmp, target)
+        self._evict(keep=fingerprint)
+        return True
+
+    def _snapshots(self) -> list[Path]:
+        """Subory snapshotov; ine *.db v adresari (bez odtlacku v nazve) sa ignoruju."""
+        if not self.directory.exists():
+            return []
+        return [path for path in self.directory.glob(f"*{_SNAPSHOT_SUFFIX}") if _FINGERPRINT.fullmatch(path.stem)]
+
+    def entries(self) -> list[CacheEntry]:
+        """Zoznam snapshotov od naposledy pouziteho."""
+        entries = []
+        for path in self._snapshots():
+            stat = path.stat()
+            entries.append(CacheEntry(path.stem, stat.st_size, stat.st_mtime, _read_feed_path(path)))
+        return sorted(entries, key=lambda e: e.last_used, reverse=True)
+
+    def purge(self, fingerprint: str | None = None) -> int:
+        """Zmaze jeden snapshot alebo celu cache. Vrati pocet zmazanych."""
+        targets = [self._path(fingerprint)] if fingerprint else self._snapshots()
+        removed = 0
+        for path in targets:
+            if path.exists():
+                path.unlink()
+                removed += 1
+        return removed
+
+    def _evict(self, keep: str) -> None:
+        """Maze najdlhsie nepouzivane snapshoty, kym cache neprekracuje max_bytes."""
+        entries = self.entries()
+        total = sum(e.size_bytes for e in entries)
+        for entry in reversed(entries):
+            if total <= self.max_bytes:
+                break
+            if entry.fingerprint == keep:
+                continue
+            self._path(entry.fingerprint).unlink(missing_ok=True)
+            total -= entry.size_bytes
+
+
+def _read_feed_path(snapshot: Path) -> str | None:
+    """Precita povodnu cestu feedu z gtfs_meta snapshotu (read-only)."""
+    try:
+        conn = sqlite3.connect(f"file:{snapshot}?mode=ro", uri=True)
+        try:
+            row = conn.execute("SELECT value FROM gtfs_meta WHERE key = 'feed_path'").fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+    return row[0] if row else None
@@ -0,0 +1,276 @@
+"""
+import_pipeline.py — Parallel CSV parsing for the GTFS import.
+
+The main process reads every CSV file in byte chunks (cut on record
+boundaries) straight from a directory or from ZIP members — nothing is
+extracted to disk. A process pool turns the chunks into row tuples, and
+the finished batches stream back in file order to the single SQLite
+writer in database._do_import.
+
+Functions:
+  - open_feed(path)              — FeedSource for a GTFS directory or ZIP
+  - parse_files(source, files)   — yield (table, rows, nbytes) batches in file order
+  - default_workers()            — number of parser processes (GTFS_IMPORT_WORKERS)
+  - ImportReport                 — per-table rows and parse/insert/index/trigger timings
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import multiprocessing
+import os
+import zipfile
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path, PurePosixPath
+from typing import IO, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator
+
+    # progress(hotovo_bajtov, spolu_bajtov, sprava) — rovnaky tvar ako MCP progress
+    ImportProgress = Callable[[float, float, str], None]
+
+# Velkost jedneho chunku — velke subory (stop_times.txt, shapes.txt) sa
+# rozdelia na viac uloh, male tabulky su jedna uloha.
+CHUNK_BYTES = int(os.getenv("GTFS_IMPORT_CHUNK_BYTES", str(8 * 1024 * 1024)))
+
+_BOM = b"\xef\xbb\xbf"
+
+
+def default_workers() -> int:
+    """Pocet parser procesov: GTFS_IMPORT_WORKERS, inak pocet CPU."""
+    configured = int(os.getenv("GTFS_IMPORT_WORKERS", "0") or 0)
+    if configured > 0:
+        return configured
+    return os.cpu_count() or 1
+
+
+@dataclass(frozen=True)
+class FeedSource:
+    """
+    GTFS feed na citanie — adresar alebo ZIP archiv.
+
+    Pri ZIP je `prefix` cesta GTFS rootu v archive ("" alebo napr. "feed/"),
+    subory sa citaju priamo z clenov archivu bez rozbalovania na disk.
+    """
+
+    path: Path
+    prefix: str | None = None
+
+    @property
+    def is_zip(self) -> bool:
+        return self.prefix is not None
+
+    def has(self, name: str) -> bool:
+        """Ci feed obsahuje subor `name` (napr. "stops.txt")."""
+        if not self.is_zip:
+            return (self.path / name).is_file()
+        with zipfile.ZipFile(self.path) as zf:
+            return f"{self.prefix}{name}" in zf.NameToInfo
+
+    def size(self, name: str) -> int:
+        """Nekomprimovana velkost suboru feedu v bajtoch."""
+        if not self.is_zip:
+            return (self.path / name).stat().st_size
+        with zipfile.ZipFile(self.path) as zf:
+            return zf.getinfo(f"{self.prefix}{name}").file_size
+
+    @contextmanager
+    def open(self, name: str) -> Iterator[IO[bytes]]:
+        """Otvori subor feedu ako binarny stream (ZIP clen sa dekomprimuje priebezne)."""
+        if not self.is_zip:
+            with open(self.path / name, "rb") as f:
+                yield f
+            return
+        with zipfile.ZipFile(self.path) as zf, zf.open(f"{self.prefix}{name}") as f:
+            yield f
+
+    def __str__(self) -> str:
+        return f"{self.path}!/{self.prefix}" if self.is_zip else str(self.path)
+
+
+def find_zip_root(names: list[str], max_depth: int = 3) -> str | None:
+    """
+    Hlada GTFS root (adresar so stops.txt) medzi clenmi ZIP archivu.
+    Podporuje stops.txt priamo v roote aj vnoreny v podpriecinkoch (max_depth
+    urovni); skryte a systemove priecinky (".", "__MACOSX") preskakuje.
+    Pri viacerych kandidatoch vyhra najplytsi, potom abecedne prvy.
+    """
+    candidates: list[tuple[int, str]] = []
+    for name in names:
+        parts = PurePosixPath(name).parts
+        if not parts or parts[-1] != "stops.txt":
+            continue
+        dirs = parts[:-1]
+        if len(dirs) > max_depth or any(d.startswith((".", "__")) for d in dirs):
+            continue
+        candidates.append((len(dirs), "".join(f"{d}/" for d in dirs)))
+    return min(candidates)[1] if candidates else None
+
+
+def open_feed(path: Path) -> FeedSource | None:
+    """Vrati FeedSource pre GTFS adresar alebo ZIP; None ak feed neobsahuje stops.txt."""
+    if path.suffix.lower() == ".zip":
+        with zipfile.ZipFile(path) as zf:
+            prefix = find_zip_root(zf.namelist())
+        return FeedSource(path, prefix) if prefix is not None else None
+    if path.is_dir() and (path / "stops.txt").exists():
+        return FeedSource(path)
+    return None
+
+
+@dataclass(frozen=True)
+class ParseTask:
+    """Jeden chunk CSV suboru na parsovanie (picklovatelny pre worker proces)."""
+
+    table: str
+    columns: tuple[str, ...]
+    header: tuple[str, ...]
+    data: bytes
+
+
+def parse_chunk(task: ParseTask) -> tuple[str, list[tuple], int]:
+    """
+    Parsuje chunk na tuple v poradi `task.columns` (prazdne hodnoty -> None).
+    Vrati (tabulka, riadky, velkost chunku v bajtoch).
+    """
+    positions = [task.header.index(c) if c in task.header else None for c in task.columns]
+    rows: list[tuple] = []
+    for record in csv.reader(io.StringIO(task.data.decode("utf-8"), newline="")):
+        if not record:
+            continue
+        width = len(record)
+        rows.append(tuple((record[i] or None) if i is not None and i < width else None for i in positions))
+    return task.table, rows, len(task.data)
+
+
+def _split_point(block: bytes) -> int:
+    """
+    Vrati poziciu za poslednym koncom riadku, ktory nie je vnutri uvodzoviek.
+    CSV zdvojuje uvodzovky, takze parny pocet '"' pred zlomom = hranica zaznamu.
+    """
+    cut = block.rfind(b"\n")
+    while cut != -1:
+        if block.count(b'"', 0, cut) % 2 == 0:
+            return cut + 1
+        cut = block.rfind(b"\n", 0, cut)
+    return 0
+
+
+def iter_tasks(
+    source: FeedSource, name: str, table: str, columns: list[str], chunk_bytes: int = CHUNK_BYTES
+) -> Iterator[ParseTask]:
+    """Rozdeli CSV subor feedu na ParseTask chunky zarovnane na hranice zaznamov."""
+    with source.open(name) as f:
+        header_line = f.readline()
+        if header_line.startswith(_BOM):
+            header_line = header_line[len(_BOM) :]
+        header = tuple(next(csv.reader([header_line.decode("utf-8")]), []))
+        cols = tuple(columns)
+
+        carry = b""
+        while True:
+            block = f.read(chunk_bytes)
+            if not block:
+                break
+            data = carry + block
+            cut = _split_point(data)
+            if cut == 0:
+                carry = data
+                continue
+            carry = data[cut:]
+            yield ParseTask(table, cols, header, data[:cut])
+
+        if carry.strip():
+            yield ParseTask(table, cols, header, carry)
+
+
+def parse_files(
+    source: FeedSource, files: list[tuple[str, str, list[str]]], workers: int | None = None
+) -> Iterator[tuple[str, list[tuple], int]]:
+    """
+    Parsuje subory feedu [(nazov, tabulka, stlpce), ...] a yielduje
+    (tabulka, riadky, bajty chunku) — bajty sluzia na priebeh importu.
+
+    Davky prichadzaju v poradi suborov a chunkov, takze INSERT OR REPLACE
+    zachova rovnaku semantiku ("posledny vyhrava") ako sekvencny import.
+    Pocet rozpracovanych chunkov je obmedzeny, pamat nerastie s velkostou feedu.
+    """
+    workers = workers or default_workers()
+    tasks = (task for name, table, columns in files for task in iter_tasks(source, name, table, columns))
+
+    if workers <= 1:
+        for task in tasks:
+            yield parse_chunk(task)
+        return
+
+    # Nie fork: gtfs_load bezi vo worker threade viacvlaknoveho servera a fork
+    # by zdedil zamky drzane inymi vlaknami
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method)) as pool:
+        pending: deque[Future] = deque()
+        for task in tasks:
+            pending.append(pool.submit(parse_chunk, task))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+@dataclass
+class TableTiming:
+    """Casy importu jednej tabulky v sekundach."""
+
+    rows: int = 0
+    bytes: int = 0
+    parse_s: float = 0.0
+    insert_s: float = 0.0
+    index_s: float = 0.0
+    trigger_s: float = 0.0
+
+    def to_dict(self) -> dict:
+        busy = self.parse_s + self.insert_s
+        return {
+            "rows": self.rows,
+            "bytes": self.bytes,
+            "parse_s": round(self.parse_s, 3),
+            "insert_s": round(self.insert_s, 3),
+            "index_s": round(self.index_s, 3),
+            "trigger_s": round(self.trigger_s, 3),
+            "rows_per_s": round(self.rows / busy) if busy else None,
+        }
+
+
+@dataclass
+class ImportReport:
+    """
+    Vysledok bulk importu: pocty riadkov a rozpis casu po tabulkach.
+
+    parse_s je cas cakania writera na parsovane davky (pri paralelnom
+    parsovani teda len cast, ktoru workery nestihli prekryt insertom).
+    """
+
+    tables: dict[str, TableTiming] = field(default_factory=dict)
+    analyze_s: float = 0.0
+    total_s: float = 0.0
+
+    def table(self, name: str) -> TableTiming:
+        return self.tables.setdefault(name, TableTiming())
+
+    def row_counts(self) -> dict[str, int]:
+        return {name: timing.rows for name, timing in self.tables.items()}
+
+    def to_dict(self) -> dict:
+        phases = ("parse_s", "insert_s", "index_s", "trigger_s")
+        return {
+            "total_s": round(self.total_s, 3),
+            "phases": {
+                **{p: round(sum(getattr(t, p) for t in self.tables.values()), 3) for p in phases},
+                "analyze_s": round(self.analyze_s, 3),
+            },
+            "tables": {name: timing.to_dict() for name, timing in self.tables.items()},
+        }
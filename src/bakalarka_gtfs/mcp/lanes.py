@@ -0,0 +1,67 @@
+"""
+lanes.py — Bounded worker lanes for blocking MCP tools.
+
+The tools do blocking SQLite and ZIP I/O, so running them directly on the
+server's event loop would stall every other SSE client. Each tool is
+registered as an async wrapper that runs the blocking function in a
+worker thread, limited by its lane: ``read`` tools run concurrently (up
+to GTFS_MCP_READ_WORKERS), ``write`` tools run one at a time.
+
+Functions:
+  - limiter(lane)                        — CapacityLimiter of a lane (created lazily in the event loop)
+  - run_in_lane(lane, fn, *args, **kwargs) — await a blocking call in a worker thread of the lane
+  - lane_tool(register, lane)            — decorator: register an async wrapper, return the sync function
+"""
+
+from __future__ import annotations
+
+import functools
+import os
+from typing import TYPE_CHECKING, Any
+
+import anyio
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+# Kolko citacich nastrojov bezi naraz — zodpoveda poolu citacich spojeni
+READ_WORKERS = int(os.getenv("GTFS_MCP_READ_WORKERS", os.getenv("GTFS_DB_READ_POOL_SIZE", "4")))
+
+LANE_SIZES = {"read": READ_WORKERS, "write": 1}
+
+_limiters: dict[str, anyio.CapacityLimiter] = {}
+
+
+def limiter(lane: str) -> anyio.CapacityLimiter:
+    """Limiter lane; anyio ho vie vytvorit az v bezicom event loope."""
+    if lane not in LANE_SIZES:
+        raise ValueError(f"Neznama lane '{lane}', povolene: {', '.join(LANE_SIZES)}")
+    current = _limiters.get(lane)
+    if current is None:
+        current = _limiters[lane] = anyio.CapacityLimiter(max(1, LANE_SIZES[lane]))
+    return current
+
+
+async def run_in_lane(lane: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Spusti blokujucu funkciu vo worker threade; caka, kym je v lane volne miesto."""
+    return await anyio.to_thread.run_sync(functools.partial(fn, *args, **kwargs), limiter=limiter(lane))
+
+
+def lane_tool(register: Callable[[Callable], Any], lane: str = "read") -> Callable[[Callable], Callable]:
+    """
+    Dekorator synchronneho nastroja: `register` (napr. mcp.tool()) dostane
+    async wrapper s rovnakym menom, docstringom a signaturou, ktory bezi
+    v danej lane. Vrati povodnu funkciu, takze priame volanie ostava synchronne.
+    """
+    if lane not in LANE_SIZES:  # preklep v lane zlyha uz pri importe servera
+        raise ValueError(f"Neznama lane '{lane}', povolene: {', '.join(LANE_SIZES)}")
+
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        async def run_tool(*args: Any, **kwargs: Any) -> Any:
+            return await run_in_lane(lane, fn, *args, **kwargs)
+
+        register(run_tool)
+        return fn
+
+    return decorator
@@ -0,0 +1,180 @@
+"""
+pagination.py — Keyset (seek) pagination for read-only gtfs_query results.
+
+Instead of LIMIT/OFFSET, which makes SQLite produce and discard every
+skipped row again on each page, the user's query is wrapped as a
+subquery, ordered by its ORDER BY columns (or the first result column)
+and continued with ``WHERE (keys) > (last values)``. The continuation
+cursor is an opaque base64 token carrying a digest of the query, the
+ordering keys and the last returned key values.
+
+Functions:
+  - mask_sql(sql)                        — SQL with literals and comments blanked (same length)
+  - has_top_level_limit(sql)             — does the outer query already have a LIMIT?
+  - split_order_by(sql)                  — outer query without trailing ORDER BY + its keys
+  - query_digest(sql)                    — short hash of the normalized query
+  - encode_cursor(digest, keys, values)  — opaque continuation token
+  - decode_cursor(token, digest)         — keys and last values from a token
+  - keyset_sql(base_sql, keys, after, limit) — SQL + params of one page
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import hashlib
+import json
+import re
+
+from .result_cache import normalize_sql
+
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+
+_CURSOR_VERSION = 1
+
+# Retazce, quoted identifikatory a komentare — v nich sa klucove slova nehladaju
+_LITERALS = re.compile(
+    r"""'(?:[^']|'')*'|"(?:[^"]|"")*"|`[^`]*`|\[[^\]]*\]|--[^\n]*|/\*.*?(?:\*/|$)""",
+    re.DOTALL,
+)
+_ORDER_BY = re.compile(r"\bORDER\s+BY\b", re.IGNORECASE)
+_LIMIT = re.compile(r"\bLIMIT\b", re.IGNORECASE)
+_COMMA = re.compile(",")
+
+_IDENT = r'(?:[A-Za-z_][A-Za-z0-9_]*|"(?:[^"]|"")*")'
+_ORDER_TERM = re.compile(
+    rf"^\s*(?:{_IDENT}\s*\.\s*)?(?P<name>{_IDENT}|\d+)\s*(?P<dir>ASC|DESC)?\s*$",
+    re.IGNORECASE,
+)
+
+# (nazov stlpca alebo 1-based pozicia, DESC?)
+OrderKey = tuple[str | int, bool]
+
+
+def mask_sql(sql: str) -> str:
+    """Nahradi obsah retazcov, identifikatorov v uvodzovkach a komentarov medzerami."""
+    return _LITERALS.sub(lambda m: m.group(0)[0] + " " * (len(m.group(0)) - 1), sql)
+
+
+def _top_level(masked: str, pattern: re.Pattern) -> list[re.Match]:
+    """Vyskyty vzoru mimo zatvoriek (nie v poddotazoch ani volaniach funkcii)."""
+    depth_at: list[int] = []
+    depth = 0
+    for char in masked:
+        if char == ")":
+            depth -= 1
+        depth_at.append(depth)
+        if char == "(":
+            depth += 1
+    return [m for m in pattern.finditer(masked) if depth_at[m.start()] == 0]
+
+
+def has_top_level_limit(sql: str) -> bool:
+    """True ak vonkajsi dotaz obsahuje LIMIT (LIMIT v poddotaze ani v retazci sa nepocita)."""
+    return bool(_top_level(mask_sql(sql), _LIMIT))
+
+
+def split_order_by(sql: str) -> tuple[str, list[OrderKey] | None]:
+    """
+    Rozdeli dotaz na zaklad a kluce koncoveho ORDER BY.
+
+    Ak ma vonkajsi dotaz vlastny LIMIT, zaklad ostava cely (ORDER BY urcuje,
+    ktore riadky LIMIT vyberie). Vrati (base_sql, None), ak ORDER BY chyba.
+    """
+    sql = sql.strip().rstrip(";").rstrip()
+    masked = mask_sql(sql)
+    orders = _top_level(masked, _ORDER_BY)
+    if not orders:
+        return sql, None
+
+    order = orders[-1]
+    limits = [m for m in _top_level(masked, _LIMIT) if m.start() > order.end()]
+    clause_end = limits[0].start() if limits else len(sql)
+
+    keys: list[OrderKey] = []
+    start = order.end()
+    bounds = [m.start() for m in _top_level(masked, _COMMA) if start < m.start() < clause_end]
+    for end in [*bounds, clause_end]:
+        term = _ORDER_TERM.match(sql[start:end])
+        if term is None:
+            raise ValueError(
+                f"Strankovanie podporuje ORDER BY len podla stlpcov vysledku, nie '{sql[start:end].strip()}'. "
+                "Vyraz pomenuj aliasom v SELECT a zorad podla aliasu."
+            )
+        name = term.group("name")
+        if name.isdigit():
+            key: str | int = int(name)
+        elif name.startswith('"'):
+            key = name[1:-1].replace('""', '"')
+        else:
+            key = name
+        keys.append((key, (term.group("dir") or "").upper() == "DESC"))
+        start = end + 1
+
+    base = sql if limits else sql[: order.start()].rstrip()
+    return base, keys
+
+
+def query_digest(sql: str) -> str:
+    """Kratky hash normalizovaneho dotazu — kurzor plati len pre rovnaky dotaz."""
+    return hashlib.sha256(normalize_sql(sql).encode("utf-8")).hexdigest()[:16]
+
+
+def encode_cursor(digest: str, keys: list[tuple[str, bool]], values: list) -> str:
+    payload = {"v": _CURSOR_VERSION, "q": digest, "k": keys, "a": values}
+    raw = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str, digest: str) -> tuple[list[tuple[str, bool]], list]:
+    """Overi kurzor voci dotazu a vrati (kluce, posledne hodnoty klucov)."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(raw)
+        keys = [(str(name), bool(desc)) for name, desc in payload["k"]]
+        values = list(payload["a"])
+        version, query = payload["v"], payload["q"]
+    except (binascii.Error, UnicodeDecodeError, ValueError, KeyError, TypeError) as e:
+        raise ValueError("Neplatny kurzor strankovania.") from e
+
+    if version != _CURSOR_VERSION or len(keys) != len(values) or not keys:
+        raise ValueError("Neplatny kurzor strankovania.")
+    if query != digest:
+        raise ValueError("Kurzor patri k inemu dotazu — pouzi presne ten isty SQL ako pri prvej strane.")
+    return keys, values
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def keyset_sql(base_sql: str, keys: list[tuple[str, bool]], after: list | None, limit: int) -> tuple[str, list]:
+    """
+    Dotaz na jednu stranu: riadky za `after` v poradi klucov.
+
+    Pri rovnakom smere vsetkych klucov sa pouzije row-value porovnanie
+    (SQLite ho vie oprit o index), pri zmiesanom ASC/DESC rozpisane OR.
+    """
+    cols = [_quote(name) for name, _ in keys]
+    order = ", ".join(f"{col} DESC" if desc else col for col, (_, desc) in zip(cols, keys, strict=True))
+
+    where = ""
+    params: list = []
+    if after is not None:
+        directions = {desc for _, desc in keys}
+        if len(directions) == 1:
+            op = "<" if directions.pop() else ">"
+            placeholders = ", ".join("?" for _ in cols)
+            where = f" WHERE ({', '.join(cols)}) {op} ({placeholders})"
+            params = list(after)
+        else:
+            terms = []
+            for i, (col, (_, desc)) in enumerate(zip(cols, keys, strict=True)):
+                equal = [f"{prev} = ?" for prev in cols[:i]]
+                terms.append("(" + " AND ".join([*equal, f"{col} {'<' if desc else '>'} ?"]) + ")")
+                params.extend(after[: i + 1])
+            where = " WHERE " + " OR ".join(terms)
+
+    # Novy riadok pred ')' — zaklad moze koncit '--' komentarom
+    return f"SELECT * FROM (\n{base_sql}\n){where} ORDER BY {order} LIMIT {int(limit)}", params
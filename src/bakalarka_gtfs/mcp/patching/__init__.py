@@ -3,15 +3,25 @@ patching — Patch operations and validation for GTFS data.
 
 Usage::
 
-    from bakalarka_gtfs.mcp.patching import parse_patch, validate_patch
+    from bakalarka_gtfs.mcp.patching import dry_run_patch, parse_patch, validate_patch
 
     patch = parse_patch(json_string)
     result = validate_patch(patch)
+    plan = dry_run_patch(patch)  # preview + validacia v transakcii, ktora sa vrati spat
 """
 
-from .apply import apply_patch
+from .apply import StalePatchError, apply_patch
 from .diff import build_diff_summary
-from .models import parse_patch
+from .dry_run import dry_run_patch
+from .models import parse_patch, patch_hash
 from .validation import validate_patch
 
-__all__ = ["apply_patch", "build_diff_summary", "parse_patch", "validate_patch"]
+__all__ = [
+    "StalePatchError",
+    "apply_patch",
+    "build_diff_summary",
+    "dry_run_patch",
+    "parse_patch",
+    "patch_hash",
+    "validate_patch",
+]
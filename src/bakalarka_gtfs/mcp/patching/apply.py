@@ -1,108 +1,189 @@
 """
 apply.py — DB Mutations and Patch Application logic.
+
+apply_patch replays the dry-run plan of the same patch (plans.plan_cache)
+with optimistic concurrency: under the write lock it compares the version
+stamps recorded at propose time (and those of the plan) with the current
+ones. If none moved, every update/delete runs on the rowids the dry run
+captured — no filter and no time-format guard is evaluated again — and
+must touch exactly as many rows as the dry run counted. If a table moved
+on, or the proposed plan is no longer cached, the patch is rejected as
+stale before anything is written.
 """
 
 from __future__ import annotations
 
+import json
 import re
-import sqlite3
+from typing import TYPE_CHECKING
 
-from ..database import _check_db, get_current_db
+from ..database import _check_db, table_versions, write_connection
+from .models import patch_hash
+from .plans import plan_cache
 from .sql_builder import filter_to_where
-from .transforms import apply_transform
+from .transforms import time_add_error, transform_guard_sql, transform_sql
+
+if TYPE_CHECKING:
+    import sqlite3
+    from array import array
+
+
+class StalePatchError(RuntimeError):
+    """Tabulka patchu sa od navrhu zmenila (alebo plan navrhu chyba) — patch treba navrhnut znova."""
+
+    def __init__(self, tables: list[str], reason: str | None = None) -> None:
+        self.tables = tables
+        reason = reason or f"od navrhu sa zmenili tabulky: {', '.join(tables)}"
+        super().__init__(f"Stale patch — {reason}. Navrhni patch znova cez gtfs_propose_patch.")
+
+
+def check_table_versions(expected: dict[str, list[int]], current: dict[str, list[int]]) -> None:
+    """StalePatchError, ak sa verzia niektorej tabulky lisi od verzie z navrhu."""
+    moved = [table for table, version in current.items() if version != expected.get(table)]
+    if moved:
+        raise StalePatchError(moved)
 
 
-def apply_patch(patch: dict) -> dict:
+def apply_patch(patch: dict, expected_versions: dict[str, list[int]] | None = None) -> dict:
     """
     Aplikuje patch na SQLite databazu v jednej transakcii (atomic).
     Vrati pocty ovplyvnenych riadkov.
+
+    expected_versions su verzie tabuliek z navrhu (plan["table_versions"]):
+    s nimi sa patch aplikuje len prehranim planu z navrhu, inak StalePatchError.
+    Bez nich sa pouzije plan, ak je v cache, inak filtre operacii.
     """
     _check_db()
-    db_path = get_current_db()
-
-    conn = sqlite3.connect(str(db_path))
-    conn.execute("PRAGMA foreign_keys = ON")
     affected: dict[str, int] = {}
-
-    try:
-        for op in patch["operations"]:
+    key = patch_hash(patch)
+
+    with write_connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        # Rovnako ako dry run: FK sa overia az pri commite, nad stavom po celom patchi
+        conn.execute("PRAGMA defer_foreign_keys = ON")
+        # Verzie sa citaju az pod zapisovym zamkom — medzi kontrolou a zapisom nikto necommitne
+        entry = plan_cache.get(key)
+        plan, rowids = entry if entry is not None and entry[0]["valid"] else (None, None)
+        try:
+            for expected in (expected_versions, plan and plan["table_versions"]):
+                if expected is not None:
+                    check_table_versions(expected, table_versions(conn, expected))
+        except StalePatchError:
+            plan_cache.discard(key)
+            raise
+        if expected_versions is not None and plan is None:
+            raise StalePatchError([], "dry run z navrhu uz nie je v cache planov")
+        for i, op in enumerate(patch["operations"]):
             table = op["table"]
-            op_type = op["op"]
-
-            if op_type == "delete":
-                rows = _apply_delete(conn, op)
-            elif op_type == "update":
-                rows = _apply_update(conn, op)
-            elif op_type == "insert":
-                rows = _apply_insert(conn, op)
+            if plan is None:
+                rows = _execute_operation(conn, op)
             else:
-                continue
-
+                rows = _execute_operation(conn, op, guard=False, rowids=rowids[i])
+                if rows != plan["operations"][i]["matched_rows"]:
+                    plan_cache.discard(key)
+                    raise RuntimeError(
+                        f"Op#{i + 1} ({op['op']} {table}) zmenila {rows} riadkov, dry run ratal "
+                        f"{plan['operations'][i]['matched_rows']} — patch sa neaplikoval, navrhni ho znova."
+                    )
             affected[table] = affected.get(table, 0) + rows
 
         conn.commit()
-    except Exception:
-        conn.rollback()
-        raise
-    finally:
-        conn.close()
 
-    return {"applied": True, "affected_rows": affected}
+    plan_cache.discard(key)
+    return {"applied": True, "affected_rows": affected, "replayed_plan": plan is not None}
+
+
+def _execute_operation(
+    conn: sqlite3.Connection,
+    op: dict,
+    guard: bool = True,
+    rowids: array | None = None,
+    capture: array | None = None,
+) -> int:
+    """
+    Vykona jednu operaciu patchu, vrati pocet zmenenych riadkov (spolocne
+    pre apply aj dry run). Update/delete s `rowids` zasiahne presne tieto
+    riadky namiesto filtra; `capture` nazbiera rowid zasiahnutych riadkov.
+    """
+    op_type = op["op"]
+    if op_type == "delete":
+        return _apply_delete(conn, op, rowids, capture)
+    if op_type == "update":
+        return _apply_update(conn, op, guard, rowids, capture)
+    if op_type == "insert":
+        return _apply_insert(conn, op)
+    return 0
+
+
+def _target(conn: sqlite3.Connection, op: dict, rowids: array | None) -> tuple[str, list]:
+    """
+    WHERE cast update/delete: rowid z dry runu, inak filter. Rowid sa najprv
+    jednym prikazom nahraju do temp tabulky — velky JSON parameter priamo v
+    UPDATE by trace callback rozbalil pri kazdom spusteni audit triggera.
+    """
+    if rowids is None:
+        return filter_to_where(op["filter"])
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS patch_rowids (id INTEGER PRIMARY KEY)")
+    conn.execute("DELETE FROM temp.patch_rowids")
+    conn.execute("INSERT INTO temp.patch_rowids SELECT value FROM json_each(?)", [json.dumps(rowids.tolist())])
+    return "rowid IN (SELECT id FROM temp.patch_rowids)", []
+
+
+def _execute(conn: sqlite3.Connection, sql: str, params: list, capture: array | None) -> int:
+    """Vykona update/delete; s `capture` cez RETURNING rowid v tom istom prikaze."""
+    if capture is None:
+        return conn.execute(sql, params).rowcount
+    capture.extend(row[0] for row in conn.execute(f"{sql} RETURNING rowid", params))
+    return len(capture)
 
 
-def _apply_delete(conn: sqlite3.Connection, op: dict) -> int:
+def _apply_delete(conn: sqlite3.Connection, op: dict, rowids: array | None = None, capture: array | None = None) -> int:
     """DELETE operacia."""
-    where, params = filter_to_where(op["filter"])
+    where, params = _target(conn, op, rowids)
     sql = f"DELETE FROM {op['table']} WHERE {where}"
-    cursor = conn.execute(sql, params)
-    return cursor.rowcount
+    return _execute(conn, sql, params, capture)
 
 
-def _apply_update(conn: sqlite3.Connection, op: dict) -> int:
-    """UPDATE operacia (vratane transformov ako time_add)."""
+def _apply_update(
+    conn: sqlite3.Connection,
+    op: dict,
+    guard: bool = True,
+    rowids: array | None = None,
+    capture: array | None = None,
+) -> int:
+    """
+    UPDATE operacia. Transformy (napr. time_add) sa skompiluju do SQL,
+    takze aj posun casov vsetkych riadkov je jeden set-based UPDATE.
+    guard=False preskoci kontrolu casov (uz ju presiel dry run).
+    """
     table = op["table"]
-    flt = op["filter"]
-    set_spec = op["set"]
-    where, params = filter_to_where(flt)
-
-    has_transforms = any(isinstance(v, dict) and "transform" in v for v in set_spec.values())
-
-    if not has_transforms:
-        set_parts = []
-        set_params = []
-        for col, val in set_spec.items():
-            if not re.match(r"^[a-zA-Z_][a-zA-Z0-9_]*$", col):
-                raise ValueError(f"Neplatny stlpec: {col}")
+    where, params = _target(conn, op, rowids)
+
+    set_parts = []
+    set_params: list = []
+    guards = []
+    for col, val in op["set"].items():
+        if not re.match(r"^[a-zA-Z_][a-zA-Z0-9_]*$", col):
+            raise ValueError(f"Neplatny stlpec: {col}")
+        if isinstance(val, dict) and "transform" in val:
+            expr, expr_params = transform_sql(col, val)
+            set_parts.append(f"{col} = {expr}")
+            set_params.extend(expr_params)
+            if guard:
+                guards.append((col, *transform_guard_sql(col, val)))
+        else:
             set_parts.append(f"{col} = ?")
             set_params.append(val)
-        sql = f"UPDATE {table} SET {', '.join(set_parts)} WHERE {where}"
-        cursor = conn.execute(sql, set_params + params)
-        return cursor.rowcount
-    else:
-        select_sql = f"SELECT rowid, * FROM {table} WHERE {where}"
-        rows = conn.execute(select_sql, params).fetchall()
-        col_names = [desc[0] for desc in conn.execute(f"SELECT * FROM {table} LIMIT 0").description]
-        count = 0
-        for row in rows:
-            rowid = row[0]
-            row_dict = {col_names[i]: row[i + 1] for i in range(len(col_names))}
-
-            set_parts = []
-            set_params = []
-            for col, val in set_spec.items():
-                if not re.match(r"^[a-zA-Z_][a-zA-Z0-9_]*$", col):
-                    raise ValueError(f"Neplatny stlpec: {col}")
-                if isinstance(val, dict) and "transform" in val:
-                    new_val = apply_transform(str(row_dict.get(col, "")), val)
-                else:
-                    new_val = val
-                set_parts.append(f"{col} = ?")
-                set_params.append(new_val)
-
-            sql = f"UPDATE {table} SET {', '.join(set_parts)} WHERE rowid = ?"
-            conn.execute(sql, [*set_params, rowid])
-            count += 1
-        return count
+
+    for col, guard_sql, guard_params in guards:
+        invalid = conn.execute(
+            f"SELECT {col} FROM {table} WHERE ({where}) AND NOT {guard_sql} LIMIT 1", params + guard_params
+        ).fetchone()
+        if invalid is not None:
+            raise ValueError(time_add_error(invalid[0]))
+
+    sql = f"UPDATE {table} SET {', '.join(set_parts)} WHERE {where}"
+    return _execute(conn, sql, set_params + params, capture)
 
 
 def _apply_insert(conn: sqlite3.Connection, op: dict) -> int:
@@ -0,0 +1,159 @@
+"""
+dry_run.py — Transactional dry run of a patch on the writer connection.
+
+The patch runs exactly as apply_patch would run it, in one transaction on
+the writer connection, and is then rolled back. Each operation is first
+validated against the state left by the previous operations, then
+executed; its exact row count and the before/after images of the first
+rows (the old_data/new_data the audit triggers wrote) are collected.
+Foreign keys are deferred in the dry run exactly as in apply_patch, so a
+multi-operation patch (or a renamed referenced key) is FK-checked once
+over its final state by both. The
+result is cached in plans.plan_cache under the patch_hash, with the
+version stamps of every table the patch writes or its validation reads
+and the rowids each update/delete touched (RETURNING rowid), so
+gtfs_validate_patch reuses it and apply_patch replays it by rowid until
+one of those tables changes.
+
+Functions:
+  - dry_run_patch(patch)        — preview, exact counts and validation of a patch (cached per table versions)
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import time
+from array import array
+
+from ..database import TIME_SECONDS_COLUMNS, _check_db, table_versions, write_connection
+from ..sql_functions import time_to_seconds
+from .apply import _execute_operation, check_table_versions
+from .models import patch_hash
+from .plans import plan_cache
+from .validation import _FK_RELATIONS, _check_foreign_keys, _validate_operation
+
+# Kolko riadkov before/after obrazu sa vrati na operaciu
+PREVIEW_ROWS = int(os.getenv("GTFS_DRY_RUN_PREVIEW_ROWS", "5"))
+
+
+def dry_run_patch(patch: dict, expected_versions: dict[str, list[int]] | None = None) -> dict:
+    """
+    Vykona patch v transakcii, ktoru na konci vrati spat. Vrati nahlad
+    operacii (presny pocet riadkov, before/after obrazy), validaciu stavu
+    po patchi a `cached` — ci vysledok pochadza z cache planov.
+    S expected_versions (verzie z navrhu) vyhodi StalePatchError, ak sa
+    niektora tabulka odvtedy zmenila.
+    """
+    _check_db()
+    key = patch_hash(patch)
+    ops = patch["operations"]
+    tables = _watched_tables(ops)
+
+    with write_connection() as conn:
+        current = table_versions(conn, tables)
+        if expected_versions is not None:
+            check_table_versions(expected_versions, current)
+        entry = plan_cache.get(key)
+        if entry is not None and current == entry[0]["table_versions"]:
+            return {**entry[0], "cached": True}
+
+        started = time.perf_counter()
+        operations: list[dict] = []
+        errors: list[str] = []
+        warnings: list[str] = []
+        rowids: list[array | None] = []
+        inserted: set[str] = set()
+
+        conn.execute("BEGIN IMMEDIATE")
+        versions = table_versions(conn, tables)
+        # Plati do konca transakcie — FK poruseny jednou operaciou moze dalsia napravit
+        conn.execute("PRAGMA defer_foreign_keys = ON")
+        start = conn.execute("SELECT COALESCE(MAX(log_id), 0) FROM audit_log").fetchone()[0]
+        failed = False
+        for i, op in enumerate(ops):
+            reported = len(errors)
+            _validate_operation(conn, op, i, errors, warnings)
+            mark = conn.execute("SELECT COALESCE(MAX(log_id), 0) FROM audit_log").fetchone()[0]
+            # Rowid riadkov vlozenych skor v tom istom patchi pri apply nemusia sediet — tie idu cez filter
+            capture = array("q") if op["op"] != "insert" and op["table"] not in inserted else None
+            if op["op"] == "insert":
+                inserted.add(op["table"])
+            try:
+                rows = _execute_operation(conn, op, capture=capture)
+            except (ValueError, sqlite3.Error) as e:
+                if len(errors) == reported:  # validacia tento problem nenasla
+                    errors.append(f"Op#{i + 1} ({op['op']} {op['table']}): aplikacia by zlyhala — {e}")
+                if i + 1 < len(ops):
+                    warnings.append(f"Operacie od Op#{i + 2} sa po chybe neoverili.")
+                failed = True
+                break
+            operations.append(_op_summary(conn, op, i, rows, mark))
+            rowids.append(capture)
+
+        if not failed and not errors and _needs_fk_check(ops):
+            _check_foreign_keys(conn, start, errors)
+        conn.rollback()
+
+    plan = {
+        "total_operations": len(ops),
+        "total_affected_rows": sum(s["matched_rows"] for s in operations),
+        "operations": operations,
+        "valid": not errors,
+        "errors": errors,
+        "warnings": warnings,
+        "table_versions": versions,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+    plan_cache.put(key, plan, rowids)
+    return {**plan, "cached": False}
+
+
+def _watched_tables(ops: list[dict]) -> set[str]:
+    """Tabulky, ktore patch meni, a tabulky, na ktore sa jeho validacia pozera (FK rodicia a deti)."""
+    tables = {op["table"] for op in ops}
+    related = set()
+    for child, relations in _FK_RELATIONS.items():
+        for _, ref_table, _ in relations:
+            if child in tables:
+                related.add(ref_table)
+            if ref_table in tables:
+                related.add(child)
+    return tables | related
+
+
+def _needs_fk_check(ops: list[dict]) -> bool:
+    """
+    FK nad stavom po patchi treba len tam, kde per-op validacia nestaci:
+    viac operacii (mozu sa navzajom rozbit) alebo update odkazovaneho kluca.
+    """
+    if len(ops) > 1:
+        return True
+    referenced = {(ref_table, ref_col) for rels in _FK_RELATIONS.values() for _, ref_table, ref_col in rels}
+    return any(op["op"] == "update" and any((op["table"], col) in referenced for col in op["set"]) for op in ops)
+
+
+def _op_summary(conn: sqlite3.Connection, op: dict, idx: int, rows: int, mark: int) -> dict:
+    """Zhrnutie vykonanej operacie; obrazy riadkov su audit_log zaznamy od `mark`."""
+    images = conn.execute(
+        "SELECT old_data, new_data FROM audit_log WHERE log_id > ? ORDER BY log_id LIMIT ?",
+        [mark, PREVIEW_ROWS],
+    ).fetchall()
+    summary: dict = {"index": idx, "op": op["op"], "table": op["table"], "matched_rows": rows}
+    if op["op"] != "insert":
+        summary["before_preview"] = [_image(row["old_data"]) for row in images]
+    if op["op"] != "delete":
+        summary["after_preview"] = [_image(row["new_data"]) for row in images]
+    return summary
+
+
+def _image(data: str | None) -> dict | None:
+    """Riadok z audit JSON; doplni generovane *_seconds stlpce (trigger ich neuklada)."""
+    if data is None:
+        return None
+    row = json.loads(data)
+    for time_col, seconds_col in TIME_SECONDS_COLUMNS.items():
+        if time_col in row:
+            row[seconds_col] = time_to_seconds(row[time_col])
+    return row
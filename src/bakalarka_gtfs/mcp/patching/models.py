@@ -4,6 +4,7 @@ models.py — Data structures and validation definitions for the GTFS patch.
 
 from __future__ import annotations
 
+import hashlib
 import json
 
 VALID_OPS = {"update", "delete", "insert"}
@@ -21,6 +22,12 @@ def parse_patch(patch_json: str) -> dict:
     return data
 
 
+def patch_hash(patch: dict) -> str:
+    """Stabilny hash patchu (SHA-256 z canonical JSON) — kluc workflow stavu aj planu."""
+    canonical = json.dumps(patch, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
 def _validate_operation(op: dict, idx: int) -> None:
     """Validuje jednu operaciu v patchi."""
     prefix = f"Operacia #{idx + 1}"
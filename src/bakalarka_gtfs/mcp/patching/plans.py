@@ -0,0 +1,65 @@
+"""
+plans.py — Cache of dry-run results (patch plans) for propose/validate/apply.
+
+A dry run executes the patch on the writer connection and rolls back; its
+result — exact per-operation counts, before/after images, post-state
+validation and the version stamps of the tables involved — is kept here
+under the patch_hash, together with the rowids every update/delete
+touched. gtfs_validate_patch reuses the plan while the stamps match, and
+apply_patch replays it by rowid or rejects it as stale once a table has
+moved on (database.table_versions).
+
+Functions:
+  - PlanCache(max_entries)   — thread-safe LRU of plans: get / put / discard / clear
+  - plan_cache               — the process-wide instance used by dry_run and apply
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from array import array
+
+# Pocet drzanych planov (rowid 1M riadkov ~ 8 MB)
+DEFAULT_MAX_ENTRIES = int(os.getenv("GTFS_DRY_RUN_CACHE_ENTRIES", "16"))
+
+
+class PlanCache:
+    """Thread-safe LRU planov podla patch_hash; ci plan este plati, overuje volajuci."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[dict, list[array | None]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, patch_hash: str) -> tuple[dict, list[array | None]] | None:
+        """(plan, rowid kazdej operacie) alebo None; None namiesto rowid = operacia ide cez filter."""
+        with self._lock:
+            entry = self._entries.get(patch_hash)
+            if entry is not None:
+                self._entries.move_to_end(patch_hash)
+            return entry
+
+    def put(self, patch_hash: str, plan: dict, rowids: list[array | None]) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries.pop(patch_hash, None)
+            self._entries[patch_hash] = (plan, rowids)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, patch_hash: str) -> None:
+        with self._lock:
+            self._entries.pop(patch_hash, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+plan_cache = PlanCache()
@@ -7,6 +7,11 @@ from __future__ import annotations
 import re
 from typing import Any
 
+from ..database import TIME_SECONDS_COLUMNS
+from ..sql_functions import time_to_seconds
+
+_RANGE_OPERATORS = {"=", "!=", ">", ">=", "<", "<="}
+
 
 def filter_to_where(flt: dict | list) -> tuple[str, list]:
     """Konvertuje filter na SQL WHERE klauzulu + parametre."""
@@ -53,6 +58,10 @@ def filter_to_where(flt: dict | list) -> tuple[str, list]:
     if not re.match(r"^[a-zA-Z_][a-zA-Z0-9_]*$", col):
         raise ValueError(f"Neplatny stlpec: {col}")
 
+    seconds_filter = _time_filter_to_seconds(col, operator, value)
+    if seconds_filter is not None:
+        return seconds_filter
+
     if operator == "IN":
         if not isinstance(value, list):
             raise ValueError("Operator IN vyzaduje zoznam hodnot.")
@@ -62,3 +71,25 @@ def filter_to_where(flt: dict | list) -> tuple[str, list]:
         return f"{col} IN ({placeholders})", value
 
     return f"{col} {operator} ?", [value]
+
+
+def _time_filter_to_seconds(col: str, operator: str, value: Any) -> tuple[str, list] | None:
+    """
+    Porovnanie GTFS casu (arrival_time/departure_time) prepise na indexovany
+    celociselny stlpec *_seconds — spravne aj pre '9:05:00' a casy > 24:00:00.
+    Ak hodnota nie je platny cas (alebo ide o LIKE), vrati None a porovnava sa text.
+    """
+    seconds_col = TIME_SECONDS_COLUMNS.get(col)
+    if seconds_col is None or operator not in _RANGE_OPERATORS | {"IN"}:
+        return None
+    if operator == "IN":
+        if not isinstance(value, list) or not value:
+            return None
+        seconds = [time_to_seconds(str(v)) for v in value]
+        if None in seconds:
+            return None
+        return f"{seconds_col} IN ({', '.join(['?'] * len(seconds))})", seconds
+    seconds = time_to_seconds(str(value))
+    if seconds is None:
+        return None
+    return f"{seconds_col} {operator} ?", [seconds]
@@ -1,41 +1,58 @@
 """
 transforms.py — Data transformation utilities for patching GTFS data.
+
+Transforms exist twice: in Python (apply_transform) for single values in
+validation messages, and compiled to SQL (transform_sql) so that apply —
+and the dry run behind the preview — updates every matching row in one
+set-based UPDATE. Both come from sql_functions (time_add and its SQL twin
+time_add_sql), so they accept the same times and give the same result.
 """
 
 from __future__ import annotations
 
+from ..sql_functions import time_add, time_add_sql, time_to_seconds
+
+
+def shift_minutes(transform: dict) -> float:
+    """Posun transformu time_add v minutach; nie cislo -> ValueError."""
+    minutes = transform.get("minutes", 0)
+    try:
+        return float(minutes)
+    except (TypeError, ValueError):
+        raise ValueError(f"Neplatny posun time_add: {minutes!r}") from None
+
 
 def apply_transform(current_value: str, transform: dict) -> str:
     """Aplikuje transform (napr. time_add) na hodnotu."""
     name = transform.get("transform")
     if name == "time_add":
-        minutes = transform.get("minutes", 0)
-        return time_add(current_value, minutes)
+        result = time_add(current_value, shift_minutes(transform))
+        if result is None:
+            raise ValueError(time_add_error(current_value))
+        return result
     raise ValueError(f"Neznamy transform: {name}")
 
 
-def time_add(time_str: str, minutes: int) -> str:
+def time_add_error(value: object) -> str:
+    """Preco time_add nad hodnotou nema vysledok: neplatny cas alebo posun pred 00:00:00."""
+    if time_to_seconds(value) is None:
+        return f"Neplatny format casu: {value}"
+    return f"Cas {value} by sa posunul pred 00:00:00"
+
+
+def transform_sql(column: str, transform: dict) -> tuple[str, list]:
     """
-    Prida minuty k GTFS casu (HH:MM:SS).
-    GTFS podporuje casy > 24:00:00 (napr. 25:30:00).
+    SQL vyraz transformu nad stlpcom (rovnaky vysledok ako apply_transform).
+    Neplatny cas alebo posun pred 00:00:00 da NULL — riadky over najprv
+    cez transform_guard_sql.
     """
-    parts = time_str.split(":")
-    if len(parts) != 3:
-        raise ValueError(f"Neplatny format casu: {time_str}")
-    h, m, s = int(parts[0]), int(parts[1]), int(parts[2])
-    total_minutes = h * 60 + m + minutes
-    new_h = total_minutes // 60
-    new_m = total_minutes % 60
-    return f"{new_h:02d}:{new_m:02d}:{s:02d}"
-
-
-def gtfs_time_to_seconds(time_str: str) -> int:
-    """Prevedie GTFS cas HH:MM:SS (HH moze byt >24) na sekundy."""
-    parts = time_str.split(":")
-    if len(parts) != 3:
-        raise ValueError(f"'{time_str}' (ocakavany format HH:MM:SS)")
-
-    h, m, s = (int(parts[0]), int(parts[1]), int(parts[2]))
-    if m < 0 or m > 59 or s < 0 or s > 59 or h < 0:
-        raise ValueError(f"'{time_str}' (neplatne hodnoty casu)")
-    return h * 3600 + m * 60 + s
+    name = transform.get("transform")
+    if name == "time_add":
+        return time_add_sql(column, shift_minutes(transform))
+    raise ValueError(f"Neznamy transform: {name}")
+
+
+def transform_guard_sql(column: str, transform: dict) -> tuple[str, list]:
+    """SQL podmienka (a jej parametre): transform nad hodnotou v stlpci ma vysledok."""
+    expr, params = transform_sql(column, transform)
+    return f"({expr}) IS NOT NULL", params
@@ -3,18 +3,25 @@ validation.py — Validation of a GTFS patch before application.
 
 Checks:
   - FK integrity (e.g. route_id in trips must exist in routes)
-  - time ordering for stop_times (arrival <= departure)
+  - rows referencing a deleted row (children block, grandchildren cascade)
+  - timetable of every touched trip after the patch (arrival <= departure,
+    times non-decreasing along stop_sequence) — one window-function query
   - required fields on insert
   - warning if filter matches 0 rows
 """
 
 from __future__ import annotations
 
-import sqlite3
+import json
+from typing import TYPE_CHECKING
 
-from ..database import _check_db, get_current_db
+from ..database import TIME_SECONDS_COLUMNS, _check_db, read_connection
+from ..sql_functions import time_to_seconds
 from .sql_builder import filter_to_where
-from .transforms import apply_transform, gtfs_time_to_seconds
+from .transforms import apply_transform, shift_minutes
+
+if TYPE_CHECKING:
+    import sqlite3
 
 # ---------------------------------------------------------------------------
 # FK relacie medzi GTFS tabulkami
@@ -32,6 +39,9 @@ _FK_RELATIONS: dict[str, list[tuple[str, str, str]]] = {
     ],
 }
 
+# Najviac tolko chyb (FK riadkov, blokujucich klucov, spojov) sa vypise jednotlivo, zvysok sa zhrnie
+_ERROR_LIMIT = 20
+
 # ---------------------------------------------------------------------------
 # Povinne stlpce pre insert
 # ---------------------------------------------------------------------------
@@ -70,26 +80,12 @@ _REQUIRED_FIELDS: dict[str, list[str]] = {
 def validate_patch(patch_json: dict) -> dict:
     """Zvaliduje patch a vrati zoznam problemov (errors, warnings)."""
     _check_db()
-    db_path = get_current_db()
-
-    conn = sqlite3.connect(str(db_path))
-    conn.row_factory = sqlite3.Row
     errors: list[str] = []
     warnings: list[str] = []
 
-    try:
+    with read_connection() as conn:
         for i, op in enumerate(patch_json["operations"]):
-            prefix = f"Op#{i + 1} ({op['op']} {op['table']})"
-            op_type = op["op"]
-
-            if op_type == "insert":
-                _validate_insert(conn, op, prefix, errors, warnings)
-            elif op_type == "update":
-                _validate_update(conn, op, prefix, errors, warnings)
-            elif op_type == "delete":
-                _validate_delete(conn, op, prefix, errors, warnings)
-    finally:
-        conn.close()
+            _validate_operation(conn, op, i, errors, warnings)
 
     return {
         "valid": len(errors) == 0,
@@ -98,6 +94,64 @@ def validate_patch(patch_json: dict) -> dict:
     }
 
 
+def _validate_operation(
+    conn: sqlite3.Connection,
+    op: dict,
+    idx: int,
+    errors: list[str],
+    warnings: list[str],
+) -> None:
+    """
+    Validacia jednej operacie voci aktualnemu stavu spojenia — v dry rune
+    je to stav po predchadzajucich operaciach patchu.
+    """
+    prefix = f"Op#{idx + 1} ({op['op']} {op['table']})"
+    op_type = op["op"]
+
+    if op_type == "insert":
+        _validate_insert(conn, op, prefix, errors, warnings)
+    elif op_type == "update":
+        _validate_update(conn, op, prefix, errors, warnings)
+    elif op_type == "delete":
+        _validate_delete(conn, op, prefix, errors, warnings)
+
+
+def _check_foreign_keys(conn: sqlite3.Connection, since_log_id: int, errors: list[str]) -> None:
+    """
+    FK integrita stavu po celom patchi, len pre kluce, ktorych sa patch
+    dotkol (audit_log od `since_log_id`): nove hodnoty FK stlpcov zmenenych
+    riadkov a stare hodnoty zmenenych/zmazanych odkazovanych klucov. Zachyti
+    kombinacie operacii, napr. insert spoja na linku, ktoru dalsia operacia
+    zmaze. Riadok neplatny uz pred patchom, ktoreho kluca sa patch nedotkol,
+    chybu nerobi — rovnako ako deferred FK pri commite v apply_patch.
+    """
+    for table, relations in _FK_RELATIONS.items():
+        for col, ref_table, ref_col in relations:
+            rows = conn.execute(
+                f"""
+                WITH touched(value) AS (
+                    SELECT json_extract(new_data, '$.{col}') FROM audit_log
+                     WHERE table_name = ? AND log_id > ?
+                    UNION
+                    SELECT json_extract(old_data, '$.{ref_col}') FROM audit_log
+                     WHERE table_name = ? AND log_id > ?
+                )
+                SELECT c.{col} AS value, COUNT(*) OVER () AS total
+                  FROM {table} c
+                 WHERE c.{col} IN (SELECT value FROM touched WHERE value IS NOT NULL)
+                   AND NOT EXISTS (SELECT 1 FROM {ref_table} p WHERE p.{ref_col} = c.{col})
+                 LIMIT ?
+                """,
+                [table, since_log_id, ref_table, since_log_id, _ERROR_LIMIT],
+            ).fetchall()
+            for row in rows:
+                errors.append(f"Po celom patchi: FK chyba — {table}.{col}='{row['value']}' neexistuje v {ref_table}.")
+            if rows and rows[0]["total"] > _ERROR_LIMIT:
+                errors.append(
+                    f"Po celom patchi: FK chyba — dalsich {rows[0]['total'] - _ERROR_LIMIT} riadkov v {table}.{col}."
+                )
+
+
 # ---------------------------------------------------------------------------
 # Per-operacia validacie
 # ---------------------------------------------------------------------------
@@ -120,17 +174,48 @@ def _validate_insert(
             if field not in row or row[field] is None or str(row[field]).strip() == "":
                 errors.append(f"{prefix} row#{j + 1}: chyba povinny stlpec '{field}'.")
 
-    fk_checks = _FK_RELATIONS.get(table, [])
-    for j, row in enumerate(rows):
-        for col, ref_table, ref_col in fk_checks:
-            val = row.get(col)
-            if val is not None:
-                exists = conn.execute(
-                    f"SELECT 1 FROM {ref_table} WHERE {ref_col} = ? LIMIT 1",
-                    [val],
-                ).fetchone()
-                if not exists:
-                    errors.append(f"{prefix} row#{j + 1}: FK chyba — {col}='{val}' neexistuje v {ref_table}.{ref_col}.")
+    for col, ref_table, ref_col in _FK_RELATIONS.get(table, []):
+        _validate_fk_batch(conn, [row.get(col) for row in rows], col, ref_table, ref_col, prefix, errors)
+
+    if table == "stop_times" and rows:
+        _validate_inserted_timetable(conn, rows, prefix, errors)
+
+
+def _validate_fk_batch(
+    conn: sqlite3.Connection,
+    values: list,
+    col: str,
+    ref_table: str,
+    ref_col: str,
+    prefix: str,
+    errors: list[str],
+) -> None:
+    """
+    FK kontrola vsetkych vkladanych hodnot jednym anti-joinom: hodnoty
+    idu ako JSON pole cez json_each (citacie spojenie je query_only, docasna
+    tabulka nejde). Po riadkoch sa vypise najviac _ERROR_LIMIT chyb.
+    """
+    if all(v is None for v in values):
+        return
+    missing = conn.execute(
+        f"""
+        SELECT c.key AS idx, c.value AS val, COUNT(*) OVER () AS total
+        FROM json_each(?) AS c
+        WHERE c.value IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM {ref_table} WHERE {ref_col} = c.value)
+        ORDER BY c.key
+        LIMIT ?
+        """,
+        [json.dumps(values, default=str), _ERROR_LIMIT],
+    ).fetchall()
+    for row in missing:
+        errors.append(
+            f"{prefix} row#{row['idx'] + 1}: FK chyba — {col}='{row['val']}' neexistuje v {ref_table}.{ref_col}."
+        )
+    if missing and missing[0]["total"] > len(missing):
+        errors.append(
+            f"{prefix}: FK chyba — dalsich {missing[0]['total'] - len(missing)} riadkov s {col} mimo {ref_table}.{ref_col}."
+        )
 
 
 def _validate_update(
@@ -177,47 +262,167 @@ def _validate_time_ordering(
     warnings: list[str],
 ) -> None:
     """
-    Kontrola ze po update bude arrival_time <= departure_time
-    pre stop_times.
+    Kontrola casov stop_times po update: najprv platny format novych
+    casov (prvy problematicky riadok), potom cely cestovny poriadok
+    kazdeho dotknuteho spoja (_check_timetable) nad celociselnymi
+    *_seconds stlpcami v SQL.
     """
     set_spec = op["set"]
     if "arrival_time" not in set_spec and "departure_time" not in set_spec:
         return
 
+    try:
+        arr_expr, arr_invalid, arr_params = _seconds_after_update("arrival_time", "a", set_spec)
+        dep_expr, dep_invalid, dep_params = _seconds_after_update("departure_time", "d", set_spec)
+    except ValueError as e:
+        errors.append(f"{prefix}: neplatny cas po update: {e}")
+        return
+
     where, params = filter_to_where(op["filter"])
-    cursor = conn.execute(
-        f"SELECT arrival_time, departure_time FROM stop_times WHERE {where}",
-        params,
-    )
+    row = conn.execute(
+        f"""
+        SELECT arrival_time, departure_time FROM (
+            SELECT arrival_time, departure_time, {arr_expr} AS a, {dep_expr} AS d
+            FROM stop_times WHERE {where}
+        )
+        WHERE {arr_invalid} OR {dep_invalid}
+        LIMIT 1
+        """,
+        [*arr_params, *dep_params, *params],
+    ).fetchone()
+    if row is not None:
+        detail = _time_after_update_error(row["arrival_time"], set_spec, "arrival_time") or _time_after_update_error(
+            row["departure_time"], set_spec, "departure_time"
+        )
+        errors.append(f"{prefix}: neplatny cas po update: {detail}")
+        return
+
+    post = f"""
+        SELECT trip_id, stop_sequence,
+               CASE WHEN {where} THEN {arr_expr} ELSE arrival_seconds END AS a,
+               CASE WHEN {where} THEN {dep_expr} ELSE departure_seconds END AS d
+        FROM stop_times
+        WHERE trip_id IN (SELECT trip_id FROM stop_times WHERE {where})
+    """
+    post_params = [*params, *arr_params, *params, *dep_params, *params]
+    _check_timetable(conn, post, post_params, "update", prefix, errors)
+
+
+def _validate_inserted_timetable(conn: sqlite3.Connection, rows: list[dict], prefix: str, errors: list[str]) -> None:
+    """Cestovny poriadok spojov, do ktorych insert pridava (alebo nahradza) zastavky."""
+    new = """
+        SELECT json_extract(value, '$.trip_id') AS trip_id,
+               CAST(json_extract(value, '$.stop_sequence') AS INTEGER) AS stop_sequence,
+               gtfs_time_to_seconds(json_extract(value, '$.arrival_time')) AS a,
+               gtfs_time_to_seconds(json_extract(value, '$.departure_time')) AS d
+        FROM json_each(?)
+    """
+    post = f"""
+        WITH new AS ({new})
+        SELECT trip_id, stop_sequence, arrival_seconds AS a, departure_seconds AS d
+        FROM stop_times
+        WHERE trip_id IN (SELECT trip_id FROM new)
+          AND (trip_id, stop_sequence) NOT IN (SELECT trip_id, stop_sequence FROM new)
+        UNION ALL
+        SELECT trip_id, stop_sequence, a, d FROM new
+    """
+    _check_timetable(conn, post, [json.dumps(rows, default=str)], "insert", prefix, errors)
 
-    for row in cursor:
-        arr = row["arrival_time"]
-        dep = row["departure_time"]
 
-        if "arrival_time" in set_spec:
-            val = set_spec["arrival_time"]
-            if isinstance(val, dict) and "transform" in val:
-                arr = apply_transform(arr, val)
-            else:
-                arr = val
+def _check_timetable(
+    conn: sqlite3.Connection,
+    post_sql: str,
+    params: list,
+    action: str,
+    prefix: str,
+    errors: list[str],
+) -> None:
+    """
+    Cestovny poriadok dotknutych spojov po zmene jednym dotazom s window
+    funkciou. `post_sql` vrati (trip_id, stop_sequence, a, d) — sekundy
+    prichodu a odchodu po zmene. Porusenie: arrival > departure alebo
+    prichod skor nez odchod z predchadzajucej zastavky (LAG podla
+    stop_sequence). Prazdny cas (NULL) sa neporovnava. Vypise sa najviac
+    _ERROR_LIMIT spojov s najviac poruseniami, kazdy s prvym porusenim.
+    """
+    rows = conn.execute(
+        f"""
+        WITH post AS ({post_sql}),
+        flagged AS (
+            SELECT trip_id, stop_sequence, a, d, prev, (a > d OR a < prev) AS bad
+            FROM (
+                SELECT trip_id, stop_sequence, a, d,
+                       LAG(d) OVER (PARTITION BY trip_id ORDER BY stop_sequence) AS prev
+                FROM post
+            )
+        )
+        SELECT trip_id, MIN(stop_sequence) AS stop_sequence, COUNT(*) AS violations,
+               gtfs_seconds_to_time(a) AS arr, gtfs_seconds_to_time(d) AS dep,
+               gtfs_seconds_to_time(prev) AS prev, a > d AS dwell,
+               COUNT(*) OVER () AS total_trips
+        FROM flagged
+        WHERE bad
+        GROUP BY trip_id
+        ORDER BY violations DESC, trip_id
+        LIMIT ?
+        """,
+        [*params, _ERROR_LIMIT],
+    ).fetchall()
+
+    # a, d, prev su z riadku s MIN(stop_sequence) (bare stlpce pri MIN v SQLite)
+    for row in rows:
+        if row["dwell"]:
+            detail = f"arrival_time ({row['arr']}) > departure_time ({row['dep']})"
+        else:
+            detail = f"arrival_time ({row['arr']}) < departure_time predchadzajucej zastavky ({row['prev']})"
+        errors.append(
+            f"{prefix}: spoj trip_id='{row['trip_id']}' po {action} porusuje poradie casov "
+            f"v {row['violations']} zastavkach — stop_sequence {row['stop_sequence']}: {detail}."
+        )
+    if rows and rows[0]["total_trips"] > len(rows):
+        errors.append(f"{prefix}: poradie casov porusuje aj dalsich {rows[0]['total_trips'] - len(rows)} spojov.")
+
+
+def _seconds_after_update(col: str, alias: str, set_spec: dict) -> tuple[str, str, list]:
+    """
+    Vrati (SQL vyraz sekund po update, SQL podmienku neplatneho casu nad
+    aliasom `alias`, parametre) pre GTFS casovy stlpec.
+    time_add = posun o minuty nad *_seconds stlpcom.
+    """
+    seconds_col = TIME_SECONDS_COLUMNS[col]
+    if col not in set_spec:
+        return seconds_col, f"({alias} IS NULL AND {col} != '')", []
+
+    val = set_spec[col]
+    if isinstance(val, dict) and "transform" in val:
+        if val["transform"] != "time_add":
+            raise ValueError(f"Neznamy transform: {val['transform']}")
+        shift = round(shift_minutes(val) * 60)
+        return f"({seconds_col} + ?)", f"({alias} IS NULL OR {alias} < 0)", [shift]
+
+    if val in (None, ""):
+        return "NULL", "0", []
+    seconds = time_to_seconds(str(val))
+    if seconds is None:
+        raise ValueError(_format_error(val))
+    return "?", "0", [seconds]
 
-        if "departure_time" in set_spec:
-            val = set_spec["departure_time"]
-            if isinstance(val, dict) and "transform" in val:
-                dep = apply_transform(dep, val)
-            else:
-                dep = val
 
+def _format_error(value: object) -> str:
+    return f"'{value}' (ocakavany format H:MM:SS, HH:MM:SS alebo HHH:MM:SS)"
+
+
+def _time_after_update_error(current: str, set_spec: dict, col: str) -> str | None:
+    """Popis neplatneho casu stlpca jedneho riadku po update (pre chybovu spravu), inak None."""
+    value = set_spec.get(col, current)
+    if isinstance(value, dict) and "transform" in value:
         try:
-            arr_seconds = gtfs_time_to_seconds(str(arr)) if arr not in (None, "") else None
-            dep_seconds = gtfs_time_to_seconds(str(dep)) if dep not in (None, "") else None
+            value = apply_transform(current, value)
         except ValueError as e:
-            errors.append(f"{prefix}: neplatny format casu po update: {e}")
-            break
-
-        if arr_seconds is not None and dep_seconds is not None and arr_seconds > dep_seconds:
-            errors.append(f"{prefix}: po update arrival_time ({arr}) > departure_time ({dep}).")
-            break
+            return str(e)
+    if value in (None, "") or time_to_seconds(str(value)) is not None:
+        return None
+    return _format_error(value)
 
 
 def _validate_delete(
@@ -234,26 +439,84 @@ def _validate_delete(
 
     if count == 0:
         warnings.append(f"{prefix}: filter matchuje 0 riadkov, nic sa nezmaze.")
+        return
+
+    # Pri zapnutych FK by mazanie s odkazmi z detskych tabuliek pri aplikacii zlyhalo.
+    for path in _reverse_fk_paths(table):
+        _check_dependents(conn, table, where, params, path, prefix, errors, warnings)
+
+
+def _reverse_fk_paths(table: str, depth: int = 2) -> list[list[tuple[str, str, str]]]:
+    """
+    Cesty k tabulkam, ktore odkazuju na `table` (podla _FK_RELATIONS):
+    [(detska_tabulka, stlpec, ref_stlpec), ...] — priame deti aj vnuci
+    (napr. routes -> trips -> stop_times).
+    """
+    paths = []
+    for child, relations in _FK_RELATIONS.items():
+        for col, ref_table, ref_col in relations:
+            if ref_table != table:
+                continue
+            step = (child, col, ref_col)
+            paths.append([step])
+            if depth > 1:
+                paths.extend([step, *rest] for rest in _reverse_fk_paths(child, depth - 1))
+    return paths
+
+
+def _check_dependents(
+    conn: sqlite3.Connection,
+    table: str,
+    where: str,
+    params: list,
+    path: list[tuple[str, str, str]],
+    prefix: str,
+    errors: list[str],
+    warnings: list[str],
+) -> None:
+    """
+    Jeden zoskupeny JOIN cez celu cestu: pocet zavislych riadkov na kluc
+    mazanej tabulky (najviac _ERROR_LIMIT klucov s najviac odkazmi)
+    a celkove sucty cez window funkcie. Priame deti blokuju mazanie (chyba),
+    vnuci sa hlasia ako kaskada, ktoru treba zmazat spolu s detmi.
+    """
+    key_col = path[0][2]
+    joins = []
+    parent = "p"
+    for n, (child, col, ref_col) in enumerate(path, 1):
+        joins.append(f"JOIN {child} AS c{n} ON c{n}.{col} = {parent}.{ref_col}")
+        parent = f"c{n}"
+
+    rows = conn.execute(
+        f"""
+        SELECT p.{key_col} AS key, COUNT(*) AS refs,
+               COUNT(*) OVER () AS total_keys, SUM(COUNT(*)) OVER () AS total_refs
+        FROM (SELECT {key_col} FROM {table} WHERE {where}) AS p
+        {" ".join(joins)}
+        GROUP BY p.{key_col}
+        ORDER BY refs DESC, key
+        LIMIT ?
+        """,
+        [*params, _ERROR_LIMIT],
+    ).fetchall()
+    if not rows:
+        return
+
+    total_keys, total_refs = rows[0]["total_keys"], rows[0]["total_refs"]
+    target = path[-1][0]
+    if len(path) > 1:
+        via = " -> ".join(child for child, _, _ in path[:-1])
+        warnings.append(
+            f"{prefix}: kaskada — pod {total_keys} mazanymi {key_col} je {total_refs} riadkov v {target} "
+            f"(cez {via}); pred mazanim {via} treba zmazat aj tie."
+        )
+        return
 
-    # Pri zapnutych FK by tieto operacie pri aplikacii aj tak zlyhali.
-    if table == "trips":
-        affected_trip_ids = conn.execute(f"SELECT trip_id FROM trips WHERE {where}", params).fetchall()
-        for row in affected_trip_ids:
-            ref_count = conn.execute(
-                "SELECT COUNT(*) as c FROM stop_times WHERE trip_id = ?",
-                [row["trip_id"]],
-            ).fetchone()["c"]
-            if ref_count > 0:
-                errors.append(f"{prefix}: mazanie trip_id='{row['trip_id']}' blokuje {ref_count} riadkov v stop_times.")
-
-    if table in ("routes", "calendar"):
-        child_table = "trips"
-        col = "route_id" if table == "routes" else "service_id"
-        affected_ids = conn.execute(f"SELECT {col} FROM {table} WHERE {where}", params).fetchall()
-        for row in affected_ids:
-            ref_count = conn.execute(
-                f"SELECT COUNT(*) as c FROM {child_table} WHERE {col} = ?",
-                [row[col]],
-            ).fetchone()["c"]
-            if ref_count > 0:
-                errors.append(f"{prefix}: mazanie {col}='{row[col]}' blokuje {ref_count} riadkov v {child_table}.")
+    for row in rows:
+        errors.append(f"{prefix}: mazanie {key_col}='{row['key']}' blokuje {row['refs']} riadkov v {target}.")
+    if total_keys > len(rows):
+        shown = sum(row["refs"] for row in rows)
+        errors.append(
+            f"{prefix}: mazanie blokuju aj dalsie {total_keys - len(rows)} hodnoty {key_col} "
+            f"({total_refs - shown} riadkov v {target})."
+        )
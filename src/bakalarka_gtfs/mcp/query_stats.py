@@ -0,0 +1,266 @@
+"""
+query_stats.py — Per-statement SQL statistics and the slow-query log.
+
+Every pooled connection gets a SQLite trace callback, so each statement
+the MCP tools run — gtfs_query, diff, validation and apply alike — is
+timed and aggregated by its fingerprint (the SQL with literals replaced
+by '?'). The trace callback only reports the start of a statement, so a
+statement lasts until the next one starts on the same connection or the
+connection is returned to the pool (reading the rows is included). Each
+fingerprint also carries a hash of its EXPLAIN QUERY PLAN, and statements
+slower than GTFS_SLOW_QUERY_MS are appended as JSON lines to a
+size-rotated slow-query log.
+
+Functions:
+  - statement_fingerprint(sql)   — (short hash, normalized SQL with literals as '?')
+  - StatementStats(log_path)     — thread-safe aggregate: record / top / summary / reset + slow log
+  - StatementTracer(conn, stats) — trace callback of one connection, finish() when it is released
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from logging.handlers import RotatingFileHandler
+from typing import TYPE_CHECKING
+
+from .result_cache import normalize_sql
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from pathlib import Path
+
+# 0 vypne sledovanie prikazov (trace callback sa neinstaluje)
+ENABLED = os.getenv("GTFS_SQL_STATS", "1") == "1"
+# Prah pomaleho prikazu v ms (0 = slow log vypnuty)
+SLOW_QUERY_MS = float(os.getenv("GTFS_SLOW_QUERY_MS", "500"))
+SLOW_LOG_MAX_BYTES = int(os.getenv("GTFS_SLOW_QUERY_LOG_BYTES", str(5 * 1024**2)))
+SLOW_LOG_BACKUPS = int(os.getenv("GTFS_SLOW_QUERY_LOG_BACKUPS", "3"))
+# Najviac tolko roznych fingerprintov; pri plnej tabulke vypadne ten s najmensim celkovym casom
+MAX_STATEMENTS = int(os.getenv("GTFS_SQL_STATS_MAX", "500"))
+
+ORDER_KEYS = ("total_ms", "mean_ms", "max_ms", "calls", "rows")
+
+_STRING = re.compile(r"[xX]?'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w$.])\d+(?:\.\d*)?(?:[eE][-+]?\d+)?\b")
+_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+# Len tieto prikazy maju zmysluplny EXPLAIN QUERY PLAN
+_PLANNED = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+_SQL_CHARS = 1000
+_RECENT_SLOW = 20
+
+
+def statement_fingerprint(sql: str) -> tuple[str, str]:
+    """Fingerprint prikazu: retazce a cisla -> '?', zoznamy '(?, ?, ...)' zlucene."""
+    text = _NUMBER.sub("?", _STRING.sub("?", sql))
+    text = normalize_sql(_LIST.sub("(?, ...)", text), fold_case=True)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:12], text
+
+
+class StatementStats:
+    """Agregat prikazov podla fingerprintu + rotujuci slow-query log."""
+
+    def __init__(
+        self,
+        log_path: Callable[[], Path],
+        slow_ms: float = SLOW_QUERY_MS,
+        max_statements: int = MAX_STATEMENTS,
+    ) -> None:
+        self.log_path = log_path
+        self.slow_ms = slow_ms
+        self.max_statements = max_statements
+        self._lock = threading.Lock()
+        self._entries: dict[str, dict] = {}
+        self._recent_slow: deque[dict] = deque(maxlen=_RECENT_SLOW)
+        self._handler: RotatingFileHandler | None = None
+        self._statements = 0
+        self._slow = 0
+        self._since = time.time()
+
+    def record(self, fingerprint: str, text: str, elapsed_ms: float, rows: int) -> bool:
+        """Zapocita jedno vykonanie; vrati True, ak fingerprint uz ma plan."""
+        with self._lock:
+            self._statements += 1
+            entry = self._entries.get(fingerprint)
+            if entry is None:
+                if len(self._entries) >= self.max_statements:
+                    cheapest = min(self._entries, key=lambda k: self._entries[k]["total_ms"])
+                    del self._entries[cheapest]
+                entry = self._entries[fingerprint] = {
+                    "fingerprint": fingerprint,
+                    "sql": text[:_SQL_CHARS],
+                    "calls": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "rows": 0,
+                    "plan_fingerprint": None,
+                    "last_at": 0.0,
+                }
+            entry["calls"] += 1
+            entry["total_ms"] += elapsed_ms
+            entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+            entry["rows"] += rows
+            entry["last_at"] = time.time()
+            return entry["plan_fingerprint"] is not None
+
+    def set_plan(self, fingerprint: str, plan_fingerprint: str) -> None:
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is not None:
+                entry["plan_fingerprint"] = plan_fingerprint
+
+    def is_slow(self, elapsed_ms: float) -> bool:
+        return bool(self.slow_ms) and elapsed_ms >= self.slow_ms
+
+    def log_slow(self, record: dict) -> None:
+        """Zapise pomaly prikaz ako JSON riadok do slow logu (rotacia podla velkosti)."""
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            self._slow += 1
+            self._recent_slow.append(record)
+            handler = self._log_handler()
+        handler.handle(logging.makeLogRecord({"msg": line}))
+
+    def top(self, n: int = 20, order_by: str = "total_ms") -> list[dict]:
+        """Top-N fingerprintov podla `order_by` (total_ms, mean_ms, max_ms, calls, rows)."""
+        if order_by not in ORDER_KEYS:
+            raise ValueError(f"Neznamy order_by '{order_by}', povolene: {', '.join(ORDER_KEYS)}")
+        with self._lock:
+            entries = [
+                {**e, "mean_ms": e["total_ms"] / e["calls"]}
+                for e in self._entries.values()  # kopie — agregat sa meni pod zamkom
+            ]
+        entries.sort(key=lambda e: e[order_by], reverse=True)
+        for e in entries:
+            for key in ("total_ms", "mean_ms", "max_ms"):
+                e[key] = round(e[key], 3)
+        return entries[: max(0, n)]
+
+    def summary(self, n: int = 20, order_by: str = "total_ms") -> dict:
+        top = self.top(n, order_by)
+        with self._lock:
+            return {
+                "statements": top,
+                "tracked_fingerprints": len(self._entries),
+                "executed": self._statements,
+                "slow": self._slow,
+                "slow_threshold_ms": self.slow_ms,
+                "slow_log": str(self.log_path()),
+                "recent_slow": list(self._recent_slow),
+                "since": self._since,
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._recent_slow.clear()
+            self._statements = 0
+            self._slow = 0
+            self._since = time.time()
+
+    def _log_handler(self) -> RotatingFileHandler:
+        """Handler pre aktualnu cestu logu (cesta nasleduje WORK_DIR). Vola sa pod _lock."""
+        path = self.log_path()
+        if self._handler is None or self._handler.baseFilename != os.path.abspath(path):
+            if self._handler is not None:
+                self._handler.close()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._handler = RotatingFileHandler(
+                path, maxBytes=SLOW_LOG_MAX_BYTES, backupCount=SLOW_LOG_BACKUPS, encoding="utf-8", delay=True
+            )
+        return self._handler
+
+
+class StatementTracer:
+    """
+    Meria prikazy jedneho spojenia. on_statement je SQLite trace callback,
+    finish() sa vola pri vrateni spojenia — az vtedy (mimo beziaceho
+    prikazu) sa zisti plan novych fingerprintov a zapisu pomale prikazy.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, stats: StatementStats) -> None:
+        self.conn = conn
+        self.stats = stats
+        self._sql: str | None = None
+        self._started = 0.0
+        self._changes = 0
+        self._rows = 0
+        # (fingerprint, sql, elapsed_ms, rows, slow) — caka na plan / zapis do slow logu
+        self._pending: list[tuple[str, str, float, int, bool]] = []
+        self._unplanned: set[str] = set()
+
+    def on_statement(self, sql: str) -> None:
+        if sql == self._sql:
+            return  # telo triggera sa hlasi s textom rodicovskeho prikazu
+        self._close()
+        self._sql = sql
+        self._started = time.perf_counter()
+        self._changes = self.conn.total_changes
+        self._rows = 0
+
+    def add_rows(self, count: int) -> None:
+        """Pocet riadkov vratenych aktualnym SELECT (zmenene riadky sa zistia samy)."""
+        self._rows += count
+
+    def finish(self) -> None:
+        self._close()
+        self._sql = None
+        pending, self._pending = self._pending, []
+        self._unplanned.clear()
+        if not pending:
+            return
+        self.conn.set_trace_callback(None)  # EXPLAIN sa nemeria
+        try:
+            for fingerprint, sql, elapsed_ms, rows, slow in pending:
+                plan = self._plan(sql)
+                plan_fingerprint = hashlib.sha1("\n".join(plan).encode("utf-8")).hexdigest()[:12] if plan else ""
+                self.stats.set_plan(fingerprint, plan_fingerprint)
+                if slow:
+                    self.stats.log_slow(
+                        {
+                            "at": time.time(),
+                            "fingerprint": fingerprint,
+                            "elapsed_ms": round(elapsed_ms, 3),
+                            "rows": rows,
+                            "sql": sql[:_SQL_CHARS],
+                            "plan_fingerprint": plan_fingerprint,
+                            "plan": plan,
+                        }
+                    )
+        finally:
+            self.conn.set_trace_callback(self.on_statement)
+
+    def _close(self) -> None:
+        """Uzavrie meranie prave beziaceho prikazu."""
+        if self._sql is None:
+            return
+        elapsed_ms = (time.perf_counter() - self._started) * 1000
+        rows = self._rows + self.conn.total_changes - self._changes
+        fingerprint, text = statement_fingerprint(self._sql)
+        has_plan = self.stats.record(fingerprint, text, elapsed_ms, rows)
+        slow = self.stats.is_slow(elapsed_ms)
+        if slow or (not has_plan and fingerprint not in self._unplanned):
+            self._unplanned.add(fingerprint)
+            self._pending.append((fingerprint, self._sql, elapsed_ms, rows, slow))
+        self._sql = None
+
+    def _plan(self, sql: str) -> list[str]:
+        if not sql.lstrip().upper().startswith(_PLANNED):
+            return []
+        try:
+            rows = self.conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+        except sqlite3.Error:
+            return []  # napr. tabulka medzicasom zmazana
+        depth: dict[int, int] = {0: -1}
+        lines = []
+        for node_id, parent, _, detail in rows:
+            depth[node_id] = depth.get(parent, -1) + 1
+            lines.append("  " * depth[node_id] + detail)
+        return lines
@@ -0,0 +1,145 @@
+"""
+result_cache.py — In-process LRU cache of read-only query results.
+
+Entries are keyed by the normalized SQL, the row limit and the database
+version (file generation + SQLite change counter), so any committed write
+— a patch, an incremental import or a hot swap — makes older entries
+unreachable. The cache is bounded both by entry count and by an estimate
+of the result size in bytes.
+
+Functions:
+  - normalize_sql(sql, fold_case) — canonical form of a query for the cache key
+  - ResultCache(max_entries, max_bytes) — get / put / clear / stats
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import threading
+from collections import OrderedDict
+
+# Predvolene 256 vysledkov a 32 MiB; 0 vypne cache.
+DEFAULT_MAX_ENTRIES = int(os.getenv("GTFS_QUERY_CACHE_ENTRIES", "256"))
+DEFAULT_MAX_BYTES = int(os.getenv("GTFS_QUERY_CACHE_MAX_BYTES", str(32 * 1024**2)))
+
+# Retazce a quoted identifikatory sa pri normalizacii nemenia, komentare sa zahodia
+_TOKENS = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*"|`[^`]*`|\[[^\]]*\]|--[^\n]*|/\*.*?(?:\*/|$))""", re.S)
+_WHITESPACE = re.compile(r"\s+")
+
+# Priblizna rezia jedneho riadku / hodnoty v pamati (dict + objekty)
+_ROW_OVERHEAD = 64
+_VALUE_OVERHEAD = 16
+
+
+def normalize_sql(sql: str, fold_case: bool = False) -> str:
+    """
+    Kanonicky tvar dotazu: mimo uvodzoviek zlucene biele znaky, bez komentarov
+    a koncovej bodkociarky. Velkost pismen ostava — aliasy a nazvy stlpcov
+    urcuju kluce riadkov vo vysledku. fold_case=True prevedie text mimo
+    uvodzoviek na velke pismena (fingerprint prikazu v statistikach).
+    """
+    parts: list[str] = []
+    plain = ""
+    for i, part in enumerate(_TOKENS.split(sql)):
+        if i % 2 == 0:
+            plain += part
+        elif part.startswith(("--", "/*")):
+            plain += " "
+        else:
+            parts.append(_normalize_plain(plain, fold_case))
+            parts.append(part)
+            plain = ""
+    parts.append(_normalize_plain(plain, fold_case))
+    return "".join(parts).strip().rstrip(";").strip()
+
+
+def _normalize_plain(text: str, fold_case: bool) -> str:
+    text = _WHITESPACE.sub(" ", text)
+    return text.upper() if fold_case else text
+
+
+def estimate_bytes(rows: list[dict]) -> int:
+    """Odhad pamate vysledku (nie presny, sluzi na limit cache)."""
+    total = 0
+    for row in rows:
+        total += _ROW_OVERHEAD
+        for value in row.values():
+            total += _VALUE_OVERHEAD + (len(value) if isinstance(value, (str, bytes)) else 8)
+    return total
+
+
+class ResultCache:
+    """Thread-safe LRU cache vysledkov dotazov s limitom poctu aj bajtov."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[tuple, tuple[list[dict], int]] = OrderedDict()
+        self._bytes = 0
+        self._version: object = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    def get(self, key: tuple, version: object) -> list[dict] | None:
+        """Vrati kopiu ulozeneho vysledku, inak None (miss)."""
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return [dict(row) for row in entry[0]]
+
+    def put(self, key: tuple, version: object, rows: list[dict]) -> None:
+        """Ulozi vysledok; prilis velky vysledok (nad max_bytes) sa neuklada."""
+        if not self.enabled:
+            return
+        size = estimate_bytes(rows)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._check_version(version)
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = ([dict(row) for row in rows], size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            }
+
+    def _check_version(self, version: object) -> None:
+        """Po zmene DB su vsetky zaznamy neplatne — uvolni pamat hned. Vola sa pod _lock."""
+        if version != self._version:
+            self._entries.clear()
+            self._bytes = 0
+            self._version = version
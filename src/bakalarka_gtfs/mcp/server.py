@@ -2,6 +2,9 @@
 server.py — FastMCP server with GTFS tools, SSE transport.
 
 Singleton database — all tools work with one current.db.
+Tools run in worker threads: read tools concurrently, writes
+(gtfs_load, gtfs_propose_patch / gtfs_validate_patch — dry run on the
+writer connection, gtfs_apply_patch, gtfs_import_cache) one at a time.
 The first tool called should be gtfs_load, which imports GTFS data
 if the DB doesn't exist yet.
 
@@ -11,12 +14,16 @@ Startup:
 Tools:
     1. gtfs_load          — import GTFS CSV dir -> SQLite (reuse if exists)
     2. gtfs_query          — read-only SQL SELECT
-    3. gtfs_propose_patch  — diff/preview of proposed changes
-    4. gtfs_validate_patch — FK, time ordering, required fields
+    3. gtfs_propose_patch  — dry run: exact counts, before/after rows, validation (rolled back)
+    4. gtfs_validate_patch — FK, time ordering, required fields (cached dry run)
     5. gtfs_apply_patch    — apply changes (atomic transaction, signed confirm)
     6. gtfs_export         — export SQLite -> GTFS ZIP
     7. gtfs_get_history    — audit log
     8. gtfs_show_map       — interactive map widget
+    9. gtfs_import_cache   — list / purge cached import snapshots
+   10. gtfs_indexes        — secondary indexes and their size
+   11. gtfs_explain        — query plan with row estimates and index advice
+   12. gtfs_query_stats    — top SQL statements by time, recent slow queries
 """
 
 from __future__ import annotations
@@ -29,16 +36,34 @@ import re
 import time
 import traceback
 
-from mcp.server.fastmcp import FastMCP
-
-from bakalarka_gtfs.mcp.database import ensure_loaded, export_to_gtfs, run_query
+import anyio
+from mcp.server.fastmcp import Context, FastMCP
+
+from bakalarka_gtfs.mcp.database import (
+    DEFAULT_PAGE_SIZE,
+    QueryBudgetExceededError,
+    ensure_loaded,
+    export_to_gtfs,
+    list_import_cache,
+    list_indexes,
+    purge_import_cache,
+    read_spilled_result,
+    run_query,
+    run_query_bounded,
+    run_query_page,
+    statement_stats,
+)
+from bakalarka_gtfs.mcp.lanes import lane_tool, run_in_lane
 from bakalarka_gtfs.mcp.patching import (
+    StalePatchError,
     apply_patch,
-    build_diff_summary,
+    dry_run_patch,
     parse_patch,
-    validate_patch,
+    patch_hash,
 )
+from bakalarka_gtfs.mcp.query_advisor import explain_query
 from bakalarka_gtfs.mcp.visualization.map_template import get_map_html
+from bakalarka_gtfs.mcp.wire import dumps, table
 
 # ---------------------------------------------------------------------------
 # Server
@@ -58,9 +83,17 @@ CONFIRM_PATTERN = re.compile(r"^/confirm\s+([a-fA-F0-9]{64})$")
 _PATCH_STATES: dict[str, dict] = {}
 
 
+def _tool(lane: str = "read"):
+    """
+    Registruje synchronny nastroj tak, aby bezal vo worker threade danej lane
+    (read = subezne, write = po jednom), nie na event loope servera.
+    """
+    return lane_tool(mcp.tool(), lane)
+
+
 def _json_response(data: dict | list) -> str:
-    """Serializuje odpoved do JSON s peknym formatovanim."""
-    return json.dumps(data, ensure_ascii=False, indent=2, default=str)
+    """Serializuje odpoved do JSON (kompaktne, GTFS_RESPONSE_FORMAT=pretty odsadi)."""
+    return dumps(data)
 
 
 def _error_response(msg: str, detail: str = "") -> str:
@@ -69,22 +102,24 @@ def _error_response(msg: str, detail: str = "") -> str:
 
 
 def _patch_hash(patch: dict) -> str:
-    """Stabilny hash patchu (SHA-256 z canonical JSON)."""
-    canonical = json.dumps(patch, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
-    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+    """Stabilny hash patchu (SHA-256 z canonical JSON) — rovnaky kluc ma aj cache dry runov."""
+    return patch_hash(patch)
 
 
 def _cleanup_patch_states() -> None:
     """Odstrani expirovane stavy patchov."""
     now = time.time()
+    # Snapshot — nastroje bezia subezne vo worker threadoch
     expired_keys = [
-        key for key, value in _PATCH_STATES.items() if now - value.get("created_at", now) > PATCH_STATE_TTL_SECONDS
+        key
+        for key, value in list(_PATCH_STATES.items())
+        if now - value.get("created_at", now) > PATCH_STATE_TTL_SECONDS
     ]
     for key in expired_keys:
         _PATCH_STATES.pop(key, None)
 
 
-def _mark_proposed(patch_hash: str, patch: dict) -> None:
+def _mark_proposed(patch_hash: str, patch: dict, table_versions: dict) -> None:
     now = time.time()
     _PATCH_STATES[patch_hash] = {
         "created_at": now,
@@ -92,6 +127,8 @@ def _mark_proposed(patch_hash: str, patch: dict) -> None:
         "validated_at": None,
         "validated_ok": False,
         "patch": patch,
+        # Verzie tabuliek pri navrhu — validate aj apply voci nim overia, ci patch nezastaral
+        "table_versions": table_versions,
     }
 
 
@@ -165,21 +202,42 @@ def _extract_confirmed_hash(
 
 
 @mcp.tool()
-def gtfs_load(feed_path: str, force: bool = False) -> str:
+async def gtfs_load(
+    feed_path: str,
+    force: bool = False,
+    incremental: bool = False,
+    ctx: Context | None = None,
+) -> str:
     """
     Nacita GTFS data z adresara do SQLite.
     Ak DB uz existuje, len vrati info (pouzije existujucu).
     S force=True vymaze staru DB a naimportuje znova.
+    S incremental=True aplikuje len rozdiel noveho feedu oproti nacitanym datam.
+    Priebeh CSV importu (riadky a rychlost po tabulkach) sa posiela ako MCP
+    progress notifikacie.
 
     Args:
         feed_path: Cesta k GTFS adresaru (napr. "data/gtfs_latest")
         force: Ak True, vymaze existujucu DB a naimportuje znova
+        incremental: Ak True, porovna novy feed s DB a zapise len vlozene,
+            zmenene a zmazane riadky (lokalne patche ostanu zachovane)
 
     Returns:
-        JSON s info o databaze a poctami riadkov v tabulkach.
+        JSON s info o databaze a poctami riadkov v tabulkach
+        (pri incremental aj pocty zmien po tabulkach, po CSV importe
+        aj timings — casy parse/insert/index/trigger po tabulkach).
     """
+
+    def progress(done: float, total: float, message: str) -> None:
+        # Import bezi vo worker threade — notifikacia sa odosle cez event loop servera.
+        if ctx is not None:
+            anyio.from_thread.run(ctx.report_progress, done, total, message)
+
     try:
-        result = ensure_loaded(feed_path, force=force)
+        # Import je zapis — bezi v write lane, po jednom s gtfs_apply_patch
+        result = await run_in_lane(
+            "write", ensure_loaded, feed_path, force=force, incremental=incremental, progress=progress
+        )
         return _json_response(result)
     except Exception:
         return _error_response("Chyba pri nacitani GTFS", traceback.format_exc())
@@ -190,22 +248,38 @@ def gtfs_load(feed_path: str, force: bool = False) -> str:
 # ---------------------------------------------------------------------------
 
 
-@mcp.tool()
-def gtfs_query(sql: str) -> str:
+@_tool("read")
+def gtfs_query(sql: str, page_size: int | None = None, cursor: str | None = None) -> str:
     """
     Vykona read-only SQL SELECT dotaz nad GTFS databazou.
-    Ak dotaz nema LIMIT, pouzije sa predvoleny limit 500 riadkov.
+    Odpoved ma najviac 500 riadkov a ~128 KiB; vacsi vysledok sa ulozi na
+    server ako MCP resource (spilled.uri, po stranach cez spilled.page_uri)
+    a vrati sa suhrn: total_rows, column_stats a prvych 20 riadkov.
+
+    Strankovanie: s `page_size` (alebo `cursor`) vrati jednu stranu a
+    `next_cursor`; dalsiu stranu ziskas tym istym SQL s `cursor=next_cursor`.
+    Poradie urcuje ORDER BY (stlpce vysledku), inak prvy stlpec vysledku.
+    Nepouzivaj OFFSET — kazda dalsia strana by bola pomalsia.
+    Prilis drahy dotaz sa zrusi a vrati chybu "budget_exceeded" s planom dotazu.
 
     Args:
         sql: SQL SELECT dotaz
              (napr. "SELECT * FROM stops WHERE stop_name LIKE '%Hlavna%'")
+        page_size: Pocet riadkov na stranu (1-5000), zapne strankovanie
+        cursor: next_cursor z predchadzajucej strany toho isteho dotazu
 
     Returns:
-        JSON pole riadkov.
+        JSON {"columns": [...], "rows": [[...], ...], "count"} — hodnoty v poradi
+        stlpcov (a pri strankovani s next_cursor, null = posledna strana).
     """
     try:
-        rows = run_query(sql)
-        return _json_response({"rows": rows, "count": len(rows)})
+        if page_size is not None or cursor:
+            page = run_query_page(sql, page_size or DEFAULT_PAGE_SIZE, cursor)
+            return _json_response({**page, **table(page["rows"])})
+        result = run_query_bounded(sql)
+        return _json_response({**result, **table(result["rows"])})
+    except QueryBudgetExceededError as e:
+        return _json_response(e.to_dict())
     except Exception as e:
         return _error_response(str(e), traceback.format_exc())
 
@@ -215,10 +289,12 @@ def gtfs_query(sql: str) -> str:
 # ---------------------------------------------------------------------------
 
 
-@mcp.tool()
+@_tool("write")
 def gtfs_propose_patch(patch_json: str) -> str:
     """
     Navrhne zmeny a ukaze before/after diff preview BEZ aplikacie.
+    Patch sa vykona nanecisto (dry run v transakcii, ktora sa vrati spat),
+    takze pocty riadkov aj ukazky su presne to, co urobi apply.
 
     Args:
         patch_json: JSON s operaciami podla patch schema.
@@ -244,14 +320,14 @@ def gtfs_propose_patch(patch_json: str) -> str:
             }
 
     Returns:
-        JSON diff summary s before/after ukazkami.
+        JSON diff summary s before/after ukazkami a vysledkom validacie.
     """
     try:
         _cleanup_patch_states()
         patch = parse_patch(patch_json)
-        summary = build_diff_summary(patch)
+        summary = dry_run_patch(patch)
         patch_hash = _patch_hash(patch)
-        _mark_proposed(patch_hash, patch)
+        _mark_proposed(patch_hash, patch, summary["table_versions"])
         summary["patch_hash"] = patch_hash
         summary["confirm_command"] = f"/confirm {patch_hash}"
         return _json_response(summary)
@@ -264,11 +340,13 @@ def gtfs_propose_patch(patch_json: str) -> str:
 # ---------------------------------------------------------------------------
 
 
-@mcp.tool()
+@_tool("write")
 def gtfs_validate_patch(patch_json: str) -> str:
     """
     Validuje patch BEZ aplikacie.
-    Kontroluje FK integritu, time ordering, required fields.
+    Kontroluje FK integritu, time ordering, required fields. Pouzije dry run
+    z gtfs_propose_patch; ak sa tabulky patchu odvtedy zmenili, vrati chybu
+    "Stale patch".
 
     Args:
         patch_json: JSON s operaciami (rovnaky format ako propose_patch)
@@ -287,8 +365,18 @@ def gtfs_validate_patch(patch_json: str) -> str:
                 "Najprv zavolaj gtfs_propose_patch pre rovnaky patch_json.",
             )
 
-        result = validate_patch(patch)
-        _mark_validated(patch_hash, result.get("valid", False))
+        try:
+            plan = dry_run_patch(patch, state.get("table_versions"))
+        except StalePatchError as e:
+            _PATCH_STATES.pop(patch_hash, None)
+            return _error_response("Stale patch", str(e))
+        result = {
+            "valid": plan["valid"],
+            "errors": plan["errors"],
+            "warnings": plan["warnings"],
+            "dry_run_cached": plan["cached"],
+        }
+        _mark_validated(patch_hash, result["valid"])
         result["patch_hash"] = patch_hash
         result["confirm_command"] = f"/confirm {patch_hash}"
         return _json_response(result)
@@ -301,7 +389,7 @@ def gtfs_validate_patch(patch_json: str) -> str:
 # ---------------------------------------------------------------------------
 
 
-@mcp.tool()
+@_tool("write")
 def gtfs_apply_patch(
     patch_json: str,
     confirmation_message: str,
@@ -310,6 +398,8 @@ def gtfs_apply_patch(
     """
     Aplikuje patch na databazu v SQLite transakcii (atomic).
     POZOR: Volaj len po propose_patch + validate_patch + user confirm!
+    Ak sa tabulky patchu od propose zmenili (alebo dry run z propose uz nie
+    je v cache), vrati chybu "Stale patch" — nic sa nezapise.
 
     Args:
         patch_json: JSON s operaciami (rovnaky format ako propose/validate)
@@ -318,7 +408,7 @@ def gtfs_apply_patch(
         confirmation_signature: HMAC SHA-256 podpis confirmation_message.
 
     Returns:
-        JSON s {applied: true, affected_rows: {...}}.
+        JSON s {applied: true, affected_rows: {...}, replayed_plan: bool}.
     """
     try:
         _cleanup_patch_states()
@@ -371,7 +461,12 @@ def gtfs_apply_patch(
             state["apply_patch_mismatch"] = True
             state["apply_patch_mismatch_hash"] = parsed_apply_hash
 
-        result = apply_patch(state_patch)
+        try:
+            result = apply_patch(state_patch, state.get("table_versions"))
+        except StalePatchError as e:
+            # Potvrdenie patrilo k datam, ktore uz neplatia — novy propose, validate aj confirm
+            _PATCH_STATES.pop(confirmed_hash, None)
+            return _error_response("Stale patch", str(e))
         _PATCH_STATES.pop(confirmed_hash, None)
         result["patch_hash"] = confirmed_hash
         return _json_response(result)
@@ -384,7 +479,7 @@ def gtfs_apply_patch(
 # ---------------------------------------------------------------------------
 
 
-@mcp.tool()
+@_tool("read")
 def gtfs_export(output_path: str) -> str:
     """
     Exportuje databazu spat do GTFS ZIP suboru.
@@ -408,7 +503,7 @@ def gtfs_export(output_path: str) -> str:
 # ---------------------------------------------------------------------------
 
 
-@mcp.tool()
+@_tool("read")
 def gtfs_get_history(limit: int = 50) -> str:
     """
     Ziska historiu zmien (audit log) vykonanych nad GTFS databazou.
@@ -422,7 +517,7 @@ def gtfs_get_history(limit: int = 50) -> str:
     try:
         sql = f"SELECT * FROM audit_log ORDER BY timestamp DESC LIMIT {limit}"
         rows = run_query(sql)
-        return _json_response({"history": rows, "count": len(rows)})
+        return _json_response({**table(rows, key="history"), "count": len(rows)})
     except Exception as e:
         return _error_response(str(e), traceback.format_exc())
 
@@ -432,7 +527,7 @@ def gtfs_get_history(limit: int = 50) -> str:
 # ---------------------------------------------------------------------------
 
 
-@mcp.tool()
+@_tool("read")
 def gtfs_show_map(
     route_id: str | None = None,
     trip_id: str | None = None,
@@ -672,6 +767,135 @@ m.fitBounds(b,{{padding:[30,30]}});
         return _error_response(str(e), traceback.format_exc())
 
 
+# ---------------------------------------------------------------------------
+# Tool 9: gtfs_import_cache
+# ---------------------------------------------------------------------------
+
+
+@_tool("write")
+def gtfs_import_cache(action: str = "list", fingerprint: str | None = None) -> str:
+    """
+    Sprava import cache — snapshoty naimportovanych feedov podla odtlacku obsahu.
+    Opakovany gtfs_load(force=True) rovnakeho feedu sa obnovi z cache bez CSV importu.
+
+    Args:
+        action: "list" (zoznam snapshotov) alebo "purge" (zmazanie)
+        fingerprint: Pri "purge" zmaze len tento snapshot; bez neho celu cache.
+
+    Returns:
+        JSON so zoznamom snapshotov alebo poctom zmazanych.
+    """
+    try:
+        if action == "list":
+            return _json_response(list_import_cache())
+        if action == "purge":
+            return _json_response(purge_import_cache(fingerprint))
+        return _error_response("Neplatna akcia", "Povolene akcie: 'list', 'purge'.")
+    except Exception as e:
+        return _error_response(str(e), traceback.format_exc())
+
+
+# ---------------------------------------------------------------------------
+# Tool 10: gtfs_indexes
+# ---------------------------------------------------------------------------
+
+
+@_tool("read")
+def gtfs_indexes() -> str:
+    """
+    Zoznam indexov v databaze a ich velkost. Spravovane indexy (managed=true)
+    vytvara import a kontroluje kazdy gtfs_load.
+
+    Returns:
+        JSON so zoznamom indexov (name, table, columns, managed, size_bytes).
+    """
+    try:
+        return _json_response(list_indexes())
+    except Exception as e:
+        return _error_response(str(e), traceback.format_exc())
+
+
+# ---------------------------------------------------------------------------
+# Tool 11: gtfs_explain
+# ---------------------------------------------------------------------------
+
+
+@_tool("read")
+def gtfs_explain(sql: str) -> str:
+    """
+    Plan SELECT dotazu (EXPLAIN QUERY PLAN) bez jeho vykonania — odhad
+    precitanych riadkov zo statistik tabuliek a upozornenia na full scan,
+    docasny B-strom, automaticky index a karteziansky sucin s navrhom
+    lacnejsieho prepisu alebo indexu.
+
+    Args:
+        sql: SQL SELECT dotaz, ktory chces overit pred gtfs_query
+
+    Returns:
+        JSON s plan, estimated_rows_examined, warnings a verdict ("ok" / "slow").
+    """
+    try:
+        return _json_response(explain_query(sql))
+    except Exception as e:
+        return _error_response(str(e), traceback.format_exc())
+
+
+# ---------------------------------------------------------------------------
+# Tool 12: gtfs_query_stats
+# ---------------------------------------------------------------------------
+
+
+@_tool("read")
+def gtfs_query_stats(top: int = 20, order_by: str = "total_ms", reset: bool = False) -> str:
+    """
+    Diagnostika: ktore SQL prikazy (gtfs_query, diff, validacia, apply)
+    zaberaju najviac casu. Prikazy su zoskupene podla fingerprintu (SQL
+    s literalmi nahradenymi '?'); prikazy nad prahom su v slow logu.
+
+    Args:
+        top: pocet vratenych prikazov
+        order_by: total_ms, mean_ms, max_ms, calls alebo rows
+        reset: po vrateni statistiky vynuluje
+
+    Returns:
+        JSON so statements (calls, total/mean/max ms, rows, plan_fingerprint),
+        recent_slow, slow_threshold_ms a result_cache.
+    """
+    try:
+        stats = statement_stats(top, order_by, reset)
+        return _json_response({**stats, **table(stats["statements"], key="statements")})
+    except Exception as e:
+        return _error_response(str(e), traceback.format_exc())
+
+
+# ---------------------------------------------------------------------------
+# Resources: vysledky gtfs_query ulozene na serveri (spill)
+# ---------------------------------------------------------------------------
+
+
+@mcp.resource(
+    "gtfs://results/{handle}.csv",
+    name="gtfs_result_csv",
+    description=(
+        "Vysledok velkeho gtfs_query dotazu ako CSV po stranach: spilled.uri je strana 1, "
+        "dalsie su spilled.page_uri s cislom strany (spolu spilled.pages)."
+    ),
+    mime_type="text/csv",
+)
+async def gtfs_result_csv(handle: str) -> str:
+    return await run_in_lane("read", read_spilled_result, f"{handle}.csv")
+
+
+@mcp.resource(
+    "gtfs://results/{handle}.jsonl",
+    name="gtfs_result_jsonl",
+    description="Vysledok velkeho gtfs_query dotazu ako JSON Lines po stranach (ako gtfs_result_csv).",
+    mime_type="application/x-ndjson",
+)
+async def gtfs_result_jsonl(handle: str) -> str:
+    return await run_in_lane("read", read_spilled_result, f"{handle}.jsonl")
+
+
 # ---------------------------------------------------------------------------
 # Main
 # ---------------------------------------------------------------------------
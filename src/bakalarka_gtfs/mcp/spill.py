@@ -0,0 +1,248 @@
+"""
+spill.py — Server-side spill files for oversized query results.
+
+When a gtfs_query result exceeds its row or byte limit, the rows are
+streamed into a CSV or JSONL file in WORK_DIR/results instead of being
+held in memory and sent to the LLM. The file is exposed as an MCP
+resource (gtfs://results/<handle>.<format>) and the tool response
+carries only a summary: row count, per-column statistics and the first
+rows. The resource is served in pages of page_rows rows
+(gtfs://results/<handle>.p<N>.<format>, the plain URI is page 1), read
+lazily from the file, so a large spill is never held in memory whole.
+Files expire after a TTL and the directory is bounded in bytes.
+
+Functions:
+  - ColumnStats(columns)        — streaming per-column summary (nulls, distinct, min/max, mean)
+  - SpillStore(directory)       — create / read_page / entries of spill files, TTL + size-bounded cleanup
+  - SpillWriter                 — append rows to one spill file, close() -> metadata
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+import os
+import re
+import time
+import uuid
+from itertools import islice
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+DEFAULT_TTL_SECONDS = int(os.getenv("GTFS_SPILL_TTL_SECONDS", "3600"))
+DEFAULT_MAX_BYTES = int(os.getenv("GTFS_SPILL_MAX_BYTES", str(512 * 1024**2)))
+# Najviac tolko riadkov v jednom subore — potom sa citanie kurzora zastavi
+DEFAULT_MAX_ROWS = int(os.getenv("GTFS_SPILL_MAX_ROWS", "100000"))
+# Riadkov na jednu stranu resource (CSV ma hlavicku na kazdej strane)
+DEFAULT_PAGE_ROWS = int(os.getenv("GTFS_SPILL_PAGE_ROWS", "5000"))
+DEFAULT_FORMAT = os.getenv("GTFS_SPILL_FORMAT", "csv")
+
+URI_PREFIX = "gtfs://results/"
+FORMATS = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+
+# Pocet roznych hodnot sa pocita presne len do tejto hranice (pamat)
+_DISTINCT_CAP = 1000
+_NAME = re.compile(r"^[0-9a-f]{32}\.(csv|jsonl)$")
+_PAGE = re.compile(r"^(?P<handle>[0-9a-f]{32})(?:\.p(?P<page>[1-9][0-9]*))?\.(?P<format>csv|jsonl)$")
+
+
+class ColumnStats:
+    """Priebezne statistiky stlpcov bez drzania riadkov v pamati."""
+
+    def __init__(self, columns: list[str]) -> None:
+        self.columns = columns
+        self.rows = 0
+        self._nulls = [0] * len(columns)
+        self._distinct: list[set | None] = [set() for _ in columns]
+        self._min: list[object] = [None] * len(columns)
+        self._max: list[object] = [None] * len(columns)
+        self._sum = [0.0] * len(columns)
+        self._numbers = [0] * len(columns)
+
+    def add(self, values: tuple | list) -> None:
+        self.rows += 1
+        for i, value in enumerate(values):
+            if value is None:
+                self._nulls[i] += 1
+                continue
+            distinct = self._distinct[i]
+            if distinct is not None:
+                distinct.add(value)
+                if len(distinct) > _DISTINCT_CAP:
+                    self._distinct[i] = None
+            if isinstance(value, (int, float)):
+                self._sum[i] += value
+                self._numbers[i] += 1
+            try:
+                if self._min[i] is None or value < self._min[i]:
+                    self._min[i] = value
+                if self._max[i] is None or value > self._max[i]:
+                    self._max[i] = value
+            except TypeError:
+                pass  # zmiesane typy v stlpci (SQLite to dovoli) — min/max podla prvych hodnot
+
+    def to_dict(self) -> dict[str, dict]:
+        stats = {}
+        for i, name in enumerate(self.columns):
+            distinct = self._distinct[i]
+            entry = {
+                "nulls": self._nulls[i],
+                "distinct": len(distinct) if distinct is not None else f">{_DISTINCT_CAP}",
+                "min": self._min[i],
+                "max": self._max[i],
+            }
+            if self._numbers[i]:
+                entry["mean"] = round(self._sum[i] / self._numbers[i], 4)
+            stats[name] = entry
+        return stats
+
+
+class SpillWriter:
+    """Jeden spill subor; write() vrati False po dosiahnuti limitu bajtov alebo riadkov."""
+
+    def __init__(self, path: Path, columns: list[str], fmt: str, max_bytes: int, max_rows: int, page_rows: int) -> None:
+        self.path = path
+        self.columns = columns
+        self.format = fmt
+        self.max_bytes = max_bytes
+        self.max_rows = max_rows
+        self.page_rows = page_rows
+        self.rows = 0
+        self.truncated = False
+        self._chars = 0
+        self._file = path.open("w", newline="", encoding="utf-8")
+        self._csv = csv.writer(self._file, lineterminator="\n") if fmt == "csv" else None
+        if self._csv is not None:
+            self._chars += self._csv.writerow(columns)
+
+    def write(self, values: tuple | list) -> bool:
+        if self._chars >= self.max_bytes or self.rows >= self.max_rows:
+            self.truncated = True
+            return False
+        if self._csv is not None:
+            self._chars += self._csv.writerow(["" if v is None else v for v in values])
+        else:
+            line = json.dumps(dict(zip(self.columns, values, strict=True)), ensure_ascii=False, default=str)
+            self._chars += self._file.write(line + "\n")
+        self.rows += 1
+        return True
+
+    def close(self) -> dict:
+        self._file.close()
+        return {
+            "uri": URI_PREFIX + self.path.name,
+            "pages": max(1, -(-self.rows // self.page_rows)),
+            "page_uri": f"{URI_PREFIX}{self.path.stem}.p{{page}}.{self.format}",
+            "format": self.format,
+            "mime_type": FORMATS[self.format],
+            "rows": self.rows,
+            "bytes": self.path.stat().st_size,
+            "truncated": self.truncated,
+        }
+
+    def discard(self) -> None:
+        """Zatvori a zmaze neuplny subor (napr. po zruseni dotazu)."""
+        self._file.close()
+        self.path.unlink(missing_ok=True)
+
+
+class SpillStore:
+    """Adresar spill suborov s TTL a celkovym limitom velkosti."""
+
+    def __init__(
+        self,
+        directory: Path,
+        ttl_seconds: int = DEFAULT_TTL_SECONDS,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_rows: int = DEFAULT_MAX_ROWS,
+        page_rows: int = DEFAULT_PAGE_ROWS,
+    ) -> None:
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.max_rows = max_rows
+        self.page_rows = page_rows
+
+    def create(self, columns: list[str], fmt: str = DEFAULT_FORMAT) -> SpillWriter:
+        if fmt not in FORMATS:
+            raise ValueError(f"Nepodporovany format vysledku '{fmt}', povolene: {', '.join(FORMATS)}")
+        self.cleanup()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{uuid.uuid4().hex}.{fmt}"
+        return SpillWriter(path, columns, fmt, self.max_bytes, self.max_rows, self.page_rows)
+
+    def path(self, name: str) -> Path:
+        """Cesta k spill suboru podla mena z URI (iny tvar mena sa odmietne)."""
+        name = name.removeprefix(URI_PREFIX)
+        if not _NAME.match(name):
+            raise ValueError(f"Neplatny identifikator vysledku '{name}'.")
+        path = self.directory / name
+        if not path.exists():
+            raise FileNotFoundError(f"Vysledok '{name}' neexistuje alebo uz expiroval — spusti dotaz znova.")
+        return path
+
+    def read_page(self, name: str) -> str:
+        """
+        Jedna strana spill suboru podla mena z URI: `<handle>.<format>` je
+        strana 1, `<handle>.p<N>.<format>` strana N. Subor sa cita postupne,
+        v pamati je len vratena strana.
+        """
+        match = _PAGE.match(name.removeprefix(URI_PREFIX))
+        if match is None:
+            raise ValueError(f"Neplatny identifikator vysledku '{name}'.")
+        path = self.path(f"{match['handle']}.{match['format']}")
+        page = int(match["page"] or 1)
+        start = (page - 1) * self.page_rows
+
+        out = io.StringIO()
+        count = 0
+        with path.open(newline="", encoding="utf-8") as f:
+            if match["format"] == "csv":
+                reader = csv.reader(f)
+                writer = csv.writer(out, lineterminator="\n")
+                writer.writerow(next(reader))
+                for row in islice(reader, start, start + self.page_rows):
+                    writer.writerow(row)
+                    count += 1
+            else:
+                for line in islice(f, start, start + self.page_rows):
+                    out.write(line)
+                    count += 1
+        if page > 1 and count == 0:
+            raise ValueError(f"Vysledok '{match['handle']}' nema stranu {page}.")
+        return out.getvalue()
+
+    def entries(self) -> list[dict]:
+        if not self.directory.exists():
+            return []
+        entries = []
+        for path in self.directory.iterdir():
+            if not _NAME.match(path.name):
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue  # subezny cleanup ho prave zmazal
+            entries.append({"uri": URI_PREFIX + path.name, "bytes": stat.st_size, "created_at": stat.st_mtime})
+        return sorted(entries, key=lambda e: e["created_at"])
+
+    def cleanup(self) -> None:
+        """Zmaze expirovane subory, potom najstarsie, kym sa adresar nezmesti do limitu."""
+        now = time.time()
+        total = 0
+        alive = []
+        for entry in self.entries():
+            path = self.directory / entry["uri"].removeprefix(URI_PREFIX)
+            if now - entry["created_at"] > self.ttl_seconds:
+                path.unlink(missing_ok=True)
+            else:
+                alive.append((path, entry["bytes"]))
+                total += entry["bytes"]
+        for path, size in alive:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
@@ -0,0 +1,110 @@
+"""
+sql_functions.py — GTFS time functions registered in SQLite.
+
+Every connection of the MCP database layer gets these deterministic
+user functions, so time arithmetic runs inside the query instead of in
+Python over fetched rows. This module is the single definition of a GTFS
+time: H:MM:SS, HH:MM:SS or HHH:MM:SS (hours past 24 allowed), never below
+00:00:00. Invalid input yields NULL instead of an error, so one dirty row
+does not abort a query. Where a UDF cannot be used — the generated
+*_seconds columns must be readable without the Python functions, and the
+set-based time_add UPDATE runs on every row — the same grammar is
+available as plain SQL (seconds_sql, time_add_sql).
+
+SQL functions:
+  - gtfs_time_to_seconds(time)       — '25:10:00' -> 90600
+  - gtfs_seconds_to_time(seconds)    — 90600 -> '25:10:00'
+  - gtfs_time_add(time, minutes)     — '23:50:00', 20 -> '24:10:00' (NULL below 00:00:00)
+  - gtfs_time_diff(time_a, time_b)   — seconds of time_a - time_b (like SQLite timediff)
+
+Functions:
+  - register_functions(conn)         — create the functions on one connection
+  - seconds_sql(col)                 — SQL twin of gtfs_time_to_seconds
+  - time_add_sql(col, minutes)       — SQL twin of gtfs_time_add, with parameters
+"""
+
+from __future__ import annotations
+
+import re
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import sqlite3
+
+_TIME = re.compile(r"([0-9]{1,3}):([0-5][0-9]):([0-5][0-9])")
+
+
+def time_to_seconds(value: object) -> int | None:
+    """GTFS cas -> sekundy od polnoci dna sluzby, neplatny vstup -> None."""
+    if not isinstance(value, str):
+        return None
+    match = _TIME.fullmatch(value)
+    if match is None:
+        return None
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+
+
+def seconds_to_time(value: object) -> str | None:
+    """Sekundy -> GTFS cas HH:MM:SS (hodiny mozu byt > 24); zaporne alebo nie cislo -> None."""
+    if not isinstance(value, (int, float)) or value < 0:
+        return None
+    total = int(value)
+    return f"{total // 3600:02d}:{total // 60 % 60:02d}:{total % 60:02d}"
+
+
+def time_add(value: object, minutes: object) -> str | None:
+    """Posun GTFS casu o minuty (aj zaporne, aj zlomky minuty)."""
+    seconds = time_to_seconds(value)
+    if seconds is None or not isinstance(minutes, (int, float)):
+        return None
+    return seconds_to_time(seconds + round(minutes * 60))
+
+
+def time_diff(value_a: object, value_b: object) -> int | None:
+    """Rozdiel dvoch GTFS casov v sekundach (a - b)."""
+    seconds_a = time_to_seconds(value_a)
+    seconds_b = time_to_seconds(value_b)
+    if seconds_a is None or seconds_b is None:
+        return None
+    return seconds_a - seconds_b
+
+
+_FUNCTIONS = {
+    "gtfs_time_to_seconds": (1, time_to_seconds),
+    "gtfs_seconds_to_time": (1, seconds_to_time),
+    "gtfs_time_add": (2, time_add),
+    "gtfs_time_diff": (2, time_diff),
+}
+
+
+def seconds_sql(col: str) -> str:
+    """
+    SQL vyraz time_to_seconds bez UDF: GTFS cas -> sekundy, inak NULL.
+    SQLite ho vyhodnocuje pri kazdom INSERT aj pri stavbe indexu, preto len
+    GLOB na presny tvar (najcastejsi HH: prvy) a CAST prefixu hodin.
+    """
+    mm_ss = ":[0-5][0-9]:[0-5][0-9]"
+    return (
+        f"CASE WHEN {col} GLOB '[0-9][0-9]{mm_ss}' OR {col} GLOB '[0-9]{mm_ss}' "
+        f"OR {col} GLOB '[0-9][0-9][0-9]{mm_ss}' "
+        f"THEN CAST({col} AS INTEGER) * 3600 "
+        f"+ CAST(substr({col}, -5, 2) AS INTEGER) * 60 "
+        f"+ CAST(substr({col}, -2) AS INTEGER) END"
+    )
+
+
+def time_add_sql(col: str, minutes: float) -> tuple[str, list]:
+    """
+    SQL vyraz time_add bez UDF (rychlejsi pri UPDATE vsetkych riadkov) a jeho
+    parametre. Sekundy po posune sa spocitaju raz v skalarnom poddotaze.
+    """
+    fmt = "printf('%02d:%02d:%02d', s / 3600, s / 60 % 60, s % 60)"
+    expr = f"(SELECT CASE WHEN s >= 0 THEN {fmt} END FROM (SELECT ({seconds_sql(col)}) + ? AS s))"
+    return expr, [round(minutes * 60)]
+
+
+def register_functions(conn: sqlite3.Connection) -> None:
+    """Zaregistruje GTFS casove funkcie (deterministicke — planner ich moze vyhodnotit raz)."""
+    for name, (arity, fn) in _FUNCTIONS.items():
+        conn.create_function(name, arity, fn, deterministic=True)
@@ -0,0 +1,98 @@
+"""
+wire.py — Compact serialization of MCP tool responses.
+
+Tool results end up in the LLM prompt, so every byte is a token. In the
+default ``compact`` format responses are serialized without indentation
+(with orjson when it is installed) and row lists are sent as a column
+header plus row arrays instead of per-row dicts. Columns with many
+repeated strings can additionally be dictionary-encoded. ``pretty``
+restores the indented per-row output for debugging.
+
+Functions:
+  - dumps(data)                — JSON text in the configured format
+  - table(rows, key)           — row dicts -> {"columns", key: arrays} (or {key: dicts} in pretty mode)
+  - columnar(rows)             — row dicts -> {"columns": [...], "rows": [[...], ...]}
+  - dictionary_encode(data)    — repeated strings in columns -> indexes into "dictionary"
+"""
+
+from __future__ import annotations
+
+import json
+import os
+
+try:
+    import orjson
+except ImportError:  # volitelna zavislost — standardny json staci
+    orjson = None
+
+# "compact" (predvolene) alebo "pretty" (odsadeny JSON, riadky ako dict)
+RESPONSE_FORMAT = os.getenv("GTFS_RESPONSE_FORMAT", "compact").strip().lower()
+# Slovnikove kodovanie opakovanych retazcov v stlpcoch (1 = zapnute)
+DICTIONARY_ENCODING = os.getenv("GTFS_RESPONSE_DICTIONARY", "0") == "1"
+
+# Stlpec sa koduje, ak ma aspon tolko riadkov a unikatne hodnoty tvoria najviac polovicu
+_DICT_MIN_ROWS = 16
+_DICT_MAX_DISTINCT_RATIO = 0.5
+
+
+def dumps(data: object) -> str:
+    """Serializuje odpoved; v compact rezime bez odsadenia a medzier."""
+    if RESPONSE_FORMAT == "pretty":
+        return json.dumps(data, ensure_ascii=False, indent=2, default=str)
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, default=str).decode("utf-8")
+        except TypeError:
+            pass  # napr. int mimo 64 bitov alebo kluce, ktore orjson nepodporuje
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def table(rows: list[dict], key: str = "rows") -> dict:
+    """Riadky vysledku pod klucom `key` — stlpcovo v compact, ako dict v pretty rezime."""
+    if RESPONSE_FORMAT == "pretty":
+        return {key: rows}
+    data = columnar(rows)
+    if DICTIONARY_ENCODING:
+        data = dictionary_encode(data)
+    data[key] = data.pop("rows")
+    return data
+
+
+def columnar(rows: list[dict]) -> dict:
+    """Hlavicka stlpcov + riadky ako polia (nazov stlpca sa neopakuje v kazdom riadku)."""
+    columns: list[str] = []
+    seen: set[str] = set()
+    for row in rows:
+        for name in row:
+            if name not in seen:
+                seen.add(name)
+                columns.append(name)
+    return {"columns": columns, "rows": [[row.get(name) for name in columns] for row in rows]}
+
+
+def dictionary_encode(data: dict) -> dict:
+    """
+    Nahradi opakovane retazce v stlpcoch indexom do data["dictionary"][stlpec].
+    Koduje sa len stlpec, kde su vsetky hodnoty retazce a opakuju sa dost casto.
+    """
+    rows = data["rows"]
+    if len(rows) < _DICT_MIN_ROWS:
+        return data
+
+    dictionary: dict[str, list[str]] = {}
+    encoded_rows = [list(row) for row in rows]
+    for i, name in enumerate(data["columns"]):
+        values = [row[i] for row in rows]
+        if not all(isinstance(v, str) for v in values):
+            continue
+        distinct = list(dict.fromkeys(values))
+        if len(distinct) > len(values) * _DICT_MAX_DISTINCT_RATIO:
+            continue
+        index = {value: n for n, value in enumerate(distinct)}
+        for row in encoded_rows:
+            row[i] = index[row[i]]
+        dictionary[name] = distinct
+
+    if not dictionary:
+        return data
+    return {**data, "rows": encoded_rows, "dictionary": dictionary}
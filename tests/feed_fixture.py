@@ -0,0 +1,57 @@
+"""
+feed_fixture.py — Shared test fixture: a small GTFS feed loaded into a temp WORK_DIR.
+
+Functions:
+  - write_csv(path, headers, rows)    — one GTFS .txt file
+  - FeedTestCase.load_feed(tmp, files) — write the feed, point database at tmp/work, import it
+"""
+
+from __future__ import annotations
+
+import csv
+import unittest
+from typing import TYPE_CHECKING
+from unittest.mock import patch
+
+from bakalarka_gtfs.mcp import database as db
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+# Kalendar platny cely rok 2026 v pracovne dni
+CALENDAR_HEADERS = [
+    "service_id",
+    "monday",
+    "tuesday",
+    "wednesday",
+    "thursday",
+    "friday",
+    "saturday",
+    "sunday",
+    "start_date",
+    "end_date",
+]
+
+
+def write_csv(path: Path, headers: list[str], rows: list[list[str]]) -> None:
+    with path.open("w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(headers)
+        writer.writerows(rows)
+
+
+class FeedTestCase(unittest.TestCase):
+    """TestCase s nacitanim feedu; WORK_DIR/DB_PATH su presmerovane do konca testu."""
+
+    def load_feed(self, tmp: Path, files: dict[str, tuple[list[str], list[list[str]]]]) -> Path:
+        """Zapise subory {nazov: (hlavicka, riadky)} do tmp/feed a naimportuje ich. Vrati work_dir."""
+        feed_dir = tmp / "feed"
+        feed_dir.mkdir(parents=True, exist_ok=True)
+        for name, (headers, rows) in files.items():
+            write_csv(feed_dir / name, headers, rows)
+        work_dir = tmp / "work"
+        for patcher in (patch.object(db, "WORK_DIR", work_dir), patch.object(db, "DB_PATH", work_dir / "current.db")):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        db.ensure_loaded(str(feed_dir), force=True)
+        return work_dir
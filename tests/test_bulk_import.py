@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import csv
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from bakalarka_gtfs.mcp import database as db
+
+
+class TestBulkImport(unittest.TestCase):
+    def test_import_skips_audit_and_installs_triggers_after_load(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmp = Path(tmpdir)
+            feed_dir = tmp / "feed"
+            feed_dir.mkdir(parents=True, exist_ok=True)
+
+            self._write_csv(
+                feed_dir / "stops.txt",
+                ["stop_id", "stop_name", "stop_lat", "stop_lon", "stop_code", "zone_id", "location_type"],
+                [
+                    ["STOP_A", "A", "48.1", "17.1", "", "", "0"],
+                    ["STOP_B", "B", "48.2", "17.2", "", "", "0"],
+                ],
+            )
+            self._write_csv(
+                feed_dir / "routes.txt",
+                ["route_id", "agency_id", "route_short_name", "route_long_name", "route_type", "route_color"],
+                [["R1", "A1", "1", "Linka 1", "3", "FFFFFF"]],
+            )
+            self._write_csv(
+                feed_dir / "calendar.txt",
+                [
+                    "service_id",
+                    "monday",
+                    "tuesday",
+                    "wednesday",
+                    "thursday",
+                    "friday",
+                    "saturday",
+                    "sunday",
+                    "start_date",
+                    "end_date",
+                ],
+                [["S1", "1", "1", "1", "1", "1", "0", "0", "20260101", "20261231"]],
+            )
+            self._write_csv(
+                feed_dir / "trips.txt",
+                ["trip_id", "route_id", "service_id", "trip_headsign", "direction_id"],
+                [["T1", "R1", "S1", "B", "0"]],
+            )
+            self._write_csv(
+                feed_dir / "stop_times.txt",
+                ["trip_id", "arrival_time", "departure_time", "stop_id", "stop_sequence"],
+                [
+                    ["T1", "08:00:00", "08:00:00", "STOP_A", "1"],
+                    ["T1", "08:05:00", "08:05:00", "STOP_B", "2"],
+                ],
+            )
+
+            work_dir = tmp / "work"
+            db_path = work_dir / "current.db"
+
+            with patch.object(db, "WORK_DIR", work_dir), patch.object(db, "DB_PATH", db_path):
+                result = db.ensure_loaded(str(feed_dir), force=True)
+                self.assertEqual(result["tables"]["stop_times"], 2)
+
+                conn = sqlite3.connect(str(db_path))
+                try:
+                    self.assertEqual(conn.execute("SELECT COUNT(*) FROM audit_log").fetchone()[0], 0)
+
+                    names = {
+                        row[0]
+                        for row in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('index', 'trigger')")
+                    }
+                    self.assertIn("audit_stop_times_update", names)
+                    for index_name in db._INDEXES:
+                        self.assertIn(index_name, names)
+
+                    conn.execute("UPDATE stops SET stop_name = 'A2' WHERE stop_id = 'STOP_A'")
+                    conn.commit()
+                    self.assertEqual(conn.execute("SELECT COUNT(*) FROM audit_log").fetchone()[0], 1)
+                finally:
+                    conn.close()
+
+    def test_missing_managed_index_is_recreated_on_load(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmp = Path(tmpdir)
+            feed_dir = tmp / "feed"
+            feed_dir.mkdir(parents=True, exist_ok=True)
+            self._write_csv(
+                feed_dir / "stops.txt",
+                ["stop_id", "stop_name", "stop_lat", "stop_lon"],
+                [["STOP_A", "A", "48.1", "17.1"]],
+            )
+            self._write_csv(
+                feed_dir / "trips.txt",
+                ["trip_id", "route_id", "service_id", "shape_id"],
+                [["T1", "R1", "S1", "SH1"]],
+            )
+
+            work_dir = tmp / "work"
+            db_path = work_dir / "current.db"
+
+            with patch.object(db, "WORK_DIR", work_dir), patch.object(db, "DB_PATH", db_path):
+                db.ensure_loaded(str(feed_dir), force=True)
+
+                conn = sqlite3.connect(str(db_path))
+                conn.execute("DROP INDEX idx_trips_shape_id")
+                conn.close()
+
+                db.ensure_loaded(str(feed_dir))
+                indexes = {idx["name"]: idx for idx in db.list_indexes()}
+
+                self.assertEqual({name for name, idx in indexes.items() if idx["managed"]}, set(db._INDEXES))
+                self.assertEqual(indexes["idx_trips_shape_id"]["columns"], ["shape_id"])
+                self.assertGreater(indexes["idx_trips_shape_id"]["size_bytes"], 0)
+
+    def test_import_reports_progress_and_timings(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmp = Path(tmpdir)
+            feed_dir = tmp / "feed"
+            feed_dir.mkdir(parents=True, exist_ok=True)
+            self._write_csv(
+                feed_dir / "stops.txt",
+                ["stop_id", "stop_name", "stop_lat", "stop_lon"],
+                [["STOP_A", "A", "48.1", "17.1"], ["STOP_B", "B", "48.2", "17.2"]],
+            )
+            self._write_csv(
+                feed_dir / "stop_times.txt",
+                ["trip_id", "arrival_time", "departure_time", "stop_id", "stop_sequence"],
+                [["T1", "08:00:00", "08:00:00", "STOP_A", "1"]],
+            )
+
+            work_dir = tmp / "work"
+            events: list[tuple[float, float, str]] = []
+
+            with patch.object(db, "WORK_DIR", work_dir), patch.object(db, "DB_PATH", work_dir / "current.db"):
+                result = db.ensure_loaded(
+                    str(feed_dir), force=True, progress=lambda done, total, msg: events.append((done, total, msg))
+                )
+
+            timings = result["timings"]
+            self.assertEqual(timings["tables"]["stops"]["rows"], 2)
+            self.assertEqual(timings["tables"]["stop_times"]["rows"], 1)
+            self.assertLessEqual(
+                {"parse_s", "insert_s", "index_s", "trigger_s", "rows_per_s"}, set(timings["tables"]["stop_times"])
+            )
+            self.assertEqual(set(timings["phases"]), {"parse_s", "insert_s", "index_s", "trigger_s", "analyze_s"})
+
+            total = events[0][1]
+            self.assertTrue(events[0][2].startswith("stops: 2 riadkov"))
+            self.assertEqual([done for done, _, _ in events], sorted(done for done, _, _ in events))
+            self.assertEqual(events[-1][:2], (total, total))
+
+    @staticmethod
+    def _write_csv(path: Path, headers: list[str], rows: list[list[str]]) -> None:
+        with path.open("w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(headers)
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    unittest.main()
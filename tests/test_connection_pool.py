@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import csv
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from bakalarka_gtfs.mcp import database as db
+from bakalarka_gtfs.mcp.patching import apply_patch
+
+
+class TestConnectionPool(unittest.TestCase):
+    def test_reads_reuse_pooled_connections_and_recycle_after_swap(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmp = Path(tmpdir)
+            feed_dir = tmp / "feed"
+            feed_dir.mkdir(parents=True, exist_ok=True)
+            self._write_stops(feed_dir, [["STOP_A", "A", "48.1", "17.1"]])
+
+            work_dir = tmp / "work"
+            with patch.object(db, "WORK_DIR", work_dir), patch.object(db, "DB_PATH", work_dir / "current.db"):
+                db.ensure_loaded(str(feed_dir), force=True)
+                db.run_query("SELECT 1")
+
+                with patch.object(db.sqlite3, "connect", wraps=sqlite3.connect) as connect:
+                    for _ in range(5):
+                        db.run_query("SELECT stop_name FROM stops")
+                    self.assertEqual(connect.call_count, 0)
+
+                with db.read_connection() as conn, self.assertRaises(sqlite3.OperationalError):
+                    conn.execute("DELETE FROM stops")
+
+                generation = db._connections.generation
+                self._write_stops(feed_dir, [["STOP_A", "A", "48.1", "17.1"], ["STOP_B", "B", "48.2", "17.2"]])
+                db.ensure_loaded(str(feed_dir), force=True)
+
+                self.assertEqual(db.run_query("SELECT COUNT(*) AS c FROM stops")[0]["c"], 2)
+                self.assertGreater(db._connections.generation, generation)
+
+    def test_writer_changes_are_visible_to_pooled_readers(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmp = Path(tmpdir)
+            feed_dir = tmp / "feed"
+            feed_dir.mkdir(parents=True, exist_ok=True)
+            self._write_stops(feed_dir, [["STOP_A", "A", "48.1", "17.1"]])
+
+            work_dir = tmp / "work"
+            with patch.object(db, "WORK_DIR", work_dir), patch.object(db, "DB_PATH", work_dir / "current.db"):
+                db.ensure_loaded(str(feed_dir), force=True)
+                self.assertEqual(db.run_query("SELECT stop_name FROM stops")[0]["stop_name"], "A")
+
+                apply_patch(
+                    {
+                        "operations": [
+                            {
+                                "op": "update",
+                                "table": "stops",
+                                "filter": {"column": "stop_id", "operator": "=", "value": "STOP_A"},
+                                "set": {"stop_name": "A2"},
+                            }
+                        ]
+                    }
+                )
+                self.assertEqual(db.run_query("SELECT stop_name FROM stops")[0]["stop_name"], "A2")
+
+                with self.assertRaises(sqlite3.IntegrityError):
+                    apply_patch(
+                        {
+                            "operations": [
+                                {
+                                    "op": "update",
+                                    "table": "stops",
+                                    "filter": {"column": "stop_id", "operator": "=", "value": "STOP_A"},
+                                    "set": {"stop_name": "A3"},
+                                },
+                                {"op": "insert", "table": "stops", "rows": [{"stop_id": "STOP_X", "stop_name": None}]},
+                            ]
+                        }
+                    )
+                # Zlyhany patch sa vratil cely, writer je znova pouzitelny
+                self.assertEqual(db.run_query("SELECT stop_name FROM stops")[0]["stop_name"], "A2")
+                with db.write_connection() as conn:
+                    self.assertFalse(conn.in_transaction)
+
+    def _write_stops(self, feed_dir: Path, rows: list[list[str]]) -> None:
+        self._write_csv(feed_dir / "stops.txt", ["stop_id", "stop_name", "stop_lat", "stop_lon"], rows)
+
+    @staticmethod
+    def _write_csv(path: Path, headers: list[str], rows: list[list[str]]) -> None:
+        with path.open("w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(headers)
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    unittest.main()
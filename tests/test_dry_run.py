@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+
+from bakalarka_gtfs.mcp import database as db
+from bakalarka_gtfs.mcp.patching import StalePatchError, apply_patch, dry_run_patch, patch_hash, validate_patch
+from bakalarka_gtfs.mcp.patching.plans import plan_cache
+from feed_fixture import CALENDAR_HEADERS, FeedTestCase
+
+
+class TestDryRun(FeedTestCase):
+    def test_dry_run_previews_exact_rows_and_apply_replays_it(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            self._load(Path(tmpdir))
+            shift = {
+                "operations": [
+                    {
+                        "op": "update",
+                        "table": "stop_times",
+                        "filter": {"column": "trip_id", "operator": "=", "value": "T1"},
+                        "set": {"arrival_time": {"transform": "time_add", "minutes": 5}},
+                    }
+                ]
+            }
+            version = db.database_version()
+            plan = dry_run_patch(shift)
+
+            self.assertTrue(plan["valid"], plan["errors"])
+            self.assertFalse(plan["cached"])
+            op = plan["operations"][0]
+            self.assertEqual(op["matched_rows"], 2)
+            self.assertEqual(op["before_preview"][0]["arrival_time"], "08:00:00")
+            self.assertEqual(op["after_preview"][0]["arrival_time"], "08:05:00")
+            self.assertEqual(op["after_preview"][0]["arrival_seconds"], 8 * 3600 + 300)
+            # Transakcia sa vratila spat — data aj verzia DB su nezmenene
+            self.assertEqual(db.database_version(), version)
+            self.assertEqual(db.run_query("SELECT arrival_time FROM stop_times LIMIT 1")[0]["arrival_time"], "08:00:00")
+            self.assertTrue(dry_run_patch(shift)["cached"])
+
+            # Plan s inym poctom riadkov (rozbity plan) -> apply sa vrati spat
+            plan_cache.put(patch_hash(shift), {**plan, "operations": [{**op, "matched_rows": 99}]}, [None])
+            with self.assertRaises(RuntimeError):
+                apply_patch(shift)
+            self.assertEqual(db.database_version(), version)
+
+            self.assertFalse(dry_run_patch(shift)["cached"])
+            # Zapis do tabulky mimo patchu plan nezneplatni, apply ide po rowid bez filtra
+            apply_patch(self._rename_route("Linka 1"))
+            db._statement_stats.reset()
+            result = apply_patch(shift)
+            self.assertTrue(result["replayed_plan"])
+            self.assertEqual(result["affected_rows"], {"stop_times": 2})
+            updates = [s["sql"] for s in db.statement_stats()["statements"] if s["sql"].startswith("UPDATE STOP_TIMES")]
+            self.assertEqual(len(updates), 1)
+            self.assertIn("WHERE ROWID IN (SELECT ID FROM TEMP.PATCH_ROWIDS)", updates[0])
+            self.assertEqual(db.run_query("SELECT arrival_time FROM stop_times LIMIT 1")[0]["arrival_time"], "08:05:00")
+            # Po commite je plan neplatny — dalsi dry run pocita nad novym stavom
+            again = dry_run_patch(shift)
+            self.assertFalse(again["cached"])
+            self.assertEqual(again["operations"][0]["after_preview"][0]["arrival_time"], "08:10:00")
+
+    def test_apply_rejects_plan_when_its_table_moved_on(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            self._load(Path(tmpdir))
+            delete_trip = {
+                "operations": [
+                    {
+                        "op": "delete",
+                        "table": "stop_times",
+                        "filter": {"column": "trip_id", "operator": "=", "value": "T2"},
+                    }
+                ]
+            }
+            proposed = dry_run_patch(delete_trip)["table_versions"]
+            # Plan vypadol z cache — bez neho sa patch neaplikuje ani cez filter
+            plan_cache.clear()
+            with self.assertRaises(StalePatchError):
+                apply_patch(delete_trip, proposed)
+
+            proposed = dry_run_patch(delete_trip)["table_versions"]
+            # Iny patch medzitym zmenil stop_times
+            apply_patch(
+                {
+                    "operations": [
+                        {
+                            "op": "insert",
+                            "table": "stop_times",
+                            "rows": [
+                                {
+                                    "trip_id": "T2",
+                                    "arrival_time": "09:10:00",
+                                    "departure_time": "09:10:00",
+                                    "stop_id": "STOP_A",
+                                    "stop_sequence": 2,
+                                }
+                            ],
+                        }
+                    ]
+                }
+            )
+            with self.assertRaises(StalePatchError) as ctx:
+                apply_patch(delete_trip, proposed)
+            self.assertEqual(ctx.exception.tables, ["stop_times"])
+            # Validacia voci verziam z navrhu zmenu tiez ohlasi, aj ked by novy dry run presiel
+            with self.assertRaises(StalePatchError):
+                dry_run_patch(delete_trip, proposed)
+            plan_cache.clear()
+            with self.assertRaises(StalePatchError):
+                apply_patch(delete_trip, proposed)
+            self.assertEqual(db.run_query("SELECT COUNT(*) AS n FROM stop_times")[0]["n"], 4)
+
+            # Novy navrh vidi aj pridanu zastavku
+            replan = dry_run_patch(delete_trip)
+            self.assertEqual(replan["total_affected_rows"], 2)
+            self.assertEqual(apply_patch(delete_trip, replan["table_versions"])["affected_rows"], {"stop_times": 2})
+
+    def test_whole_patch_fk_check_ignores_rows_the_patch_did_not_touch(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            self._load(Path(tmpdir))
+            # Spoj na neexistujucu zastavku uz v DB (FK mimo MCP servera nevynucovane)
+            conn = sqlite3.connect(str(db.DB_PATH))
+            conn.execute(
+                "INSERT INTO stop_times (trip_id, arrival_time, departure_time, stop_id, stop_sequence) "
+                "VALUES ('T2', '09:10:00', '09:10:00', 'GHOST', 2)"
+            )
+            conn.commit()
+            conn.close()
+
+            rename_stop = {
+                "operations": [
+                    {
+                        "op": "update",
+                        "table": "stops",
+                        "filter": {"column": "stop_id", "operator": "=", "value": "STOP_A"},
+                        "set": {"stop_name": name},
+                    }
+                    for name in ("A1", "A2")
+                ]
+            }
+            plan = dry_run_patch(rename_stop)
+            self.assertTrue(plan["valid"], plan["errors"])
+            self.assertEqual(apply_patch(rename_stop)["affected_rows"], {"stops": 2})
+
+            # Premenovany kluc zastavky sa hlasi pri riadkoch, ktore nan odkazuju; GHOST nie
+            rekey_stop = {
+                "operations": [
+                    rename_stop["operations"][0],
+                    {
+                        "op": "update",
+                        "table": "stops",
+                        "filter": {"column": "stop_id", "operator": "=", "value": "STOP_A"},
+                        "set": {"stop_id": "STOP_Z"},
+                    },
+                ]
+            }
+            self.assertEqual(
+                dry_run_patch(rekey_stop)["errors"],
+                ["Po celom patchi: FK chyba — stop_times.stop_id='STOP_A' neexistuje v stops."] * 3,
+            )
+
+    def test_operations_are_validated_against_state_of_previous_ones(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            self._load(Path(tmpdir))
+            new_route = {
+                "operations": [
+                    {
+                        "op": "insert",
+                        "table": "routes",
+                        "rows": [{"route_id": "R2", "route_short_name": "2", "route_type": 3}],
+                    },
+                    {
+                        "op": "insert",
+                        "table": "trips",
+                        "rows": [{"trip_id": "T9", "route_id": "R2", "service_id": "S1"}],
+                    },
+                ]
+            }
+            self.assertFalse(validate_patch(new_route)["valid"])  # kazda operacia zvlast voci DB
+            plan = dry_run_patch(new_route)
+            self.assertTrue(plan["valid"], plan["errors"])
+            self.assertEqual(plan["total_affected_rows"], 2)
+            self.assertEqual(plan["operations"][1]["after_preview"][0]["route_id"], "R2")
+
+            rename = {
+                "operations": [
+                    {
+                        "op": "update",
+                        "table": "routes",
+                        "filter": {"column": "route_id", "operator": "=", "value": "R1"},
+                        "set": {"route_id": "R1X"},
+                    }
+                ]
+            }
+            self.assertEqual(
+                dry_run_patch(rename)["errors"],
+                [
+                    "Po celom patchi: FK chyba — trips.route_id='R1' neexistuje v routes.",
+                    "Po celom patchi: FK chyba — trips.route_id='R1' neexistuje v routes.",
+                ],
+            )
+
+            # Premenovanie kluca aj s odkazmi: medzistav po prvej operacii FK porusuje, vysledok nie
+            rename_with_trips = {
+                "operations": [
+                    rename["operations"][0] | {"set": {"route_id": "R9"}},
+                    {
+                        "op": "update",
+                        "table": "trips",
+                        "filter": {"column": "route_id", "operator": "=", "value": "R1"},
+                        "set": {"route_id": "R9"},
+                    },
+                ]
+            }
+            self.assertTrue(dry_run_patch(rename_with_trips)["valid"])
+            self.assertEqual(apply_patch(rename_with_trips)["affected_rows"], {"routes": 1, "trips": 2})
+            self.assertEqual(db.run_query("SELECT DISTINCT route_id FROM trips"), [{"route_id": "R9"}])
+
+            broken = {
+                "operations": [
+                    {"op": "insert", "table": "stops", "rows": [{"stop_id": "STOP_B", "stop_name": None}]},
+                    {"op": "delete", "table": "trips", "filter": {"column": "trip_id", "operator": "=", "value": "T2"}},
+                ]
+            }
+            plan = dry_run_patch(broken)
+            self.assertEqual(len([e for e in plan["errors"] if e.startswith("Op#1")]), 3)
+            self.assertEqual(plan["warnings"], ["Operacie od Op#2 sa po chybe neoverili."])
+
+    @staticmethod
+    def _rename_route(name: str) -> dict:
+        return {
+            "operations": [
+                {
+                    "op": "update",
+                    "table": "routes",
+                    "filter": {"column": "route_id", "operator": "=", "value": "R1"},
+                    "set": {"route_long_name": name},
+                }
+            ]
+        }
+
+    def _load(self, tmp: Path) -> None:
+        plan_cache.clear()
+        self.addCleanup(plan_cache.clear)
+        self.load_feed(
+            tmp,
+            {
+                "stops.txt": (["stop_id", "stop_name", "stop_lat", "stop_lon"], [["STOP_A", "A", "48.1", "17.1"]]),
+                "routes.txt": (["route_id", "route_short_name", "route_type"], [["R1", "1", "3"]]),
+                "calendar.txt": (
+                    CALENDAR_HEADERS,
+                    [["S1", "1", "1", "1", "1", "1", "0", "0", "20260101", "20261231"]],
+                ),
+                "trips.txt": (["trip_id", "route_id", "service_id"], [["T1", "R1", "S1"], ["T2", "R1", "S1"]]),
+                "stop_times.txt": (
+                    ["trip_id", "arrival_time", "departure_time", "stop_id", "stop_sequence"],
+                    [
+                        ["T1", "08:00:00", "08:10:00", "STOP_A", "1"],
+                        ["T1", "08:20:00", "08:30:00", "STOP_A", "2"],
+                        ["T2", "09:00:00", "09:00:00", "STOP_A", "1"],
+                    ],
+                ),
+            },
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
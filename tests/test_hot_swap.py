@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import csv
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from bakalarka_gtfs.mcp import database as db
+
+
+class TestHotSwap(unittest.TestCase):
+    def test_forced_reload_keeps_old_snapshot_readable_until_swap(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmp = Path(tmpdir)
+            feed_dir = tmp / "feed"
+            feed_dir.mkdir(parents=True, exist_ok=True)
+            self._write_stops(feed_dir, [["STOP_A", "Stara", "48.1", "17.1"]])
+
+            work_dir = tmp / "work"
+            db_path = work_dir / "current.db"
+
+            with (
+                patch.object(db, "WORK_DIR", work_dir),
+                patch.object(db, "DB_PATH", db_path),
+                patch.object(db, "_import_cache", return_value=db.ImportCache(work_dir / "import_cache", 0)),
+            ):
+                db.ensure_loaded(str(feed_dir), force=True)
+
+                # Citatel otvoreny pred reloadom
+                reader = sqlite3.connect(str(db_path))
+                try:
+                    self._write_stops(feed_dir, [["STOP_A", "Nova", "48.1", "17.1"], ["STOP_B", "B", "48.2", "17.2"]])
+
+                    seen_during_import: list[str] = []
+                    real_do_import = db._do_import
+
+                    def observing_import(*args, **kwargs):
+                        # Pocas importu je current.db stale stary, kompletny snapshot
+                        seen_during_import.append(db.run_query("SELECT stop_name FROM stops")[0]["stop_name"])
+                        return real_do_import(*args, **kwargs)
+
+                    with patch.object(db, "_do_import", side_effect=observing_import):
+                        result = db.ensure_loaded(str(feed_dir), force=True)
+
+                    self.assertEqual(result["tables"]["stops"], 2)
+                    self.assertEqual(seen_during_import, ["Stara"])
+                    self.assertEqual(reader.execute("SELECT stop_name FROM stops").fetchall(), [("Stara",)])
+                finally:
+                    reader.close()
+
+                self.assertEqual(db.run_query("SELECT COUNT(*) AS c FROM stops")[0]["c"], 2)
+                self.assertEqual(sorted(p.name for p in work_dir.iterdir()), ["current.db"])
+
+    def test_failed_import_leaves_current_db_untouched(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmp = Path(tmpdir)
+            feed_dir = tmp / "feed"
+            feed_dir.mkdir(parents=True, exist_ok=True)
+            self._write_stops(feed_dir, [["STOP_A", "A", "48.1", "17.1"]])
+
+            work_dir = tmp / "work"
+            db_path = work_dir / "current.db"
+
+            with patch.object(db, "WORK_DIR", work_dir), patch.object(db, "DB_PATH", db_path):
+                db.ensure_loaded(str(feed_dir), force=True)
+                self._write_stops(feed_dir, [["STOP_B", "B", "48.2", "17.2"]])
+
+                with (
+                    patch.object(db, "_do_import", side_effect=RuntimeError("import zlyhal")),
+                    self.assertRaises(RuntimeError),
+                ):
+                    db.ensure_loaded(str(feed_dir), force=True)
+
+                rows = db.run_query("SELECT stop_id FROM stops")
+                self.assertEqual(rows, [{"stop_id": "STOP_A"}])
+                self.assertFalse(list(work_dir.glob("*.staging.db")))
+
+    def _write_stops(self, feed_dir: Path, rows: list[list[str]]) -> None:
+        self._write_csv(feed_dir / "stops.txt", ["stop_id", "stop_name", "stop_lat", "stop_lon"], rows)
+
+    @staticmethod
+    def _write_csv(path: Path, headers: list[str], rows: list[list[str]]) -> None:
+        with path.open("w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(headers)
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    unittest.main()
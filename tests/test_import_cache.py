@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import csv
+import os
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from bakalarka_gtfs.mcp import database as db
+from bakalarka_gtfs.mcp.import_cache import ImportCache
+
+
+class TestImportCache(unittest.TestCase):
+    def test_forced_reload_of_same_feed_restores_pristine_snapshot(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmp = Path(tmpdir)
+            feed_dir = tmp / "feed"
+            feed_dir.mkdir(parents=True, exist_ok=True)
+            self._write_csv(
+                feed_dir / "stops.txt",
+                ["stop_id", "stop_name", "stop_lat", "stop_lon"],
+                [["STOP_A", "A", "48.1", "17.1"], ["STOP_B", "B", "48.2", "17.2"]],
+            )
+
+            work_dir = tmp / "work"
+            db_path = work_dir / "current.db"
+
+            with patch.object(db, "WORK_DIR", work_dir), patch.object(db, "DB_PATH", db_path):
+                first = db.ensure_loaded(str(feed_dir), force=True)
+                self.assertEqual(first["source"], "csv")
+
+                conn = sqlite3.connect(str(db_path))
+                conn.execute("UPDATE stops SET stop_name = 'Zmenena' WHERE stop_id = 'STOP_A'")
+                conn.commit()
+                conn.close()
+
+                with patch.object(db, "_do_import", side_effect=AssertionError("CSV import pri cache hit")):
+                    second = db.ensure_loaded(str(feed_dir), force=True)
+                self.assertEqual(second["source"], "cache")
+                self.assertEqual(second["feed_fingerprint"], first["feed_fingerprint"])
+                self.assertEqual(second["tables"]["stops"], 2)
+                self.assertEqual(set(second["tables"]), set(first["tables"]))
+                rows = db.run_query("SELECT stop_name FROM stops WHERE stop_id = 'STOP_A'")
+                self.assertEqual(rows[0]["stop_name"], "A")
+
+                self._write_csv(feed_dir / "stops.txt", ["stop_id", "stop_name", "stop_lat", "stop_lon"], [])
+                third = db.ensure_loaded(str(feed_dir), force=True)
+                self.assertEqual(third["source"], "csv")
+                self.assertNotEqual(third["feed_fingerprint"], first["feed_fingerprint"])
+
+                listing = db.list_import_cache()
+                self.assertEqual(listing["count"], 2)
+                self.assertEqual(listing["entries"][0]["fingerprint"], third["feed_fingerprint"])
+                self.assertEqual(listing["entries"][0]["feed_path"], str(feed_dir))
+
+                self.assertEqual(db.purge_import_cache(first["feed_fingerprint"])["removed"], 1)
+                self.assertEqual(db.purge_import_cache()["removed"], 1)
+                self.assertEqual(db.list_import_cache()["count"], 0)
+
+    def test_store_evicts_least_recently_used_snapshots(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmp = Path(tmpdir)
+            db_file = tmp / "fresh.db"
+            db_file.write_bytes(b"x" * 100)
+            cache = ImportCache(tmp / "cache", max_bytes=250)
+
+            a, b, c = ("a" * 64, "b" * 64, "c" * 64)
+            cache.store(a, db_file)
+            cache.store(b, db_file)
+            os.utime(cache.directory / f"{a}.db", (1, 1))
+            os.utime(cache.directory / f"{b}.db", (2, 2))
+            self.assertIsNotNone(cache.lookup(a))
+
+            cache.store(c, db_file)
+            self.assertEqual(sorted(e.fingerprint for e in cache.entries()), [a, c])
+
+    def test_foreign_db_files_in_cache_directory_are_ignored(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmp = Path(tmpdir)
+            db_file = tmp / "fresh.db"
+            db_file.write_bytes(b"x" * 100)
+            cache = ImportCache(tmp / "cache", max_bytes=150)
+            cache.directory.mkdir()
+            stray = cache.directory / "backup-old.db"
+            stray.write_bytes(b"y" * 100)
+
+            a, b = ("a" * 64, "b" * 64)
+            cache.store(a, db_file)
+            os.utime(cache.directory / f"{a}.db", (1, 1))
+            cache.store(b, db_file)
+            self.assertEqual([e.fingerprint for e in cache.entries()], [b])
+            self.assertEqual(cache.purge(), 1)
+            self.assertTrue(stray.exists())
+
+    def test_disabled_cache_skips_feed_fingerprint(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmp = Path(tmpdir)
+            feed_dir = tmp / "feed"
+            feed_dir.mkdir(parents=True, exist_ok=True)
+            self._write_csv(
+                feed_dir / "stops.txt",
+                ["stop_id", "stop_name", "stop_lat", "stop_lon"],
+                [["STOP_A", "A", "48.1", "17.1"]],
+            )
+            work_dir = tmp / "work"
+            disabled = ImportCache(work_dir / "import_cache", max_bytes=0)
+
+            with (
+                patch.object(db, "WORK_DIR", work_dir),
+                patch.object(db, "DB_PATH", work_dir / "current.db"),
+                patch.object(db, "_import_cache", return_value=disabled),
+                patch.object(db, "feed_fingerprint", side_effect=AssertionError("hash feedu bez cache")),
+            ):
+                result = db.ensure_loaded(str(feed_dir), force=True)
+                self.assertEqual(result["source"], "csv")
+                self.assertIsNone(result["feed_fingerprint"])
+                self.assertEqual(result["tables"]["stops"], 1)
+            self.assertFalse(disabled.directory.exists())
+
+    def test_fingerprint_outside_sha256_hex_is_rejected(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmp = Path(tmpdir)
+            live_db = tmp / "current.db"
+            live_db.write_bytes(b"live")
+            cache = ImportCache(tmp / "cache")
+            (tmp / "cache").mkdir()
+
+            for fingerprint in ("../current", "A" * 64, "a" * 63):
+                with self.assertRaises(ValueError):
+                    cache.purge(fingerprint)
+            with self.assertRaises(ValueError):
+                cache.lookup("../current")
+            self.assertTrue(live_db.exists())
+
+    @staticmethod
+    def _write_csv(path: Path, headers: list[str], rows: list[list[str]]) -> None:
+        with path.open("w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(headers)
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    unittest.main()
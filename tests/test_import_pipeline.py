@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import csv
+import tempfile
+import unittest
+import zipfile
+from pathlib import Path
+
+from bakalarka_gtfs.mcp.import_pipeline import (
+    FeedSource,
+    find_zip_root,
+    iter_tasks,
+    open_feed,
+    parse_chunk,
+    parse_files,
+)
+
+
+class TestImportPipeline(unittest.TestCase):
+    def test_small_chunks_match_sequential_csv_reader(self) -> None:
+        columns = ["stop_id", "stop_name", "stop_lat", "stop_lon", "stop_code", "zone_id", "location_type"]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "stops.txt"
+            with path.open("w", newline="", encoding="utf-8-sig") as f:
+                writer = csv.writer(f)
+                writer.writerow(["stop_id", "stop_name", "stop_lat", "stop_lon", "location_type"])
+                for i in range(200):
+                    name = f'Zastavka "{i}"\nnastupiste' if i % 7 == 0 else f"Zastavka {i}"
+                    writer.writerow([f"S{i}", name, "48.1", "17.1", ""])
+
+            with path.open(newline="", encoding="utf-8-sig") as f:
+                expected = [tuple(row.get(c) or None for c in columns) for row in csv.DictReader(f)]
+
+            source = FeedSource(Path(tmpdir))
+            tasks = list(iter_tasks(source, "stops.txt", "stops", columns, chunk_bytes=64))
+            self.assertGreater(len(tasks), 10)
+            chunked = [row for task in tasks for row in parse_chunk(task)[1]]
+            self.assertEqual(chunked, expected)
+
+            parallel = [
+                row for _, rows, _ in parse_files(source, [("stops.txt", "stops", columns)], workers=2) for row in rows
+            ]
+            self.assertEqual(parallel, expected)
+
+    def test_zip_members_are_streamed_from_nested_root(self) -> None:
+        self.assertEqual(find_zip_root(["__MACOSX/feed/stops.txt", "gtfs/feed/stops.txt", "gtfs/stops.txt"]), "gtfs/")
+        self.assertIsNone(find_zip_root(["a/b/c/d/stops.txt", "routes.txt"]))
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            zip_path = Path(tmpdir) / "feed.zip"
+            with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
+                zf.writestr(
+                    "export/gtfs/stops.txt", "stop_id,stop_name,stop_lat,stop_lon\nS1,A,48.1,17.1\nS2,B,48.2,17.2\n"
+                )
+                zf.writestr("export/readme.txt", "nie je GTFS")
+
+            source = open_feed(zip_path)
+            self.assertIsNotNone(source)
+            self.assertEqual(source.prefix, "export/gtfs/")
+            self.assertTrue(source.has("stops.txt"))
+            self.assertFalse(source.has("routes.txt"))
+
+            batches = list(parse_files(source, [("stops.txt", "stops", ["stop_id", "stop_name", "stop_code"])]))
+            self.assertEqual(
+                [(table, rows) for table, rows, _ in batches], [("stops", [("S1", "A", None), ("S2", "B", None)])]
+            )
+            self.assertEqual(sorted(p.name for p in Path(tmpdir).iterdir()), ["feed.zip"])
+
+
+if __name__ == "__main__":
+    unittest.main()
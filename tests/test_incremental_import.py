@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import csv
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from bakalarka_gtfs.mcp import database as db
+
+_STOP_HEADERS = ["stop_id", "stop_name", "stop_lat", "stop_lon"]
+
+_STOPS_V1 = [
+    ["STOP_A", "A", "48.1", "17.1"],
+    ["STOP_B", "B", "48.2", "17.2"],
+    ["STOP_C", "C", "48.3", "17.3"],
+]
+_STOPS_V2 = [
+    ["STOP_A", "A nova", "48.1", "17.1"],
+    ["STOP_B", "B", "48.2", "17.2"],
+    ["STOP_D", "D", "48.4", "17.4"],
+]
+
+
+class TestIncrementalImport(unittest.TestCase):
+    def test_incremental_applies_only_feed_delta_and_keeps_local_patches(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmp = Path(tmpdir)
+            feed_v1, feed_v2 = self._write_feeds(tmp)
+            work_dir = tmp / "work"
+            db_path = work_dir / "current.db"
+
+            with patch.object(db, "WORK_DIR", work_dir), patch.object(db, "DB_PATH", db_path):
+                db.ensure_loaded(str(feed_v1), force=True)
+                self._execute(db_path, "UPDATE stops SET stop_name = 'B lokalne' WHERE stop_id = 'STOP_B'")
+
+                result = db.ensure_loaded(str(feed_v2), incremental=True)
+                self.assertEqual(result["status"], "incremental")
+                self.assertEqual(result["diff_base"], "previous_feed")
+                self.assertEqual(result["changes"]["stops"], {"inserted": 1, "updated": 1, "deleted": 1})
+                self.assertEqual(result["changes"]["routes"], {"inserted": 0, "updated": 0, "deleted": 0})
+
+                self.assertEqual(
+                    self._stops(),
+                    [("STOP_A", "A nova"), ("STOP_B", "B lokalne"), ("STOP_D", "D")],
+                )
+
+                audit = db.run_query("SELECT operation, record_id FROM audit_log WHERE log_id > 1 ORDER BY log_id")
+                self.assertEqual(
+                    sorted((r["operation"], r["record_id"]) for r in audit),
+                    [("DELETE", "STOP_C"), ("INSERT", "STOP_D"), ("UPDATE", "STOP_A")],
+                )
+
+                again = db.ensure_loaded(str(feed_v2), incremental=True)
+                self.assertEqual(again["status"], "up_to_date")
+
+    def test_missing_base_snapshot_diffs_against_current_db(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmp = Path(tmpdir)
+            feed_v1, feed_v2 = self._write_feeds(tmp)
+            work_dir = tmp / "work"
+            db_path = work_dir / "current.db"
+
+            with patch.object(db, "WORK_DIR", work_dir), patch.object(db, "DB_PATH", db_path):
+                first = db.ensure_loaded(str(feed_v1), force=True)
+                self._execute(db_path, "UPDATE stops SET stop_name = 'B lokalne' WHERE stop_id = 'STOP_B'")
+                db.purge_import_cache(first["feed_fingerprint"])
+
+                result = db.ensure_loaded(str(feed_v2), incremental=True)
+                self.assertEqual(result["diff_base"], "current_db")
+                # Bez stareho feedu sa lokalny patch neda odlisit od zmeny feedu
+                self.assertEqual(result["changes"]["stops"], {"inserted": 1, "updated": 2, "deleted": 1})
+                self.assertEqual(self._stops(), [("STOP_A", "A nova"), ("STOP_B", "B"), ("STOP_D", "D")])
+
+    def test_feed_change_wins_over_local_delete_and_local_patch_loses_to_feed_delete(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmp = Path(tmpdir)
+            feed_v1, feed_v2 = self._write_feeds(tmp)
+            work_dir = tmp / "work"
+            db_path = work_dir / "current.db"
+
+            with patch.object(db, "WORK_DIR", work_dir), patch.object(db, "DB_PATH", db_path):
+                db.ensure_loaded(str(feed_v1), force=True)
+                # STOP_A feed zmeni, STOP_B nie; STOP_C feed zmaze
+                self._execute(
+                    db_path,
+                    "DELETE FROM stops WHERE stop_id IN ('STOP_A', 'STOP_B')",
+                    "UPDATE stops SET stop_name = 'C lokalne' WHERE stop_id = 'STOP_C'",
+                )
+
+                result = db.ensure_loaded(str(feed_v2), incremental=True)
+                self.assertEqual(result["diff_base"], "previous_feed")
+                self.assertEqual(result["changes"]["stops"], {"inserted": 2, "updated": 0, "deleted": 1})
+                self.assertEqual(self._stops(), [("STOP_A", "A nova"), ("STOP_D", "D")])
+
+    def test_unchanged_feed_short_circuits_without_import(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmp = Path(tmpdir)
+            feed_v1, _ = self._write_feeds(tmp)
+            work_dir = tmp / "work"
+            db_path = work_dir / "current.db"
+
+            with patch.object(db, "WORK_DIR", work_dir), patch.object(db, "DB_PATH", db_path):
+                first = db.ensure_loaded(str(feed_v1), force=True)
+                self._execute(db_path, "UPDATE stops SET stop_name = 'B lokalne' WHERE stop_id = 'STOP_B'")
+
+                with (
+                    patch.object(db, "_do_import", side_effect=AssertionError("import pri nezmenenom feede")),
+                    patch.object(db, "_apply_feed_delta", side_effect=AssertionError("delta pri nezmenenom feede")),
+                ):
+                    result = db.ensure_loaded(str(feed_v1), incremental=True)
+                self.assertEqual(result["status"], "up_to_date")
+                self.assertEqual(result["feed_fingerprint"], first["feed_fingerprint"])
+                self.assertEqual(result["changes"], {})
+                self.assertIn(("STOP_B", "B lokalne"), self._stops())
+
+    @staticmethod
+    def _stops() -> list[tuple[str, str]]:
+        rows = db.run_query("SELECT stop_id, stop_name FROM stops ORDER BY stop_id")
+        return [(r["stop_id"], r["stop_name"]) for r in rows]
+
+    @staticmethod
+    def _execute(db_path: Path, *statements: str) -> None:
+        """Lokalna zmena mimo patch workflow (priamo v current.db)."""
+        conn = sqlite3.connect(str(db_path))
+        for sql in statements:
+            conn.execute(sql)
+        conn.commit()
+        conn.close()
+
+    def _write_feeds(self, tmp: Path) -> tuple[Path, Path]:
+        """Dve verzie feedu: v2 meni STOP_A, maze STOP_C a pridava STOP_D."""
+        feed_v1 = tmp / "feed_v1"
+        feed_v2 = tmp / "feed_v2"
+        for feed_dir, stops in ((feed_v1, _STOPS_V1), (feed_v2, _STOPS_V2)):
+            feed_dir.mkdir(parents=True, exist_ok=True)
+            self._write_csv(
+                feed_dir / "routes.txt",
+                ["route_id", "agency_id", "route_short_name", "route_long_name", "route_type", "route_color"],
+                [["R1", "A1", "1", "Linka 1", "3", "FFFFFF"]],
+            )
+            self._write_csv(feed_dir / "stops.txt", _STOP_HEADERS, stops)
+        return feed_v1, feed_v2
+
+    @staticmethod
+    def _write_csv(path: Path, headers: list[str], rows: list[list[str]]) -> None:
+        with path.open("w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(headers)
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    unittest.main()
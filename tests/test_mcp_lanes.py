@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import inspect
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+import anyio
+
+from bakalarka_gtfs.mcp import lanes
+
+
+class _Probe:
+    """Pocita, kolko volani bezi naraz."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+
+    def __call__(self, value: int, delay: float = 0.1) -> int:
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(delay)
+        with self._lock:
+            self.active -= 1
+        return value
+
+
+class TestMcpLanes(unittest.TestCase):
+    def setUp(self) -> None:
+        lanes._limiters.clear()
+        self.addCleanup(lanes._limiters.clear)
+
+    def test_reads_run_concurrently_writes_one_at_a_time_off_the_loop(self) -> None:
+        registered: dict[str, object] = {}
+        read_probe, write_probe = _Probe(), _Probe()
+
+        def read_tool(value: int, delay: float = 0.1) -> int:
+            """Citaci nastroj."""
+            return read_probe(value, delay)
+
+        def write_tool(value: int, delay: float = 0.1) -> int:
+            return write_probe(value, delay)
+
+        def register(fn):
+            registered[fn.__name__] = fn
+            return fn
+
+        with patch.dict(lanes.LANE_SIZES, {"read": 4}):
+            self.assertIs(lanes.lane_tool(register, "read")(read_tool), read_tool)
+            lanes.lane_tool(register, "write")(write_tool)
+
+        async_read = registered["read_tool"]
+        self.assertTrue(inspect.iscoroutinefunction(async_read))
+        self.assertEqual(inspect.signature(async_read), inspect.signature(read_tool))
+        self.assertEqual(async_read.__doc__, "Citaci nastroj.")
+
+        results: list[int] = []
+        ticks = 0
+
+        async def call(fn, value: int) -> None:
+            results.append(await fn(value))
+
+        async def ticker(done: anyio.Event) -> None:
+            nonlocal ticks
+            while not done.is_set():
+                ticks += 1
+                await anyio.sleep(0.01)
+
+        async def main() -> None:
+            done = anyio.Event()
+            async with anyio.create_task_group() as outer:
+                outer.start_soon(ticker, done)
+                async with anyio.create_task_group() as tg:
+                    for i in range(4):
+                        tg.start_soon(call, registered["read_tool"], i)
+                    for i in range(3):
+                        tg.start_soon(call, registered["write_tool"], 10 + i)
+                done.set()
+
+        with patch.dict(lanes.LANE_SIZES, {"read": 4}):
+            anyio.run(main)
+
+        self.assertEqual(sorted(results), [0, 1, 2, 3, 10, 11, 12])
+        self.assertGreater(read_probe.peak, 1)
+        self.assertEqual(write_probe.peak, 1)
+        # Event loop bezal dalej, kym nastroje blokovali worker thready
+        self.assertGreater(ticks, 10)
+
+    def test_unknown_lane_is_rejected(self) -> None:
+        with self.assertRaises(ValueError):
+            lanes.lane_tool(lambda fn: fn, "reads")
+
+
+if __name__ == "__main__":
+    unittest.main()
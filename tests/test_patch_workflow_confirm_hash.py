@@ -25,9 +25,19 @@ def _install_mcp_stub() -> None:
 
             return decorator
 
+        def resource(self, *args, **kwargs):
+            def decorator(fn):
+                return fn
+
+            return decorator
+
         def run(self, *args, **kwargs):
             return None
 
+    class _ContextStub:
+        pass
+
+    fastmcp_module.Context = _ContextStub
     fastmcp_module.FastMCP = _FastMCPStub
     mcp_module.server = server_module
     server_module.fastmcp = fastmcp_module
@@ -79,10 +89,18 @@ class TestPatchWorkflowConfirmHash(unittest.TestCase):
             ),
             patch.object(
                 st,
-                "build_diff_summary",
-                return_value={"total_operations": 1, "total_affected_rows": 1, "operations": []},
+                "dry_run_patch",
+                return_value={
+                    "total_operations": 1,
+                    "total_affected_rows": 1,
+                    "operations": [],
+                    "valid": True,
+                    "errors": [],
+                    "warnings": [],
+                    "table_versions": {"stop_times": [1, 0]},
+                    "cached": False,
+                },
             ),
-            patch.object(st, "validate_patch", return_value={"valid": True, "errors": [], "warnings": []}),
             patch.object(
                 st,
                 "apply_patch",
@@ -108,7 +126,7 @@ class TestPatchWorkflowConfirmHash(unittest.TestCase):
 
         self.assertTrue(applied["applied"])
         self.assertEqual(applied["patch_hash"], expected_hash)
-        apply_mock.assert_called_once_with(proposed_patch)
+        apply_mock.assert_called_once_with(proposed_patch, {"stop_times": [1, 0]})
         self.assertNotIn(expected_hash, st._PATCH_STATES)
 
 
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from bakalarka_gtfs.mcp import query_advisor
+from bakalarka_gtfs.mcp.query_advisor import explain_query
+from feed_fixture import FeedTestCase
+
+
+class TestQueryAdvisor(FeedTestCase):
+    def test_flags_scans_sorts_and_cartesian_products(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            self._load(Path(tmpdir))
+            # Testovacie tabulky su male — kazdy full scan berieme ako velky
+            with patch.object(query_advisor, "FULL_SCAN_ROWS", 1):
+                time_filter = explain_query("SELECT * FROM stop_times WHERE arrival_time > '08:00:00'")
+                self.assertEqual(time_filter["verdict"], "slow")
+                scan = time_filter["warnings"][0]
+                self.assertEqual((scan["code"], scan["table"]), ("full_scan", "stop_times"))
+                self.assertIn("arrival_seconds", scan["suggestions"][0])
+                self.assertEqual(time_filter["plan"][0]["estimated_rows"], 30)
+
+                headsign = explain_query("SELECT t.trip_id FROM trips AS t WHERE t.trip_headsign = 'Centrum'")
+                self.assertIn(
+                    "CREATE INDEX idx_trips_trip_headsign ON trips(trip_headsign)",
+                    headsign["warnings"][0]["suggestions"][0],
+                )
+
+                sorted_stops = explain_query("SELECT * FROM stops ORDER BY stop_name")
+                self.assertIn("temp_btree", [w["code"] for w in sorted_stops["warnings"]])
+
+                cartesian = explain_query("SELECT COUNT(*) FROM stop_times a, stop_times b")
+                product = [w for w in cartesian["warnings"] if w["code"] == "cartesian_product"]
+                self.assertEqual(len(product), 1)
+                self.assertGreaterEqual(cartesian["estimated_rows_examined"], 30 * 30)
+
+                lookup = explain_query("SELECT * FROM trips WHERE trip_id = 'T1'")
+                self.assertEqual((lookup["verdict"], lookup["warnings"]), ("ok", []))
+                self.assertEqual(lookup["estimated_rows_examined"], 1)
+
+            with self.assertRaises(ValueError):
+                explain_query("DELETE FROM trips")
+
+    def test_indexed_lookups_pass_and_scans_inside_subqueries_are_flagged(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            self._load(Path(tmpdir))
+            with patch.object(query_advisor, "FULL_SCAN_ROWS", 1):
+                for sql in (
+                    "SELECT * FROM stop_times WHERE stop_id = 'S1'",
+                    "SELECT trip_id FROM stop_times WHERE arrival_seconds BETWEEN 28800 AND 29000",
+                ):
+                    with self.subTest(sql=sql):
+                        result = explain_query(sql)
+                        self.assertEqual((result["verdict"], result["warnings"]), ("ok", []))
+                        self.assertTrue(result["plan"][0]["detail"].startswith("SEARCH stop_times USING INDEX"))
+
+                # Vonkajsi dotaz ide cez primarny kluc, scan je az v korelovanom poddotaze
+                nested = explain_query(
+                    "SELECT r.route_id, (SELECT COUNT(*) FROM trips t WHERE t.trip_headsign = r.route_short_name) "
+                    "FROM routes r WHERE r.route_id = 'R1'"
+                )
+                self.assertEqual(nested["verdict"], "slow")
+                self.assertEqual([(w["code"], w["table"]) for w in nested["warnings"]], [("full_scan", "trips")])
+                self.assertIn(
+                    "CREATE INDEX idx_trips_trip_headsign ON trips(trip_headsign)",
+                    nested["warnings"][0]["suggestions"][0],
+                )
+
+                in_list = explain_query(
+                    "SELECT * FROM routes WHERE route_id IN (SELECT route_id FROM trips WHERE trip_headsign = 'Centrum')"
+                )
+                self.assertIn(("full_scan", "trips"), [(w["code"], w["table"]) for w in in_list["warnings"]])
+
+    def _load(self, tmp: Path) -> None:
+        self.load_feed(
+            tmp,
+            {
+                "stops.txt": (
+                    ["stop_id", "stop_name", "stop_lat", "stop_lon"],
+                    [[f"S{i}", f"Zastavka {i}", "48.1", "17.1"] for i in range(10)],
+                ),
+                "routes.txt": (["route_id", "route_short_name", "route_type"], [["R1", "1", "3"]]),
+                "trips.txt": (
+                    ["route_id", "service_id", "trip_id", "trip_headsign"],
+                    [["R1", "WD", f"T{i}", "Centrum"] for i in range(3)],
+                ),
+                "stop_times.txt": (
+                    ["trip_id", "arrival_time", "departure_time", "stop_id", "stop_sequence"],
+                    [
+                        [f"T{t}", f"08:{s:02d}:00", f"08:{s:02d}:30", f"S{s}", str(s)]
+                        for t in range(3)
+                        for s in range(10)
+                    ],
+                ),
+            },
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from bakalarka_gtfs.mcp import database as db
+from feed_fixture import FeedTestCase
+
+_CARTESIAN = "SELECT COUNT(*) AS c FROM trips a, trips b, trips c, trips d"
+_ENDLESS = (
+    "SELECT * FROM (WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < 1000000000) "
+    "SELECT MAX(x) AS m FROM n)"
+)
+
+
+class TestQueryBudget(FeedTestCase):
+    def test_cartesian_join_is_cancelled_with_plan(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            self._load(Path(tmpdir))
+            with (
+                patch.object(db, "QUERY_MAX_VM_STEPS", 100_000),
+                patch.object(db, "QUERY_TIMEOUT_MS", 0),
+                self.assertRaises(db.QueryBudgetExceededError) as ctx,
+            ):
+                db.run_query(_CARTESIAN)
+
+            info = ctx.exception.to_dict()
+            self.assertEqual((info["code"], info["reason"]), ("budget_exceeded", "vm_steps"))
+            self.assertGreater(info["vm_steps"], 100_000)
+            self.assertTrue(any("trips" in line for line in info["query_plan"]))
+
+            # Rovnake pooled spojenie ide dalej bez handlera a bez limitu
+            self.assertEqual(db.run_query(_CARTESIAN)[0]["c"], 40**4)
+
+    def test_wall_clock_budget(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            self._load(Path(tmpdir))
+            with patch.object(db, "QUERY_MAX_VM_STEPS", 0), patch.object(db, "QUERY_TIMEOUT_MS", 50):
+                started = time.perf_counter()
+                with self.assertRaises(db.QueryBudgetExceededError) as ctx:
+                    db.run_query_page(_ENDLESS, page_size=10)
+                self.assertLess(time.perf_counter() - started, 5)
+                self.assertEqual(ctx.exception.reason, "time")
+                self.assertEqual(ctx.exception.to_dict()["budget"], {"timeout_ms": 50, "max_vm_steps": 0})
+
+                self.assertEqual(len(db.run_query("SELECT trip_id FROM trips", limit=5)), 5)
+
+    def _load(self, tmp: Path) -> None:
+        self.load_feed(
+            tmp,
+            {
+                "stops.txt": (["stop_id", "stop_name", "stop_lat", "stop_lon"], [["S1", "A", "48.1", "17.1"]]),
+                "routes.txt": (["route_id", "route_short_name", "route_type"], [["R1", "1", "3"]]),
+                "trips.txt": (["route_id", "service_id", "trip_id"], [["R1", "WD", f"T{i:02d}"] for i in range(40)]),
+            },
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import tempfile
+import unittest
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from bakalarka_gtfs.mcp import database as db
+from bakalarka_gtfs.mcp.pagination import has_top_level_limit, split_order_by
+from feed_fixture import FeedTestCase
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+
+class TestQueryPagination(FeedTestCase):
+    def test_pages_cover_all_rows_once_in_order(self) -> None:
+        with self._loaded_db():
+            sql = "SELECT trip_id, route_id FROM trips WHERE trip_id != 'T00' ORDER BY trip_id"
+            seen: list[str] = []
+            cursor = None
+            pages = 0
+            while True:
+                page = db.run_query_page(sql, page_size=10, cursor=cursor)
+                seen.extend(row["trip_id"] for row in page["rows"])
+                pages += 1
+                cursor = page["next_cursor"]
+                if cursor is None:
+                    break
+
+            self.assertEqual(pages, 3)
+            self.assertEqual(seen, [f"T{i:02d}" for i in range(1, 25)])
+            self.assertEqual(page["order_by"], ["trip_id"])
+
+    def test_mixed_direction_and_default_key(self) -> None:
+        with self._loaded_db():
+            sql = "SELECT route_id, trip_id FROM trips ORDER BY route_id DESC, trip_id;"
+            expected = sorted(
+                ((f"R{i % 3}", f"T{i:02d}") for i in range(25)),
+                key=lambda r: (-int(r[0][1]), r[1]),
+            )
+            seen = []
+            cursor = None
+            while True:
+                page = db.run_query_page(sql, page_size=7, cursor=cursor)
+                seen.extend((row["route_id"], row["trip_id"]) for row in page["rows"])
+                if not (cursor := page["next_cursor"]):
+                    break
+            self.assertEqual(seen, expected)
+
+            # Bez ORDER BY sa strankuje podla prveho stlpca
+            first = db.run_query_page("SELECT trip_id FROM trips", page_size=20)
+            self.assertEqual(first["order_by"], ["trip_id"])
+            rest = db.run_query_page("SELECT trip_id FROM trips", page_size=20, cursor=first["next_cursor"])
+            self.assertEqual([r["trip_id"] for r in rest["rows"]], ["T20", "T21", "T22", "T23", "T24"])
+            self.assertIsNone(rest["next_cursor"])
+
+    def test_rejects_foreign_cursor_and_ambiguous_key(self) -> None:
+        with self._loaded_db():
+            page = db.run_query_page("SELECT trip_id FROM trips ORDER BY trip_id", page_size=5)
+            with self.assertRaisesRegex(ValueError, "inemu dotazu"):
+                db.run_query_page("SELECT trip_id FROM trips", page_size=5, cursor=page["next_cursor"])
+            with self.assertRaisesRegex(ValueError, "Neplatny kurzor"):
+                db.run_query_page("SELECT trip_id FROM trips", page_size=5, cursor="nie-je-kurzor")
+            with self.assertRaisesRegex(ValueError, "nie je jedinecny"):
+                db.run_query_page("SELECT route_id, trip_id FROM trips ORDER BY route_id", page_size=5)
+            with self.assertRaisesRegex(ValueError, "nie je vo vysledku"):
+                db.run_query_page("SELECT trip_id FROM trips ORDER BY service_id", page_size=5)
+
+    def test_limit_detection_ignores_literals_and_subqueries(self) -> None:
+        self.assertFalse(has_top_level_limit("SELECT * FROM stops WHERE stop_name = 'LIMIT'"))
+        self.assertFalse(has_top_level_limit("SELECT * FROM (SELECT * FROM stops LIMIT 3) -- LIMIT"))
+        self.assertTrue(has_top_level_limit("SELECT * FROM stops LIMIT 3"))
+        self.assertEqual(
+            split_order_by('SELECT a, b FROM t ORDER BY t.a DESC, "b", 3;'),
+            ("SELECT a, b FROM t", [("a", True), ("b", False), (3, False)]),
+        )
+
+        with self._loaded_db():
+            # Stara kontrola podretazcom by tu LIMIT nedoplnila
+            rows = db.run_query("SELECT trip_id FROM trips WHERE trip_id != 'LIMIT'", limit=4)
+            self.assertEqual(len(rows), 4)
+            rows = db.run_query("SELECT trip_id FROM trips -- bez limitu", limit=3)
+            self.assertEqual(len(rows), 3)
+
+    @contextmanager
+    def _loaded_db(self) -> Iterator[None]:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            self.load_feed(
+                Path(tmpdir),
+                {
+                    "stops.txt": (["stop_id", "stop_name", "stop_lat", "stop_lon"], [["S1", "A", "48.1", "17.1"]]),
+                    "routes.txt": (
+                        ["route_id", "route_short_name", "route_type"],
+                        [[f"R{i}", str(i), "3"] for i in range(3)],
+                    ),
+                    "trips.txt": (
+                        ["route_id", "service_id", "trip_id"],
+                        [[f"R{i % 3}", "WD", f"T{i:02d}"] for i in range(25)],
+                    ),
+                },
+            )
+            yield
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from bakalarka_gtfs.mcp import database as db
+from bakalarka_gtfs.mcp import query_stats
+from bakalarka_gtfs.mcp.patching import apply_patch
+from bakalarka_gtfs.mcp.query_stats import StatementStats, statement_fingerprint
+from feed_fixture import FeedTestCase
+
+
+class TestQueryStats(FeedTestCase):
+    def test_statements_are_aggregated_by_fingerprint(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            self._load(Path(tmpdir))
+            db._statement_stats.reset()
+
+            db.run_query("SELECT trip_id FROM trips WHERE route_id = 'R1'")
+            db.run_query("select trip_id from trips where route_id = 'R2'  ")
+            db.run_query_bounded("SELECT * FROM trips WHERE trip_id IN ('T01', 'T02', 'T03')")
+            apply_patch(
+                {
+                    "operations": [
+                        {
+                            "op": "update",
+                            "table": "trips",
+                            "filter": {"column": "route_id", "operator": "=", "value": "R0"},
+                            "set": {"trip_headsign": "Centrum"},
+                        }
+                    ]
+                }
+            )
+
+            stats = {s["sql"]: s for s in db.statement_stats(top=100)["statements"]}
+            by_route = stats["SELECT TRIP_ID FROM TRIPS WHERE ROUTE_ID = ? LIMIT ?"]
+            self.assertEqual((by_route["calls"], by_route["rows"]), (2, 20))
+            self.assertTrue(by_route["plan_fingerprint"])
+            self.assertEqual(stats["SELECT * FROM TRIPS WHERE TRIP_ID IN (?, ...)"]["rows"], 3)
+
+            updates = [s for sql, s in stats.items() if sql.startswith("UPDATE TRIPS")]
+            self.assertEqual(len(updates), 1)
+            self.assertGreaterEqual(updates[0]["rows"], 10)  # + zapisy audit triggera
+
+            reset = db.statement_stats(top=1, order_by="calls", reset=True)
+            self.assertEqual(len(reset["statements"]), 1)
+            self.assertEqual(db.statement_stats()["statements"], [])
+            with self.assertRaises(ValueError):
+                db.statement_stats(order_by="sql")
+
+    def test_slow_statements_go_to_rotating_log_with_plan(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            work_dir = self._load(Path(tmpdir))
+            db._statement_stats.reset()
+            with patch.object(db._statement_stats, "slow_ms", 1e-6):
+                db.run_query("SELECT route_id, COUNT(*) FROM trips GROUP BY route_id")
+
+            lines = (work_dir / "slow_queries.log").read_text(encoding="utf-8").splitlines()
+            records = [json.loads(line) for line in lines]
+            grouped = [r for r in records if "GROUP BY" in r["sql"]]
+            self.assertEqual(len(grouped), 1)
+            self.assertTrue(grouped[0]["plan"])
+            self.assertEqual(grouped[0]["rows"], 3)
+            self.assertIn(grouped[0], db.statement_stats()["recent_slow"])
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            log = Path(tmpdir) / "slow.log"
+            with patch.object(query_stats, "SLOW_LOG_MAX_BYTES", 300):
+                stats = StatementStats(lambda: log, slow_ms=1, max_statements=2)
+                for i in range(10):
+                    stats.log_slow({"sql": f"SELECT {i}", "elapsed_ms": 5})
+            self.assertTrue(log.with_name("slow.log.1").exists())
+
+            for i, ms in enumerate([5.0, 1.0, 3.0]):
+                stats.record(f"f{i}", f"SELECT {i}", ms, 0)
+            self.assertEqual([s["fingerprint"] for s in stats.top()], ["f0", "f2"])
+
+    def test_fingerprint_replaces_literals(self) -> None:
+        fingerprint, text = statement_fingerprint(
+            "select * from stop_times where trip_id = 'T''1' and stop_sequence > 3.5"
+        )
+        self.assertEqual(text, "SELECT * FROM STOP_TIMES WHERE TRIP_ID = ? AND STOP_SEQUENCE > ?")
+        self.assertEqual(
+            fingerprint, statement_fingerprint("SELECT * FROM stop_times WHERE trip_id = 'X' AND stop_sequence > 7")[0]
+        )
+        self.assertEqual(
+            statement_fingerprint("SELECT t1.a FROM t1 WHERE x IN (1, 2,3)")[1],
+            "SELECT T1.A FROM T1 WHERE X IN (?, ...)",
+        )
+
+    def _load(self, tmp: Path) -> Path:
+        return self.load_feed(
+            tmp,
+            {
+                "stops.txt": (["stop_id", "stop_name", "stop_lat", "stop_lon"], [["S1", "A", "48.1", "17.1"]]),
+                "routes.txt": (
+                    ["route_id", "route_short_name", "route_type"],
+                    [[f"R{i}", str(i), "3"] for i in range(3)],
+                ),
+                "trips.txt": (
+                    ["route_id", "service_id", "trip_id"],
+                    [[f"R{i % 3}", "WD", f"T{i:02d}"] for i in range(30)],
+                ),
+            },
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
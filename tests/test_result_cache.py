@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import csv
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from bakalarka_gtfs.mcp import database as db
+from bakalarka_gtfs.mcp.patching import apply_patch
+from bakalarka_gtfs.mcp.result_cache import ResultCache, normalize_sql
+
+
+class TestResultCache(unittest.TestCase):
+    def test_run_query_is_cached_until_database_changes(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmp = Path(tmpdir)
+            feed_dir = tmp / "feed"
+            feed_dir.mkdir(parents=True, exist_ok=True)
+            self._write_csv(
+                feed_dir / "stops.txt",
+                ["stop_id", "stop_name", "stop_lat", "stop_lon"],
+                [["STOP_A", "A", "48.1", "17.1"]],
+            )
+
+            work_dir = tmp / "work"
+            db_path = work_dir / "current.db"
+            with (
+                patch.object(db, "WORK_DIR", work_dir),
+                patch.object(db, "DB_PATH", db_path),
+                patch.object(db, "_result_cache", ResultCache(max_entries=8, max_bytes=1024**2)),
+            ):
+                db.ensure_loaded(str(feed_dir), force=True)
+
+                first = db.run_query("SELECT stop_name FROM stops")
+                first[0]["stop_name"] = "zmenene volajucim"
+                again = db.run_query("SELECT   stop_name -- znova\n FROM stops;")
+                self.assertEqual(again, [{"stop_name": "A"}])
+                self.assertEqual(db.query_cache_stats()["hits"], 1)
+
+                apply_patch(
+                    {
+                        "operations": [
+                            {
+                                "op": "update",
+                                "table": "stops",
+                                "filter": {"column": "stop_id", "operator": "=", "value": "STOP_A"},
+                                "set": {"stop_name": "A2"},
+                            }
+                        ]
+                    }
+                )
+                self.assertEqual(db.run_query("SELECT stop_name FROM stops"), [{"stop_name": "A2"}])
+
+                # Zapis mimo MCP servera (iny proces / spojenie) zmeni change counter
+                conn = sqlite3.connect(str(db_path))
+                conn.execute("UPDATE stops SET stop_name = 'A3'")
+                conn.commit()
+                conn.close()
+                self.assertEqual(db.run_query("SELECT stop_name FROM stops"), [{"stop_name": "A3"}])
+
+                stats = db.query_cache_stats()
+                self.assertEqual((stats["hits"], stats["misses"]), (1, 3))
+
+    def test_normalize_sql_keeps_literals(self) -> None:
+        self.assertEqual(
+            normalize_sql("select *  from stops -- vsetky\nwhere stop_name = 'Hlavna  stanica' /* x */;"),
+            "select * from stops where stop_name = 'Hlavna  stanica'",
+        )
+        self.assertNotEqual(normalize_sql("SELECT 'a'"), normalize_sql("SELECT 'A'"))
+        self.assertEqual(normalize_sql("select '-- nie'  as x", fold_case=True), "SELECT '-- nie' AS X")
+
+    def test_queries_differing_in_case_keep_their_own_column_names(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmp = Path(tmpdir)
+            feed_dir = tmp / "feed"
+            feed_dir.mkdir(parents=True, exist_ok=True)
+            self._write_csv(
+                feed_dir / "stops.txt",
+                ["stop_id", "stop_name", "stop_lat", "stop_lon"],
+                [["STOP_A", "A", "48.1", "17.1"]],
+            )
+            work_dir = tmp / "work"
+
+            with (
+                patch.object(db, "WORK_DIR", work_dir),
+                patch.object(db, "DB_PATH", work_dir / "current.db"),
+                patch.object(db, "_result_cache", ResultCache(max_entries=8, max_bytes=1024**2)),
+            ):
+                db.ensure_loaded(str(feed_dir), force=True)
+                self.assertEqual(db.run_query("SELECT count(*) FROM stops"), [{"count(*)": 1}])
+                self.assertEqual(db.run_query("SELECT COUNT(*) FROM stops"), [{"COUNT(*)": 1}])
+                self.assertEqual(db.run_query("SELECT stop_id AS Id FROM stops"), [{"Id": "STOP_A"}])
+                self.assertEqual(db.run_query("SELECT stop_id AS id FROM stops"), [{"id": "STOP_A"}])
+
+    def test_eviction_by_entries_and_bytes(self) -> None:
+        cache = ResultCache(max_entries=2, max_bytes=10_000)
+        version = (1, 1)
+        cache.put(("q1",), version, [{"a": 1}])
+        cache.put(("q2",), version, [{"a": 2}])
+        cache.get(("q1",), version)
+        cache.put(("q3",), version, [{"a": 3}])
+        self.assertIsNone(cache.get(("q2",), version))
+        self.assertIsNotNone(cache.get(("q1",), version))
+
+        cache.put(("big",), version, [{"text": "x" * 5000}, {"text": "y" * 4000}])
+        self.assertLessEqual(cache.stats()["bytes"], 10_000)
+        cache.put(("too_big",), version, [{"text": "x" * 20_000}])
+        self.assertIsNone(cache.get(("too_big",), version))
+
+        self.assertIsNone(cache.get(("q1",), (1, 2)))
+        self.assertEqual(cache.stats()["entries"], 0)
+
+    @staticmethod
+    def _write_csv(path: Path, headers: list[str], rows: list[list[str]]) -> None:
+        with path.open("w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(headers)
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import csv
+import json
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from bakalarka_gtfs.mcp import database as db
+from bakalarka_gtfs.mcp.spill import SpillStore
+from feed_fixture import FeedTestCase
+
+
+class TestResultSpill(FeedTestCase):
+    def test_large_result_spills_with_summary(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            work_dir = self._load(Path(tmpdir))
+
+            small = db.run_query_bounded("SELECT trip_id FROM trips ORDER BY trip_id", max_rows=100)
+            self.assertEqual((small["count"], "spilled" in small), (30, False))
+
+            result = db.run_query_bounded(
+                "SELECT trip_id, route_id, direction_id FROM trips ORDER BY trip_id", max_rows=10
+            )
+            self.assertEqual(result["total_rows"], 30)
+            self.assertEqual([r["trip_id"] for r in result["rows"]], [f"T{i:02d}" for i in range(10)])
+            stats = result["column_stats"]
+            self.assertEqual(stats["route_id"]["distinct"], 3)
+            self.assertEqual((stats["trip_id"]["min"], stats["trip_id"]["max"]), ("T00", "T29"))
+            self.assertEqual(stats["direction_id"]["nulls"], 15)
+
+            spilled = result["spilled"]
+            self.assertTrue(spilled["uri"].startswith("gtfs://results/"))
+            lines = list(csv.reader(db.read_spilled_result(spilled["uri"]).splitlines()))
+            self.assertEqual(lines[0], ["trip_id", "route_id", "direction_id"])
+            self.assertEqual(len(lines), 31)
+            self.assertEqual(len(list((work_dir / "results").iterdir())), 1)
+
+            # Limit bajtov plati aj pri malom pocte riadkov
+            by_bytes = db.run_query_bounded("SELECT * FROM trips", max_rows=500, max_bytes=1024)
+            self.assertEqual(by_bytes["total_rows"], 30)
+
+            with self.assertRaises(ValueError):
+                db.read_spilled_result("../current.db")
+
+    def test_reading_stops_when_spill_file_is_full(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            work_dir = self._load(Path(tmpdir))
+            # Posledny riadok by pri vyhodnoteni zlyhal (integer overflow) — kurzor k nemu nesmie dojst
+            sql = (
+                "SELECT trip_id, CASE WHEN trip_id = 'T29' THEN abs(-9223372036854775807 - 1) END AS boom "
+                "FROM trips ORDER BY trip_id"
+            )
+            with (
+                patch.object(db, "_spill_store", lambda: SpillStore(work_dir / "results", max_rows=12)),
+                patch.object(db, "_FETCH_BATCH", 4),
+            ):
+                result = db.run_query_bounded(sql, max_rows=5)
+            self.assertEqual(result["total_rows"], 12)
+            self.assertTrue(result["spilled"]["truncated"])
+            self.assertTrue(result["message"].startswith("Vysledok ma viac ako 12 riadkov"))
+
+    def test_spill_is_read_page_by_page(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            store = SpillStore(Path(tmpdir), page_rows=10)
+            writer = store.create(["n", "text"])
+            for i in range(25):
+                writer.write([i, "riadok\ns novym riadkom"])
+            meta = writer.close()
+            self.assertEqual(meta["pages"], 3)
+            page_uri = meta["page_uri"]
+
+            # Cely subor sa nikdy nenacita naraz
+            with patch.object(Path, "read_text", side_effect=AssertionError("cely spill v pamati")):
+                pages = [
+                    list(csv.reader(store.read_page(page_uri.format(page=p)).splitlines(keepends=True)))
+                    for p in (1, 2, 3)
+                ]
+            self.assertEqual(store.read_page(meta["uri"]), store.read_page(page_uri.format(page=1)))
+            self.assertEqual([len(p) for p in pages], [11, 11, 6])
+            self.assertTrue(all(p[0] == ["n", "text"] for p in pages))
+            self.assertEqual(
+                (pages[1][1], pages[2][-1]), (["10", "riadok\ns novym riadkom"], ["24", "riadok\ns novym riadkom"])
+            )
+            with self.assertRaises(ValueError):
+                store.read_page(page_uri.format(page=4))
+
+    def test_store_expires_and_bounds_files(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            store = SpillStore(Path(tmpdir), ttl_seconds=3600, max_bytes=10_000)
+            writer = store.create(["a"], fmt="jsonl")
+            for i in range(3):
+                self.assertTrue(writer.write([i]))
+            meta = writer.close()
+            self.assertEqual(
+                [json.loads(x) for x in store.read_page(meta["uri"]).splitlines()], [{"a": 0}, {"a": 1}, {"a": 2}]
+            )
+
+            capped = store.create(["text"])
+            while capped.write(["x" * 1000]):
+                pass
+            capped_meta = capped.close()
+            self.assertTrue(capped_meta["truncated"])
+            self.assertLessEqual(capped_meta["bytes"], 11_000)
+
+            # Novy spill uvolni miesto — najstarsie subory idu prec ako prve
+            store.create(["a"]).close()
+            self.assertNotIn(meta["uri"], [e["uri"] for e in store.entries()])
+
+            store.ttl_seconds = 0
+            time.sleep(0.01)
+            store.cleanup()
+            self.assertEqual(store.entries(), [])
+            with self.assertRaises(FileNotFoundError):
+                store.read_page(capped_meta["uri"])
+
+    def _load(self, tmp: Path) -> Path:
+        return self.load_feed(
+            tmp,
+            {
+                "stops.txt": (["stop_id", "stop_name", "stop_lat", "stop_lon"], [["S1", "A", "48.1", "17.1"]]),
+                "routes.txt": (
+                    ["route_id", "route_short_name", "route_type"],
+                    [[f"R{i}", str(i), "3"] for i in range(3)],
+                ),
+                "trips.txt": (
+                    ["route_id", "service_id", "trip_id", "direction_id"],
+                    [[f"R{i % 3}", "WD", f"T{i:02d}", "" if i % 2 else "0"] for i in range(30)],
+                ),
+            },
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
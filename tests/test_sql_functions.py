@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import csv
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from bakalarka_gtfs.mcp import database as db
+from bakalarka_gtfs.mcp.patching.transforms import apply_transform, transform_sql
+from bakalarka_gtfs.mcp.sql_functions import (
+    register_functions,
+    seconds_to_time,
+    time_add,
+    time_diff,
+    time_to_seconds,
+)
+
+# (cas, posun v minutach, sekundy, cas po posune) — None = neplatny cas / bez vysledku
+TIME_EDGE_CASES = [
+    ("08:00:00", 10, 28800, "08:10:00"),
+    ("9:05:00", 0, 32700, "09:05:00"),
+    ("23:50:00", 20, 85800, "24:10:00"),
+    ("25:30:15", -90, 91815, "24:00:15"),
+    ("123:00:00", 1, 442800, "123:01:00"),
+    ("00:10:00", -10, 600, "00:00:00"),
+    ("00:10:00", -11, 600, None),
+    ("00:10:00", 0.5, 600, "00:10:30"),
+    ("9:5:00", 0, None, None),
+    ("10:60:00", 0, None, None),
+    ("-1:50:00", 0, None, None),
+    (" 10:00:00", 0, None, None),
+    ("1000:00:00", 0, None, None),
+    ("", 0, None, None),
+    ("x", 0, None, None),
+]
+
+
+class TestSqlFunctions(unittest.TestCase):
+    def test_every_time_parser_agrees_on_edge_cases(self) -> None:
+        conn = sqlite3.connect(":memory:")
+        register_functions(conn)
+        conn.execute(f"CREATE TABLE stop_times (arrival_time TEXT, {db._seconds_column_sql('arrival_time')})")
+        for value, minutes, seconds, added in TIME_EDGE_CASES:
+            with self.subTest(value=value, minutes=minutes):
+                conn.execute("DELETE FROM stop_times")
+                conn.execute("INSERT INTO stop_times (arrival_time) VALUES (?)", [value])
+                expr, params = transform_sql("arrival_time", {"transform": "time_add", "minutes": minutes})
+                row = conn.execute(
+                    f"SELECT arrival_seconds, gtfs_time_to_seconds(arrival_time), "
+                    f"gtfs_time_add(arrival_time, ?), {expr} FROM stop_times",
+                    [minutes, *params],
+                ).fetchone()
+                self.assertEqual(row, (seconds, seconds, added, added))
+                self.assertEqual(time_to_seconds(value), seconds)
+                self.assertEqual(time_add(value, minutes), added)
+                if added is None:
+                    with self.assertRaises(ValueError):
+                        apply_transform(value, {"transform": "time_add", "minutes": minutes})
+                else:
+                    self.assertEqual(apply_transform(value, {"transform": "time_add", "minutes": minutes}), added)
+        conn.close()
+
+    def test_time_functions_handle_overnight_and_invalid_values(self) -> None:
+        self.assertEqual(time_to_seconds("25:10:00"), 90600)
+        self.assertEqual(time_to_seconds("9:05:00"), 9 * 3600 + 300)
+        for invalid in ("9:5:00", "10:60:00", " 10:00:00", "", None, 36000):
+            self.assertIsNone(time_to_seconds(invalid))
+        self.assertEqual(seconds_to_time(90600), "25:10:00")
+        self.assertIsNone(seconds_to_time(-1))
+        self.assertEqual(time_add("23:50:00", 20), "24:10:00")
+        self.assertEqual(time_add("00:10:00", 0.5), "00:10:30")
+        self.assertIsNone(time_add("00:10:00", -11))
+        self.assertEqual(time_diff("10:30:00", "9:45:00"), 2700)
+        self.assertIsNone(time_diff("10:30:00", "x"))
+
+    def test_functions_are_available_in_queries(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmp = Path(tmpdir)
+            feed_dir = tmp / "feed"
+            feed_dir.mkdir(parents=True, exist_ok=True)
+            self._write_csv(
+                feed_dir / "stops.txt",
+                ["stop_id", "stop_name", "stop_lat", "stop_lon"],
+                [["S1", "A", "48.1", "17.1"], ["S2", "B", "48.2", "17.2"]],
+            )
+            self._write_csv(
+                feed_dir / "stop_times.txt",
+                ["trip_id", "arrival_time", "departure_time", "stop_id", "stop_sequence"],
+                [
+                    ["T1", "8:00:00", "8:00:00", "S1", "1"],
+                    ["T1", "9:30:00", "9:30:00", "S2", "2"],
+                    ["T2", "23:40:00", "23:40:00", "S1", "1"],
+                    ["T2", "24:20:00", "bad", "S2", "2"],
+                ],
+            )
+            work_dir = tmp / "work"
+            with patch.object(db, "WORK_DIR", work_dir), patch.object(db, "DB_PATH", work_dir / "current.db"):
+                db.ensure_loaded(str(feed_dir), force=True)
+
+                rows = db.run_query(
+                    "SELECT trip_id, gtfs_seconds_to_time(MAX(arrival_seconds) - MIN(departure_seconds)) AS travel "
+                    "FROM stop_times GROUP BY trip_id "
+                    "HAVING gtfs_time_diff(MAX(arrival_time), MIN(departure_time)) > 3600"
+                )
+                self.assertEqual(rows, [{"trip_id": "T1", "travel": "01:30:00"}])
+
+                # Funkcia cita cas rovnako ako generovane *_seconds stlpce
+                rows = db.run_query(
+                    "SELECT COUNT(*) AS n FROM stop_times "
+                    "WHERE gtfs_time_to_seconds(departure_time) IS departure_seconds "
+                    "AND gtfs_time_add(arrival_time, 30) = gtfs_seconds_to_time(arrival_seconds + 1800)"
+                )
+                self.assertEqual(rows[0]["n"], 4)
+
+    @staticmethod
+    def _write_csv(path: Path, headers: list[str], rows: list[list[str]]) -> None:
+        with path.open("w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(headers)
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import csv
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from bakalarka_gtfs.mcp import database as db
+from bakalarka_gtfs.mcp.patching.apply import apply_patch
+from bakalarka_gtfs.mcp.patching.sql_builder import filter_to_where
+from bakalarka_gtfs.mcp.patching.validation import validate_patch
+
+
+class TestTimeSeconds(unittest.TestCase):
+    def test_seconds_columns_filters_and_validation(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmp = Path(tmpdir)
+            feed_dir = self._write_feed(tmp / "feed")
+            work_dir = tmp / "work"
+            db_path = work_dir / "current.db"
+
+            with patch.object(db, "WORK_DIR", work_dir), patch.object(db, "DB_PATH", db_path):
+                db.ensure_loaded(str(feed_dir), force=True)
+
+                conn = sqlite3.connect(str(db_path))
+                try:
+                    rows = conn.execute(
+                        "SELECT stop_sequence, arrival_seconds, departure_seconds FROM stop_times ORDER BY stop_sequence"
+                    ).fetchall()
+                    self.assertEqual(rows, [(1, 9 * 3600 + 300, 9 * 3600 + 300), (2, 25 * 3600, 25 * 3600 + 60)])
+
+                    # "9:05:00" bez nuly aj "25:00:00" po polnoci sa porovnavaju ciselne
+                    where, params = filter_to_where({"column": "arrival_time", "operator": ">=", "value": "10:00:00"})
+                    self.assertIn("arrival_seconds", where)
+                    matched = conn.execute(f"SELECT stop_sequence FROM stop_times WHERE {where}", params).fetchall()
+                    self.assertEqual(matched, [(2,)])
+                finally:
+                    conn.close()
+
+                result = validate_patch(
+                    {
+                        "operations": [
+                            {
+                                "op": "update",
+                                "table": "stop_times",
+                                "filter": {"column": "stop_sequence", "operator": "=", "value": 2},
+                                "set": {"arrival_time": {"transform": "time_add", "minutes": 5}},
+                            }
+                        ]
+                    }
+                )
+                self.assertFalse(result["valid"])
+                self.assertIn("25:05:00", result["errors"][0])
+
+                result = validate_patch(
+                    {
+                        "operations": [
+                            {
+                                "op": "update",
+                                "table": "stop_times",
+                                "filter": {"column": "stop_sequence", "operator": "<=", "value": 2},
+                                "set": {"departure_time": {"transform": "time_add", "minutes": 1}},
+                            }
+                        ]
+                    }
+                )
+                self.assertTrue(result["valid"], result["errors"])
+
+    def test_time_add_is_applied_as_one_update(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmp = Path(tmpdir)
+            feed_dir = self._write_feed(tmp / "feed")
+            work_dir = tmp / "work"
+
+            with patch.object(db, "WORK_DIR", work_dir), patch.object(db, "DB_PATH", work_dir / "current.db"):
+                db.ensure_loaded(str(feed_dir), force=True)
+                db._statement_stats.reset()
+                shift = {"transform": "time_add", "minutes": -70}
+                result = apply_patch(
+                    {
+                        "operations": [
+                            {
+                                "op": "update",
+                                "table": "stop_times",
+                                "filter": {"column": "trip_id", "operator": "=", "value": "T1"},
+                                "set": {"arrival_time": shift, "departure_time": shift, "stop_id": "STOP_A"},
+                            }
+                        ]
+                    }
+                )
+                self.assertEqual(result["affected_rows"], {"stop_times": 2})
+                rows = db.run_query("SELECT arrival_time, departure_seconds FROM stop_times ORDER BY stop_sequence")
+                self.assertEqual(
+                    [tuple(r.values()) for r in rows], [("07:55:00", 7 * 3600 + 3300), ("23:50:00", 23 * 3600 + 3060)]
+                )
+                updates = [s for s in db.statement_stats()["statements"] if s["sql"].startswith("UPDATE STOP_TIMES")]
+                self.assertEqual([u["calls"] for u in updates], [1])
+
+                # Neplatny cas v jednom riadku zrusi celu operaciu
+                with db.write_connection() as conn:
+                    conn.execute("UPDATE stop_times SET arrival_time = 'x' WHERE stop_sequence = 2")
+                with self.assertRaisesRegex(ValueError, "Neplatny format casu: x"):
+                    apply_patch(
+                        {
+                            "operations": [
+                                {
+                                    "op": "update",
+                                    "table": "stop_times",
+                                    "filter": {"column": "trip_id", "operator": "=", "value": "T1"},
+                                    "set": {"arrival_time": shift},
+                                }
+                            ]
+                        }
+                    )
+                rows = db.run_query("SELECT arrival_time FROM stop_times ORDER BY stop_sequence")
+                self.assertEqual([r["arrival_time"] for r in rows], ["07:55:00", "x"])
+
+    def test_existing_db_is_upgraded_on_load(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmp = Path(tmpdir)
+            feed_dir = self._write_feed(tmp / "feed")
+            work_dir = tmp / "work"
+            work_dir.mkdir()
+            db_path = work_dir / "current.db"
+
+            conn = sqlite3.connect(str(db_path))
+            conn.executescript(
+                """
+                CREATE TABLE stop_times (
+                    trip_id TEXT NOT NULL, arrival_time TEXT, departure_time TEXT,
+                    stop_id TEXT NOT NULL, stop_sequence INTEGER NOT NULL,
+                    PRIMARY KEY (trip_id, stop_sequence)
+                );
+                INSERT INTO stop_times VALUES ('T1', '9:05:00', '9:06:00', 'STOP_A', 1);
+                """
+            )
+            conn.commit()
+            conn.close()
+
+            with patch.object(db, "WORK_DIR", work_dir), patch.object(db, "DB_PATH", db_path):
+                result = db.ensure_loaded(str(feed_dir))
+                self.assertEqual(result["status"], "already_loaded")
+
+            conn = sqlite3.connect(str(db_path))
+            try:
+                row = conn.execute("SELECT arrival_seconds, departure_seconds FROM stop_times").fetchone()
+                self.assertEqual(row, (9 * 3600 + 300, 9 * 3600 + 360))
+            finally:
+                conn.close()
+
+    def _write_feed(self, feed_dir: Path) -> Path:
+        feed_dir.mkdir(parents=True, exist_ok=True)
+        self._write_csv(
+            feed_dir / "stops.txt",
+            ["stop_id", "stop_name", "stop_lat", "stop_lon", "stop_code", "zone_id", "location_type"],
+            [["STOP_A", "A", "48.1", "17.1", "", "", "0"]],
+        )
+        self._write_csv(
+            feed_dir / "trips.txt",
+            ["trip_id", "route_id", "service_id", "trip_headsign", "direction_id"],
+            [["T1", "R1", "S1", "Test", "0"]],
+        )
+        self._write_csv(
+            feed_dir / "stop_times.txt",
+            ["trip_id", "arrival_time", "departure_time", "stop_id", "stop_sequence"],
+            [
+                ["T1", "9:05:00", "9:05:00", "STOP_A", "1"],
+                ["T1", "25:00:00", "25:01:00", "STOP_A", "2"],
+            ],
+        )
+        return feed_dir
+
+    @staticmethod
+    def _write_csv(path: Path, headers: list[str], rows: list[list[str]]) -> None:
+        with path.open("w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(headers)
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    unittest.main()
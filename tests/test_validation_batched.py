@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from bakalarka_gtfs.mcp.patching import validation
+from bakalarka_gtfs.mcp.patching.validation import validate_patch
+from feed_fixture import CALENDAR_HEADERS, FeedTestCase
+
+
+class TestValidationBatched(FeedTestCase):
+    def test_insert_fk_check_reports_capped_offending_rows(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            self._load(Path(tmpdir))
+            rows = [
+                {
+                    "trip_id": "T1" if i % 100 else f"MISSING_{i}",
+                    "arrival_time": "10:00:00",
+                    "departure_time": "10:00:00",
+                    "stop_id": "STOP_A" if i != 7 else "STOP_X",
+                    "stop_sequence": 100 + i,
+                }
+                for i in range(5000)
+            ]
+            result = validate_patch({"operations": [{"op": "insert", "table": "stop_times", "rows": rows}]})
+
+            self.assertFalse(result["valid"])
+            trip_errors = [e for e in result["errors"] if "trip_id=" in e]
+            self.assertEqual(len(trip_errors), 20)
+            self.assertIn("row#1: FK chyba — trip_id='MISSING_0'", trip_errors[0])
+            self.assertIn("row#1901:", trip_errors[-1])
+            self.assertIn("dalsich 30 riadkov s trip_id mimo trips.trip_id", " ".join(result["errors"]))
+            self.assertIn(
+                "Op#1 (insert stop_times) row#8: FK chyba — stop_id='STOP_X' neexistuje v stops.stop_id.",
+                result["errors"],
+            )
+
+            ok = validate_patch(
+                {
+                    "operations": [
+                        {
+                            "op": "insert",
+                            "table": "trips",
+                            "rows": [{"trip_id": "T9", "route_id": "R1", "service_id": "S1"}],
+                        }
+                    ]
+                }
+            )
+            self.assertTrue(ok["valid"], ok["errors"])
+
+    def test_delete_reports_top_blocking_keys_and_cascade(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            self._load(Path(tmpdir))
+
+            def delete(table: str, column: str, value: str) -> dict:
+                flt = {"column": column, "operator": "LIKE", "value": value}
+                return validate_patch({"operations": [{"op": "delete", "table": table, "filter": flt}]})
+
+            result = delete("trips", "trip_id", "T%")
+            self.assertEqual(
+                result["errors"],
+                [
+                    "Op#1 (delete trips): mazanie trip_id='T1' blokuje 2 riadkov v stop_times.",
+                    "Op#1 (delete trips): mazanie trip_id='T2' blokuje 1 riadkov v stop_times.",
+                ],
+            )
+
+            result = delete("routes", "route_id", "R1")
+            self.assertEqual(
+                result["errors"], ["Op#1 (delete routes): mazanie route_id='R1' blokuje 2 riadkov v trips."]
+            )
+            self.assertIn("je 3 riadkov v stop_times (cez trips)", result["warnings"][0])
+
+            # Zastavky zatial nikto nekontroloval — FK by zlyhal az pri apply
+            self.assertFalse(delete("stops", "stop_id", "STOP_A")["valid"])
+
+            with patch.object(validation, "_ERROR_LIMIT", 1):
+                result = delete("trips", "trip_id", "T%")
+            self.assertEqual(len(result["errors"]), 2)
+            self.assertIn("dalsie 1 hodnoty trip_id (1 riadkov v stop_times)", result["errors"][1])
+
+    def test_timetable_of_touched_trips_is_checked_after_patch(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            self._load(Path(tmpdir))
+
+            def shift(flt: dict, minutes: int, *columns: str) -> dict:
+                spec = {"transform": "time_add", "minutes": minutes}
+                op = {"op": "update", "table": "stop_times", "filter": flt, "set": dict.fromkeys(columns, spec)}
+                return validate_patch({"operations": [op]})
+
+            # Posun celeho mesta — ziadny spoj sa nerozbije
+            everything = {"column": "trip_id", "operator": "LIKE", "value": "T%"}
+            result = shift(everything, 90, "arrival_time", "departure_time")
+            self.assertTrue(result["valid"], result["errors"])
+
+            # Druha zastavka T1 pred odchodom z prvej: riadok sam o sebe je v poriadku
+            second = {"column": "stop_sequence", "operator": "=", "value": 2}
+            result = shift(second, -15, "arrival_time")
+            self.assertEqual(
+                result["errors"],
+                [
+                    "Op#1 (update stop_times): spoj trip_id='T1' po update porusuje poradie casov v 1 zastavkach"
+                    " — stop_sequence 2: arrival_time (07:55:00) < departure_time predchadzajucej zastavky (08:00:00)."
+                ],
+            )
+
+            with patch.object(validation, "_ERROR_LIMIT", 1):
+                result = shift(everything, 120, "arrival_time")
+            self.assertEqual(len(result["errors"]), 2)
+            self.assertIn("arrival_time (10:00:00) > departure_time (08:00:00)", result["errors"][0])
+            self.assertIn("aj dalsich 1 spojov", result["errors"][1])
+
+            inserted = {"trip_id": "T2", "arrival_time": "08:30:00", "departure_time": "08:30:00", "stop_id": "STOP_A"}
+            result = validate_patch(
+                {"operations": [{"op": "insert", "table": "stop_times", "rows": [{**inserted, "stop_sequence": 2}]}]}
+            )
+            self.assertIn("spoj trip_id='T2' po insert porusuje poradie casov", result["errors"][0])
+            # Nahradenie existujucej zastavky (rovnaka stop_sequence) sa porovna s novym casom
+            result = validate_patch(
+                {"operations": [{"op": "insert", "table": "stop_times", "rows": [{**inserted, "stop_sequence": 1}]}]}
+            )
+            self.assertTrue(result["valid"], result["errors"])
+
+    def _load(self, tmp: Path) -> None:
+        self.load_feed(
+            tmp,
+            {
+                "stops.txt": (["stop_id", "stop_name", "stop_lat", "stop_lon"], [["STOP_A", "A", "48.1", "17.1"]]),
+                "routes.txt": (["route_id", "route_short_name", "route_type"], [["R1", "1", "3"]]),
+                "calendar.txt": (
+                    CALENDAR_HEADERS,
+                    [["S1", "1", "1", "1", "1", "1", "0", "0", "20260101", "20261231"]],
+                ),
+                "trips.txt": (["trip_id", "route_id", "service_id"], [["T1", "R1", "S1"], ["T2", "R1", "S1"]]),
+                "stop_times.txt": (
+                    ["trip_id", "arrival_time", "departure_time", "stop_id", "stop_sequence"],
+                    [
+                        ["T1", "08:00:00", "08:00:00", "STOP_A", "1"],
+                        ["T1", "08:10:00", "08:11:00", "STOP_A", "2"],
+                        ["T2", "09:00:00", "09:00:00", "STOP_A", "1"],
+                    ],
+                ),
+            },
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import json
+import unittest
+from unittest.mock import patch
+
+from bakalarka_gtfs.mcp import wire
+
+
+class TestWire(unittest.TestCase):
+    ROWS = [
+        {"trip_id": f"T{i}", "route_id": f"R{i % 2}", "stop_sequence": i, "shape_id": None, "name": "Hlavná"}
+        for i in range(20)
+    ]
+
+    def test_compact_columnar_round_trip(self) -> None:
+        with patch.object(wire, "RESPONSE_FORMAT", "compact"), patch.object(wire, "DICTIONARY_ENCODING", False):
+            text = wire.dumps({**wire.table(self.ROWS), "count": len(self.ROWS)})
+        self.assertNotIn("\n", text)
+        self.assertIn("Hlavná", text)
+
+        data = json.loads(text)
+        self.assertEqual(data["columns"], ["trip_id", "route_id", "stop_sequence", "shape_id", "name"])
+        decoded = [dict(zip(data["columns"], row, strict=True)) for row in data["rows"]]
+        self.assertEqual(decoded, self.ROWS)
+
+        pretty = json.dumps({"rows": self.ROWS, "count": len(self.ROWS)}, ensure_ascii=False, indent=2)
+        self.assertLess(len(text), len(pretty) / 2)
+
+    def test_dictionary_encoding_only_for_repeated_strings(self) -> None:
+        data = wire.dictionary_encode(wire.columnar(self.ROWS))
+        self.assertEqual(data["dictionary"], {"route_id": ["R0", "R1"], "name": ["Hlavná"]})
+        self.assertEqual(data["rows"][3], ["T3", 1, 3, None, 0])
+
+        columns = data["columns"]
+        decoded = [
+            {
+                col: data["dictionary"][col][value] if col in data["dictionary"] else value
+                for col, value in zip(columns, row, strict=True)
+            }
+            for row in data["rows"]
+        ]
+        self.assertEqual(decoded, self.ROWS)
+
+        few = wire.columnar(self.ROWS[:3])
+        self.assertIs(wire.dictionary_encode(few), few)
+
+    def test_pretty_mode_keeps_row_objects(self) -> None:
+        with patch.object(wire, "RESPONSE_FORMAT", "pretty"):
+            self.assertEqual(wire.table(self.ROWS, key="history"), {"history": self.ROWS})
+            self.assertIn('\n  "count": 1', wire.dumps({"count": 1}))
+
+    def test_falls_back_to_json_without_orjson(self) -> None:
+        with patch.object(wire, "RESPONSE_FORMAT", "compact"), patch.object(wire, "orjson", None):
+            self.assertEqual(wire.dumps({"a": [1, "č"], "b": 2**70}), '{"a":[1,"č"],"b":1180591620717411303424}')
+
+
+if __name__ == "__main__":
+    unittest.main()